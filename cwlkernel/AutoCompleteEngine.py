@@ -1,17 +1,28 @@
 import re
+from collections import OrderedDict
 from typing import Dict, Iterable, Optional, Callable, Tuple, List
 
-from pygtrie import CharTrie
+from .CompletionTrie import CompletionTrie
 
 
 class AutoCompleteEngine:
     """
-    AutoCompleteEngine generates suggestions given a users input.
+    AutoCompleteEngine generates suggestions given a users input. Only the line of the cursor is parsed and the
+    suggestions of the magic commands are memoized per line and cursor position. The lines which follow a magic
+    command, e.g. the input data of % execute, are completed by the body suggester of that magic command.
     """
 
+    _line_classifier = re.compile(r'(?P<command>^%[ ]+[\w]*)(?P<args>( [\S]*)*)')
+    # the maximum number of suggestions of magic commands
+    MAX_MATCHES = 100
+    # the maximum number of memoized suggestions
+    CACHE_SIZE = 256
+
     def __init__(self, magic_commands: Optional[Iterable[str]]):
         self._magics_args_suggesters: Dict[str, Callable] = {}
-        self._commands_trie = CharTrie()
+        self._magics_body_suggesters: Dict[str, Callable] = {}
+        self._commands_trie = CompletionTrie(top_k=self.MAX_MATCHES)
+        self._suggestions_cache: Dict[Tuple[str, int], Tuple[List[str], int, int]] = OrderedDict()
         if magic_commands is not None:
             for magic in magic_commands:
                 self.add_magic_command(magic)
@@ -25,39 +36,66 @@ class AutoCompleteEngine:
                 'cursor_end': ,
                 'cursor_start': , }
         """
-        matches = []
-        cursor_end = cursor_pos
-        cursor_start = cursor_pos
-        line_classifier = re.compile(r'(?P<command>^%[ ]+[\w]*)(?P<args>( [\S]*)*)', re.MULTILINE)
-        for match in line_classifier.finditer(code):  # type: re.Match
-            if match.start('command') <= cursor_pos <= match.end('command'):
-                new_cursor_pos = cursor_pos - match.span()[0]
-                code = match.group()
-                matches, cursor_start, cursor_end = self._suggest_magic_command(code, new_cursor_pos)
-                cursor_start += match.span()[0]
-                cursor_end += match.span()[0]
-            elif match.span()[0] <= cursor_pos <= match.span()[1]:
-                new_cursor_pos = cursor_pos - match.start('args')
-                code = match.group('args')
-                command = match.group('command')[1:].strip()
-                matches, cursor_start, cursor_end = self._suggest_magics_arguments(command, code, new_cursor_pos)
-                cursor_start += match.start('args')
-                cursor_end += match.start('args')
+        line_start = code.rfind('\n', 0, cursor_pos) + 1
+        line_end = code.find('\n', cursor_pos)
+        line = code[line_start:line_end if line_end != -1 else len(code)]
+        if line.startswith('%'):
+            matches, cursor_start, cursor_end = self._suggest_line(line, cursor_pos - line_start)
+        else:
+            matches, cursor_start, cursor_end = self._suggest_magic_body(
+                code, line_start, line, cursor_pos - line_start
+            )
         return {
             'matches': matches,
-            'cursor_end': cursor_end,
-            'cursor_start': cursor_start
+            'cursor_end': cursor_end + line_start,
+            'cursor_start': cursor_start + line_start
         }
 
+    def _suggest_line(self, line: str, cursor_pos: int) -> Tuple[List[str], int, int]:
+        match = self._line_classifier.match(line)
+        if match is None or cursor_pos > match.end():
+            return [], cursor_pos, cursor_pos
+        if cursor_pos <= match.end('command'):
+            key = (match.group(), cursor_pos)
+            suggestions = self._suggestions_cache.get(key, None)
+            if suggestions is None:
+                suggestions = self._suggest_magic_command(match.group(), cursor_pos)
+                self._suggestions_cache[key] = suggestions
+                while len(self._suggestions_cache) > self.CACHE_SIZE:
+                    self._suggestions_cache.popitem(last=False)
+            matches, cursor_start, cursor_end = suggestions
+            return list(matches), cursor_start, cursor_end
+        # the suggestions of the arguments depend on the state of the kernel, so they are not memoized
+        command = match.group('command')[1:].strip()
+        matches, cursor_start, cursor_end = self._suggest_magics_arguments(
+            command, match.group('args'), cursor_pos - match.start('args')
+        )
+        return matches, cursor_start + match.start('args'), cursor_end + match.start('args')
+
+    def _suggest_magic_body(self, code: str, line_start: int, line: str,
+                            cursor_pos: int) -> Tuple[List[str], int, int]:
+        """Suggests with the body suggester of the nearest magic command above the line"""
+        magic_start = code.rfind('\n%', 0, line_start)
+        if magic_start != -1:
+            magic_start += 1
+        elif code.startswith('%'):
+            magic_start = 0
+        else:
+            return [], cursor_pos, cursor_pos
+        magic_end = code.find('\n', magic_start)
+        match = self._line_classifier.match(code[magic_start:magic_end])
+        suggester = self._magics_body_suggesters.get(match.group('command')[1:].strip(), None) \
+            if match is not None else None
+        if suggester is None:
+            return [], cursor_pos, cursor_pos
+        return suggester(match.group('args'), line, cursor_pos)
+
     def _suggest_magic_command(self, code: str, cursor_pos: int) -> Tuple[List[str], int, int]:
         cursor_end, cursor_start, token = self._parse_tokens(code, cursor_pos)
         if token == '%':
             token = ''
-        try:
-            matches = [m for m in set(self._commands_trie.values(prefix=token))]
-            matches.sort(key=len)
-        except KeyError:
-            matches = []
+        matches = self._commands_trie.suggest(token)
+        if len(matches) == 0:
             cursor_end = cursor_pos
             cursor_start = cursor_pos
         return matches, cursor_start, cursor_end
@@ -71,6 +109,14 @@ class AutoCompleteEngine:
     def add_magic_commands_suggester(self, magic_name: str, suggester: Callable) -> None:
         self._magics_args_suggesters[magic_name] = suggester
 
+    def add_magic_body_suggester(self, magic_name: str, suggester: Callable) -> None:
+        """
+        @param magic_name: the name of the magic command
+        @param suggester: a function which is called with the arguments of the magic command, the line of the cursor
+        and the position of the cursor in the line and returns the matches and their start and end in the line
+        """
+        self._magics_body_suggesters[magic_name] = suggester
+
     @classmethod
     def _parse_tokens(cls, code, cursor_pos):
         code_length = len(code)
@@ -88,5 +134,7 @@ class AutoCompleteEngine:
         return cursor_end, cursor_start, token
 
     def add_magic_command(self, magic_command_name: str):
+        # every suffix is a key, so the commands which contain the token are suggested
         for i in range(1, len(magic_command_name) + 1):
-            self._commands_trie[magic_command_name[-i:].upper()] = magic_command_name
+            self._commands_trie.add(magic_command_name[-i:].upper(), magic_command_name)
+        self._suggestions_cache.clear()
@@ -1,19 +1,66 @@
 import os
-from typing import Dict, Tuple, Callable
+import re
+from urllib.parse import urlparse
+from typing import Dict, Tuple, Callable, Optional
 
 
 # TODO: use tempfile for windows compatibility
 
+def _is_positive_number(value: Optional[str]) -> bool:
+    if value is None:
+        return True
+    try:
+        return float(value) > 0
+    except ValueError:
+        return False
+
+
 class CWLExecuteConfigurator:
     CWLKERNEL_MODE: str
     CWLKERNEL_BOOT_DIRECTORY: str
     CWLKERNEL_MAGIC_COMMANDS_DIRECTORY: str
+    CWLKERNEL_MAX_CORES: Optional[str]
+    CWLKERNEL_MAX_RAM: Optional[str]
+    CWLKERNEL_RESULTS_INGESTION: str
+    CWLKERNEL_RESULTS_SESSION: Optional[str]
+    CWLKERNEL_EXECUTION_CACHE: str
+    CWLKERNEL_EXECUTION_CACHE_MAX_SIZE: Optional[str]
+    CWLKERNEL_EXECUTION_CACHE_MAX_AGE: Optional[str]
+    CWLKERNEL_CSV_MAX_ROWS: str
+    CWLKERNEL_GITHUB_API_URL: str
+    CWLKERNEL_MAX_CONCURRENT_JOBS: str
+    CWLKERNEL_DISK_QUOTA: Optional[str]
+    CWLKERNEL_STREAM_OUTPUT: str
 
     # property "Name of the property": ("default", validator)
     properties: Dict[str, Tuple[str, Callable]] = {
-        'CWLKERNEL_MODE': ('SIMPLE', lambda value: value.upper() in {'SIMPLE'}),  # no case sensitive
+        'CWLKERNEL_MODE': ('SIMPLE', lambda value: value.upper() in {'SIMPLE', 'PARALLEL'}),  # no case sensitive
         'CWLKERNEL_BOOT_DIRECTORY': ('/tmp/CWLKERNEL_DATA', lambda value: True),
-        'CWLKERNEL_MAGIC_COMMANDS_DIRECTORY': (None, lambda value: value is None or os.path.isdir(value))
+        'CWLKERNEL_MAGIC_COMMANDS_DIRECTORY': (None, lambda value: value is None or os.path.isdir(value)),
+        # limits of the parallel mode, cores and RAM in MiB
+        'CWLKERNEL_MAX_CORES': (None, _is_positive_number),
+        'CWLKERNEL_MAX_RAM': (None, _is_positive_number),
+        # how the results are stored in the results directory, check IOFileManager.INGESTION_STRATEGIES
+        'CWLKERNEL_RESULTS_INGESTION': ('LINK', lambda value: value.upper() in {'COPY', 'LINK'}),
+        # name of a persistent results session, kernels with the same value share their results across restarts
+        'CWLKERNEL_RESULTS_SESSION': (None, lambda value: value is None or re.match(r'^[\w.-]+$', value) is not None),
+        # reuse the results of executions with the same tool and inputs, max size in MiB and max age in seconds. It is
+        # disabled by default, tools may not be deterministic or may depend on the network or the clock
+        'CWLKERNEL_EXECUTION_CACHE': ('FALSE', lambda value: value.upper() in {'TRUE', 'FALSE'}),
+        'CWLKERNEL_EXECUTION_CACHE_MAX_SIZE': (None, _is_positive_number),
+        'CWLKERNEL_EXECUTION_CACHE_MAX_AGE': (None, _is_positive_number),
+        # the maximum number of rows that the csv magic commands render
+        'CWLKERNEL_CSV_MAX_ROWS': ('1000', _is_positive_number),
+        # the api which githubImport fetches the tools from, e.g. of a github enterprise server
+        'CWLKERNEL_GITHUB_API_URL': (
+            'https://api.github.com', lambda value: urlparse(value).scheme in {'http', 'https'}
+        ),
+        # the number of the jobs, submitted with executeAsync, which run at the same time
+        'CWLKERNEL_MAX_CONCURRENT_JOBS': ('1', lambda value: value.isdigit() and int(value) > 0),
+        # the maximum size in MiB of the results of a session, the least recently used results are evicted
+        'CWLKERNEL_DISK_QUOTA': (None, _is_positive_number),
+        # forward the stdout and the stderr of the jobs while they run, by default they are discarded
+        'CWLKERNEL_STREAM_OUTPUT': ('FALSE', lambda value: value.upper() in {'TRUE', 'FALSE'}),
     }
 
     def __init__(self):
@@ -3,24 +3,34 @@ import logging
 import os
 import re
 import shutil
+import threading
 import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
 from copy import deepcopy
-from io import StringIO
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple, Union, Callable, NoReturn
+from urllib.parse import urlparse
+from uuid import uuid4
 
 from cwltool.provenance import ResearchObject
 from ipykernel.kernelbase import Kernel
-from ruamel import yaml
 from ruamel.yaml import YAML
 
 from .AutoCompleteEngine import AutoCompleteEngine
 from .CWLExecuteConfigurator import CWLExecuteConfigurator
 from .CWLLogger import CWLLogger
+from .CompletionIndex import CompletionIndex
 from .CoreExecutor import CoreExecutor
+from .ExecutionCache import ExecutionCache
 from .IOManager import IOFileManager, ResultsManager
+from .OutputStreamer import OutputStreamer
+from .RunProfiler import RunProfiler
+from .RunsJanitor import RunsJanitor
+from .WorkflowVisualizer import WorkflowVisualizer
 from .cwlrepository.CWLComponent import WorkflowComponentFactory
 from .cwlrepository.cwlrepository import WorkflowRepository
+from .git.CWLGitCloneResolver import CWLGitCloneResolver
 from .git.CWLGitResolver import CWLGitResolver
 
 version = "0.0.4"
@@ -47,9 +57,23 @@ class CWLKernel(Kernel):
         super().__init__(**kwargs)
         self._session_dir: str = os.path.join(CONF.CWLKERNEL_BOOT_DIRECTORY, self.ident)
         self._boot_directory: Path = BOOT_DIRECTORY
-        self._yaml_input_data: Optional[str] = None
-        self._results_manager: ResultsManager = ResultsManager(os.path.join(self._session_dir, 'results'))
+        # the parsed input data of the next execution
+        self._input_data: Optional[Dict] = None
         runtime_file_manager = IOFileManager(os.path.join(self._session_dir, 'runtime_data'))
+        if CONF.CWLKERNEL_RESULTS_SESSION is None:
+            results_directory = os.path.join(self._session_dir, 'results')
+        else:
+            results_directory = os.path.join(CONF.CWLKERNEL_BOOT_DIRECTORY, 'results', CONF.CWLKERNEL_RESULTS_SESSION)
+        self._results_manager: ResultsManager = ResultsManager(
+            results_directory,
+            ingestion_strategy=CONF.CWLKERNEL_RESULTS_INGESTION,
+            owned_directories=[runtime_file_manager.ROOT_DIRECTORY],
+            persistent=CONF.CWLKERNEL_RESULTS_SESSION is not None
+        )
+        self._completion_index: CompletionIndex = CompletionIndex()
+        self._results_manager.add_listener(self._on_result_change)
+        # the results of a previous session are indexed when its catalog is loaded
+        self._results_manager.load_catalog()
         self._cwl_executor: CoreExecutor = CoreExecutor(runtime_file_manager, self._boot_directory)
         self._pid = (os.getpid(), os.getppid())
         self._cwl_logger: CWLLogger = CWLLogger(os.path.join(CONF.CWLKERNEL_BOOT_DIRECTORY, self.ident, 'logs'))
@@ -57,11 +81,34 @@ class CWLKernel(Kernel):
         self._cwl_logger.save()
         self._workflow_repository: WorkflowRepository = WorkflowRepository(
             Path(os.sep.join([CONF.CWLKERNEL_BOOT_DIRECTORY, self.ident, 'repo'])))
+        for tool in self._workflow_repository:
+            self._completion_index.add_tool(tool.id, [tool_input['id'] for tool_input in tool.inputs])
+        self._workflow_repository.add_listener(self._on_workflow_repository_change)
         self._github_resolver: CWLGitResolver = CWLGitResolver(
+            Path(os.sep.join([CONF.CWLKERNEL_BOOT_DIRECTORY, self.ident, 'git'])), CONF.CWLKERNEL_GITHUB_API_URL)
+        self._git_clone_resolver: CWLGitCloneResolver = CWLGitCloneResolver(
             Path(os.sep.join([CONF.CWLKERNEL_BOOT_DIRECTORY, self.ident, 'git'])))
         if self.log is None:  # pylint: disable=access-member-before-definition
             self.log = logging.getLogger()
         self._history: List[Tuple[str, str]] = []
+        self._execution_lock = threading.Lock()
+        self._jobs_executor = ThreadPoolExecutor(max_workers=int(CONF.CWLKERNEL_MAX_CONCURRENT_JOBS))
+        self._jobs: Dict[str, Tuple[str, Future]] = OrderedDict()
+        self._profiles: Dict[str, Dict] = OrderedDict()
+        self._execution_cache: ExecutionCache = ExecutionCache(
+            max_size=int(float(CONF.CWLKERNEL_EXECUTION_CACHE_MAX_SIZE) * 2 ** 20)
+            if CONF.CWLKERNEL_EXECUTION_CACHE_MAX_SIZE is not None else None,
+            max_age=float(CONF.CWLKERNEL_EXECUTION_CACHE_MAX_AGE)
+            if CONF.CWLKERNEL_EXECUTION_CACHE_MAX_AGE is not None else None
+        )
+        self._runs_janitor: RunsJanitor = RunsJanitor(
+            runtime_file_manager.ROOT_DIRECTORY,
+            self._results_manager.ROOT_DIRECTORY,
+            quota=int(float(CONF.CWLKERNEL_DISK_QUOTA) * 2 ** 20) if CONF.CWLKERNEL_DISK_QUOTA is not None else None,
+            on_evict=self._on_run_evicted
+        )
+        self._runs_janitor.start()
+        self._workflow_visualizer: WorkflowVisualizer = WorkflowVisualizer()
 
     @property
     def runtime_directory(self) -> Path:
@@ -75,6 +122,32 @@ class CWLKernel(Kernel):
     def results_manager(self) -> ResultsManager:
         return self._results_manager
 
+    @property
+    def execution_cache(self) -> ExecutionCache:
+        return self._execution_cache
+
+    @property
+    def runs_janitor(self) -> RunsJanitor:
+        return self._runs_janitor
+
+    @property
+    def workflow_visualizer(self) -> WorkflowVisualizer:
+        return self._workflow_visualizer
+
+    @property
+    def completion_index(self) -> CompletionIndex:
+        return self._completion_index
+
+    def get_profile(self, run_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        @param run_id: the id of the run. If it is None the profile of the last profiled run is returned
+        @return: the time and the resources used by the run and by every step of it or None if the run is not profiled
+        """
+        with self._execution_lock:
+            if run_id is None:
+                return next(reversed(self._profiles.values()), None)
+            return self._profiles.get(run_id, None)
+
     @property
     def history(self) -> List[Tuple[str, str]]:
         """Returns a list of executed cells in the current session.
@@ -103,6 +176,47 @@ class CWLKernel(Kernel):
             CWLKernel._auto_complete_engine.add_magic_commands_suggester(self._magic_command_name, suggester)
             return suggester
 
+    class register_magics_body_suggester:
+        """Decorator for registering functions for suggesting the lines which follow a magic command"""
+
+        def __init__(self, magic_command_name: str):
+            self._magic_command_name = magic_command_name
+
+        def __call__(self, suggester):
+            CWLKernel._auto_complete_engine.add_magic_body_suggester(self._magic_command_name, suggester)
+            return suggester
+
+    def _on_workflow_repository_change(self, tool_id: str, path: Path) -> None:
+        self._cwl_executor.invalidate_cache(path.as_posix())
+        self._execution_cache.invalidate(path)
+        self._workflow_visualizer.invalidate(tool_id)
+        tool = self._workflow_repository.get_by_id(tool_id)
+        if tool is not None:
+            self._completion_index.add_tool(tool_id, [tool_input['id'] for tool_input in tool.inputs])
+        else:
+            self._completion_index.remove_tool(tool_id)
+
+    def _on_result_change(self, reference: str, added: bool) -> None:
+        if added:
+            self._completion_index.add_result(reference)
+        else:
+            self._completion_index.remove_result(reference)
+
+    def _on_run_evicted(self, run_id: str) -> None:
+        with self._execution_lock:
+            self._results_manager.remove_directory(run_id)
+            self._profiles.pop(run_id, None)
+
+    def _send_stream(self, name: str, text: str) -> None:
+        self.send_response(self.iopub_socket, 'stream', {'name': name, 'text': text})
+
+    def _touch_results(self, locations: List[str]) -> None:
+        """Marks the runs which produced the results as recently used, so the janitor evicts them last."""
+        for location in locations:
+            run_id = self._runs_janitor.run_of_path(urlparse(location).path)
+            if run_id is not None:
+                self._runs_janitor.touch(run_id)
+
     def _set_process_ids(self):
         self._cwl_logger.process_id = {
             "process_id": os.getpid(),
@@ -110,9 +224,9 @@ class CWLKernel(Kernel):
         }
 
     def _code_is_valid_yaml(self, code: str) -> Optional[Dict]:
-        yaml = YAML(typ='safe')
         try:
-            return yaml.load(code)
+            # the C based safe loader of ruamel, it keeps the YAML 1.2 semantics of CWL
+            return YAML(typ='safe', pure=False).load(code)
         except Exception:
             return None
 
@@ -137,7 +251,7 @@ class CWLKernel(Kernel):
                 if dict_code is None:
                     raise RuntimeError('Input cannot be parsed')
                 else:
-                    self._do_execute_yaml(dict_code, code)
+                    self._do_execute_yaml(dict_code)
                     self._history.append(('register', code))
         except Exception as e:
             status = 'error'
@@ -154,11 +268,12 @@ class CWLKernel(Kernel):
                 'user_expressions': {},
             }
 
-    def _do_execute_yaml(self, dict_code, code):
+    def _do_execute_yaml(self, dict_code: Dict):
         if not self._is_cwl(dict_code):
             raise NotImplementedError()
         else:
-            cwl_component = WorkflowComponentFactory().get_workflow_component(code)
+            # the cell has been already parsed, so the component is created from the parsed code
+            cwl_component = WorkflowComponentFactory().get_workflow_component_from_dict(dict_code)
             self._workflow_repository.register_tool(cwl_component)
             self.send_response(
                 self.iopub_socket, 'stream',
@@ -213,11 +328,9 @@ class CWLKernel(Kernel):
     def _set_data(self, code: str) -> NoReturn:
         if len(code.split()) > 0:
             cwd = Path(self._cwl_executor.file_manager.get_files_uri().path)
-            data = self._preprocess_data(yaml.load(code, Loader=yaml.Loader))
+            data = self._preprocess_data(YAML(typ='safe', pure=False).load(code))
             self._cwl_executor.validate_input_files(data, cwd)
-            code_stream = StringIO()
-            yaml.safe_dump(data, code_stream)
-            self._yaml_input_data = code_stream.getvalue()
+            self._input_data = data
             self.send_response(self.iopub_socket, 'stream', {'name': 'stdout', 'text': 'Add data in memory'})
 
     def _preprocess_data(self, data: Dict) -> Dict:
@@ -239,6 +352,8 @@ class CWLKernel(Kernel):
                 if os.path.split(data[key_id]["$data"])[0].strip() == '':
                     raise ValueError("Missing tool id: [tool_id]/[input_id]")
                 data[key_id]['location'] = self._results_manager.get_last_result_by_id(data[key_id]["$data"])
+                if data[key_id]['location'] is not None:
+                    self._touch_results([data[key_id]['location']])
                 data[key_id].pop('$data')
         if has_change is True:
             self.send_text_to_stdout('set data to:\n')
@@ -246,49 +361,197 @@ class CWLKernel(Kernel):
         return data
 
     def _clear_data(self):
-        self._yaml_input_data = None
-
-    def _execute_workflow(self, code_path: Path, tool_id: str, provenance: bool = False) -> Optional[Exception]:
-        input_data = [self._yaml_input_data] if self._yaml_input_data is not None else []
-        self._cwl_executor.set_data(input_data)
-        self._cwl_executor.set_workflow_path(str(code_path))
-        self.log.debug('starting executing workflow ...')
-        run_id, results, exception, research_object = self._cwl_executor.execute(provenance)
-        for result in results:
-            if isinstance(results[result], list):
-                for res in results[result]:
+        self._input_data = None
+
+    @classmethod
+    def _get_executor_options(cls, parallel: Optional[bool] = None, max_cores: Optional[float] = None,
+                              max_ram: Optional[int] = None, cache: Optional[bool] = None,
+                              stream: Optional[bool] = None) -> Dict:
+        """
+        Merges the options of a single execution with the kernel's configuration.
+        @return: the keyword arguments for the CoreExecutor.execute and the cache and stream flags
+        """
+        if cache is None:
+            cache = CONF.CWLKERNEL_EXECUTION_CACHE.upper() == 'TRUE'
+        if stream is None:
+            stream = CONF.CWLKERNEL_STREAM_OUTPUT.upper() == 'TRUE'
+        if parallel is None:
+            parallel = CONF.CWLKERNEL_MODE.upper() == 'PARALLEL'
+        if max_cores is None and CONF.CWLKERNEL_MAX_CORES is not None:
+            max_cores = float(CONF.CWLKERNEL_MAX_CORES)
+        if max_ram is None and CONF.CWLKERNEL_MAX_RAM is not None:
+            max_ram = int(CONF.CWLKERNEL_MAX_RAM)
+        return {'parallel': parallel, 'max_cores': max_cores, 'max_ram': max_ram, 'cache': cache, 'stream': stream}
+
+    def _get_execution_cache_key(self, code_path: Path, job_order: Dict) -> Optional[str]:
+        try:
+            return self._execution_cache.compute_key(code_path, job_order, self.runtime_directory)
+        except Exception as e:
+            self.log.debug(f'execution cache key cannot be computed: {e}')
+            return None
+
+    def _execute_workflow(self, code_path: Path, tool_id: str, provenance: bool = False,
+                          input_data: Optional[List[Dict]] = None,
+                          executor_options: Optional[Dict] = None) -> Optional[Exception]:
+        if input_data is None:
+            input_data = [self._input_data] if self._input_data is not None else []
+        executor_options = dict(executor_options if executor_options is not None else self._get_executor_options())
+        use_cache = executor_options.pop('cache', False) and not provenance
+        stream = executor_options.pop('stream', False)
+        job_order = CoreExecutor.merge_data(input_data)
+        # the executions run concurrently, only the access to the cache and to the results is serialized
+        with self._execution_lock:
+            cache_key = self._get_execution_cache_key(code_path, job_order) if use_cache else None
+            results = self._execution_cache.get(cache_key) if cache_key is not None else None
+        cache_hit = results is not None
+        profile = None
+        if cache_hit:
+            run_id, exception, research_object = uuid4(), None, None
+            # the results are marked as reused, the profile of the run which produced them does not describe that run
+            for result in results.values():
+                for res in (result if isinstance(result, list) else [result]):
+                    res.pop('_profile', None)
+                    res['_cache_hit'] = True
+            self._touch_results([
+                result['location'] for output in results.values()
+                for result in (output if isinstance(output, list) else [output])
+            ])
+            self.send_text_to_stdout(f'results of {tool_id} loaded from the execution cache\n')
+        else:
+            self.log.debug('starting executing workflow ...')
+            streamer = OutputStreamer(self._send_stream) if stream else None
+            if streamer is not None:
+                streamer.add_logger(logging.getLogger('cwltool'))
+                # the parallel jobs log from their own threads
+                executor_options = {
+                    **executor_options, 'stdout': streamer.stdout, 'stderr': streamer.stderr,
+                    'job_context': streamer.attach_thread
+                }
+            profiler = RunProfiler()
+            try:
+                run_id, results, exception, research_object = self._cwl_executor.execute(
+                    provenance, workflow_path=str(code_path), job_order=job_order, profiler=profiler,
+                    **executor_options)
+            finally:
+                if streamer is not None:
+                    streamer.close()
+            profile = {'run_id': str(run_id), 'tool_id': tool_id, **profiler.profile()}
+        with self._execution_lock:
+            for result in results:
+                for res in (results[result] if isinstance(results[result], list) else [results[result]]):
                     res['_produced_by'] = tool_id
-            else:
-                results[result]['_produced_by'] = tool_id
-        self.log.debug(f'\texecution results: {run_id}, {results}, {exception}')
-        output_directory_for_that_run = str(run_id)
-        self.__store_results__(output_directory_for_that_run, results, research_object)
+                    if profile is not None:
+                        res['_profile'] = {key: value for key, value in profile.items() if key != 'steps'}
+            if profile is not None:
+                self._profiles[str(run_id)] = profile
+            self.log.debug(f'\texecution results: {run_id}, {results}, {exception}')
+            output_directory_for_that_run = str(run_id)
+            stored_results = self.__store_results__(output_directory_for_that_run, results, research_object)
+            if cache_key is not None and not cache_hit and exception is None:
+                self._execution_cache.put(cache_key, tool_id, code_path, results, stored_results)
+        self._runs_janitor.add_run(output_directory_for_that_run)
         self.send_json_response(results)
         if exception is not None:
             self.log.debug(f'execution error: {exception}')
             self.send_response(self.iopub_socket, 'stream', {'name': 'stderr', 'text': str(exception)})
         return exception
 
+    def _submit_workflow(self, code_path: Path, tool_id: str, provenance: bool = False,
+                         executor_options: Optional[Dict] = None) -> str:
+        """
+        Schedules the execution of a workflow in the background. The input data are captured at the time of the
+        submission.
+        @param code_path: the path of the workflow
+        @param tool_id: the id of the workflow
+        @param provenance: Execute with provenance enabled/disabled.
+        @param executor_options: the keyword arguments for the CoreExecutor.execute
+        @return: the id of the job
+        """
+        input_data = [self._input_data] if self._input_data is not None else []
+        job_id = str(len(self._jobs) + 1)
+        future = self._jobs_executor.submit(
+            self._run_job, job_id, code_path, tool_id, provenance, input_data, executor_options
+        )
+        self._jobs[job_id] = (tool_id, future)
+        return job_id
+
+    def _run_job(self, job_id: str, code_path: Path, tool_id: str, provenance: bool,
+                 input_data: List[Dict], executor_options: Optional[Dict]) -> Optional[Exception]:
+        try:
+            exception = self._execute_workflow(code_path, tool_id, provenance, input_data, executor_options)
+        except Exception as e:
+            self.send_error_response(f"job {job_id} ({tool_id}) failed: {e}\n")
+            raise
+        if exception is not None:
+            self.send_error_response(f"job {job_id} ({tool_id}) failed\n")
+        else:
+            self.send_text_to_stdout(f"job {job_id} ({tool_id}) finished\n")
+        return exception
+
+    @classmethod
+    def _get_job_status(cls, future: Future) -> str:
+        if future.running():
+            return 'running'
+        if not future.done():
+            return 'pending'
+        if future.cancelled() or future.exception() is not None or future.result() is not None:
+            return 'failed'
+        return 'done'
+
+    def get_jobs(self) -> List[Dict]:
+        """
+        @return: A list with the id, the tool's id and the status of every job submitted in the current session
+        """
+        return [
+            {'job_id': job_id, 'tool_id': tool_id, 'status': self._get_job_status(future)}
+            for job_id, (tool_id, future) in self._jobs.items()
+        ]
+
+    def wait_jobs(self, job_ids: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Blocks until the requested jobs finish.
+        @param job_ids: the ids of the jobs to wait. If it is None the kernel waits for all of them
+        @return: the status of the jobs
+        """
+        if job_ids is None:
+            job_ids = list(self._jobs.keys())
+        for job_id in job_ids:
+            if job_id not in self._jobs:
+                raise KeyError(f'job {job_id} does not exist')
+        for job_id in job_ids:
+            _, future = self._jobs[job_id]
+            try:
+                future.result()
+            except Exception:
+                pass
+        return [job for job in self.get_jobs() if job['job_id'] in job_ids]
+
     def __store_results__(self, output_directory_for_that_run: str, results: Dict,
-                          research_object: Optional[ResearchObject]):
+                          research_object: Optional[ResearchObject]) -> Dict[str, Union[str, List[str]]]:
+        """
+        Stores the results in the results manager.
+        @return: the paths of the stored results, with the same structure as the results
+        """
+        stored_results = {}
         for output in results:
             if isinstance(results[output], list):
+                stored_results[output] = []
                 for i, _ in enumerate(results[output]):
                     results[output][i]['id'] = f'{output}_{i + 1}'
-                    results[output][i]['result_counter'] = self._results_manager.files_counter
-                    self._results_manager.append_files(
+                    results[output][i]['result_counter'] = self._results_manager.next_result_counter()
+                    stored_results[output].extend(self._results_manager.append_files(
                         [results[output][i]['location']],
                         output_directory_for_that_run,
                         metadata=results[output][i]
-                    )
+                    ))
             else:
                 results[output]['id'] = output
-                results[output]['result_counter'] = self._results_manager.files_counter
-                self._results_manager.append_files(
+                results[output]['result_counter'] = self._results_manager.next_result_counter()
+                stored_results[output] = self._results_manager.append_files(
                     [results[output]['location']],
                     output_directory_for_that_run,
                     metadata=results[output]
-                )
+                )[0]
         if research_object is not None:
             self.send_text_to_stdout(f'\nProvenance stored in directory {research_object.folder}')
             for path, _, files in os.walk(research_object.folder):
@@ -305,6 +568,7 @@ class CWLKernel(Kernel):
                             'metadata': {},
                         },
                     )
+        return stored_results
 
     def get_past_results(self) -> List[str]:
         return self._results_manager.get_files()
@@ -326,6 +590,8 @@ class CWLKernel(Kernel):
         self.send_response(self.iopub_socket, 'stream', {'name': 'stdout', 'text': text})
 
     def __del__(self):
+        self._jobs_executor.shutdown(wait=False)
+        self._runs_janitor.stop(wait=False)
         shutil.rmtree(self._session_dir, ignore_errors=True)
 
 
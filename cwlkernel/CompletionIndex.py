@@ -0,0 +1,68 @@
+import threading
+from typing import Dict, Iterable, List
+
+from .CompletionTrie import CompletionTrie
+
+
+class CompletionIndex:
+    """
+    CompletionIndex keeps the names which the user refers to in the cells: the ids of the registered tools, the ids of
+    their inputs and the references of the stored results, [tool id]/[output id], which are used as $data. It is
+    updated incrementally when a tool is registered or deleted and when a result is stored or removed. The lookups are
+    case insensitive.
+    """
+
+    def __init__(self, top_k: int = 100):
+        """
+        @param top_k: the maximum number of suggestions of a lookup
+        """
+        self.top_k = top_k
+        self._tools = CompletionTrie(top_k)
+        self._inputs: Dict[str, CompletionTrie] = {}
+        self._results = CompletionTrie(top_k)
+        self._lock = threading.Lock()
+
+    def add_tool(self, tool_id: str, inputs_ids: Iterable[str]) -> None:
+        """Adds a tool or replaces the inputs of an existing one."""
+        inputs = CompletionTrie(self.top_k)
+        for input_id in inputs_ids:
+            inputs.add(input_id.upper(), input_id)
+        with self._lock:
+            self._tools.add(tool_id.upper(), tool_id)
+            self._inputs[tool_id] = inputs
+
+    def remove_tool(self, tool_id: str) -> None:
+        with self._lock:
+            self._tools.remove(tool_id.upper(), tool_id)
+            self._inputs.pop(tool_id, None)
+
+    def add_result(self, reference: str) -> None:
+        """
+        @param reference: the reference of a result, [tool id]/[output id]. It is found by both of its parts
+        """
+        with self._lock:
+            for key in self._result_keys(reference):
+                self._results.add(key, reference)
+
+    def remove_result(self, reference: str) -> None:
+        with self._lock:
+            for key in self._result_keys(reference):
+                self._results.remove(key, reference)
+
+    @classmethod
+    def _result_keys(cls, reference: str) -> List[str]:
+        reference = reference.upper()
+        return [reference, reference.split('/', 1)[1]] if '/' in reference else [reference]
+
+    def suggest_tools(self, prefix: str) -> List[str]:
+        with self._lock:
+            return self._tools.suggest(prefix.upper())
+
+    def suggest_inputs(self, tool_id: str, prefix: str) -> List[str]:
+        with self._lock:
+            inputs = self._inputs.get(tool_id, None)
+            return inputs.suggest(prefix.upper()) if inputs is not None else []
+
+    def suggest_results(self, prefix: str) -> List[str]:
+        with self._lock:
+            return self._results.suggest(prefix.upper())
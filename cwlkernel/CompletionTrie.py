@@ -0,0 +1,85 @@
+import heapq
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class _Node:
+    __slots__ = ('children', 'values', 'best')
+
+    def __init__(self):
+        self.children: Dict[str, '_Node'] = {}
+        # the values of the keys which end at that node
+        self.values: Set[Tuple[int, str]] = set()
+        # the best ranked values of the keys which start with the prefix of the node, sorted by rank
+        self.best: List[Tuple[int, str]] = []
+
+
+class CompletionTrie:
+    """
+    CompletionTrie maps keys to values and finds the best ranked values of the keys which start with a prefix. Every
+    node keeps the top_k values of its subtree, so a lookup costs the length of the prefix plus the number of the
+    returned values, regardless of how many keys match. A value can be added with multiple keys and it is returned
+    once. The values are ranked by their rank, by default their length, and then alphabetically.
+    """
+
+    def __init__(self, top_k: int = 100):
+        """
+        @param top_k: the maximum number of values that a lookup returns
+        """
+        self.top_k = top_k
+        self._root = _Node()
+
+    def add(self, key: str, value: str, rank: Optional[int] = None) -> None:
+        entry = (rank if rank is not None else len(value), value)
+        node = self._root
+        path = [node]
+        for char in key:
+            node = node.children.setdefault(char, _Node())
+            path.append(node)
+        node.values.add(entry)
+        for node in path:
+            if entry in node.best:
+                continue
+            if len(node.best) < self.top_k or entry < node.best[-1]:
+                node.best.append(entry)
+                node.best.sort()
+                del node.best[self.top_k:]
+
+    def remove(self, key: str, value: str) -> None:
+        """Removes the value from that key, the value is still returned for the rest of its keys."""
+        node = self._root
+        path = [node]
+        for char in key:
+            node = node.children.get(char, None)
+            if node is None:
+                return
+            path.append(node)
+        node.values = {entry for entry in node.values if entry[1] != value}
+        # the lists of the nodes are rebuilt bottom up from the lists of their children
+        for node in reversed(path):
+            node.best = heapq.nsmallest(
+                self.top_k, set(node.values).union(*(child.best for child in node.children.values()))
+            )
+        for parent, char, node in reversed(list(zip(path, key, path[1:]))):
+            if len(node.best) == 0 and len(node.children) == 0:
+                parent.children.pop(char)
+
+    def suggest(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """
+        @param prefix: the prefix of the keys
+        @param limit: the maximum number of values, by default top_k
+        @return: the best ranked values of the keys which start with the prefix
+        """
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char, None)
+            if node is None:
+                return []
+        return [value for _, value in node.best[:limit if limit is not None else self.top_k]]
+
+    def __contains__(self, prefix: str) -> bool:
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char, None)
+            if node is None:
+                return False
+        return len(node.best) > 0
@@ -1,9 +1,12 @@
 import functools
+import hashlib
 import logging
 import os
 import sys
 import tempfile
+import threading
 import traceback
+from copy import deepcopy
 from pathlib import Path
 from subprocess import DEVNULL
 from typing import (
@@ -11,12 +14,15 @@ from typing import (
     List,
     Optional,
     Tuple,
-    NoReturn, cast, IO, MutableMapping, MutableSequence)
+    Union,
+    NoReturn, cast, IO, MutableMapping, MutableSequence, Type, Callable, ContextManager)
 from uuid import uuid4, UUID
 
+from cwltool.command_line_tool import CommandLineTool
 from cwltool.context import RuntimeContext, LoadingContext
-from cwltool.executors import JobExecutor
-from cwltool.factory import Factory
+from cwltool.executors import JobExecutor, SingleJobExecutor, MultithreadedJobExecutor
+from cwltool.factory import Factory, Callable as ExecutableProcess, WorkflowStatus
+from cwltool.job import JobBase
 from cwltool.load_tool import fetch_document
 from cwltool.loghandler import _logger
 from cwltool.main import ProvLogFormatter, prov_deps
@@ -24,9 +30,53 @@ from cwltool.process import add_sizes
 from cwltool.provenance import ResearchObject
 from cwltool.stdfsaccess import StdFsAccess
 from cwltool.utils import CWLObjectType, visit_class, DEFAULT_TMP_PREFIX
-from ruamel import yaml
+from cwltool.workflow import default_make_tool
+from ruamel.yaml import YAML
 
 from .IOManager import IOFileManager
+from .RunProfiler import RunProfiler
+
+
+class _ProfiledJob:
+    """
+    Mixin for the jobs of cwltool. The profiler of the run is taken from the runtime context and the process of the
+    job is profiled while cwltool monitors it. The jobs in containers are monitored by docker and they are not
+    profiled. The job runs in the job context of the run, if there is one.
+    """
+
+    _profiler: Optional[RunProfiler] = None
+
+    def run(self, runtimeContext: RuntimeContext, *args, **kwargs) -> None:
+        self._profiler = getattr(runtimeContext, 'profiler', None)
+        job_context = getattr(runtimeContext, 'job_context', None)
+        if job_context is None:
+            return super().run(runtimeContext, *args, **kwargs)
+        with job_context():
+            super().run(runtimeContext, *args, **kwargs)
+
+    def process_monitor(self, sproc) -> None:
+        if self._profiler is None:
+            return super().process_monitor(sproc)
+        with self._profiler.profile_step(self.name, sproc.pid):
+            super().process_monitor(sproc)
+
+
+class ProfiledCommandLineTool(CommandLineTool):
+    _job_runners: Dict[Type[JobBase], Type[JobBase]] = {}
+
+    def make_job_runner(self, runtimeContext: RuntimeContext) -> Type[JobBase]:
+        job_runner = super().make_job_runner(runtimeContext)
+        if job_runner not in self._job_runners:
+            name = f'Profiled{job_runner.__name__}'
+            self._job_runners[job_runner] = type(name, (_ProfiledJob, job_runner), {})
+        return self._job_runners[job_runner]
+
+
+def make_profiled_tool(toolpath_object: MutableMapping, loading_context: LoadingContext):
+    """Constructs the cwltool processes, the command line tools are replaced by ProfiledCommandLineTool"""
+    if isinstance(toolpath_object, MutableMapping) and toolpath_object.get('class') == 'CommandLineTool':
+        return ProfiledCommandLineTool(toolpath_object, loading_context)
+    return default_make_tool(toolpath_object, loading_context)
 
 
 class JupyterFactory(Factory):
@@ -40,6 +90,7 @@ class JupyterFactory(Factory):
             loading_context=loading_context,
             runtime_context=runtime_context,
         )
+        self.loading_context.construct_tool_object = make_profiled_tool
         self.runtime_context.outdir = root_directory
         self.runtime_context.basedir = root_directory
         self.runtime_context.default_stdout = DEVNULL
@@ -76,7 +127,7 @@ class ProvenanceFactory(JupyterFactory):
         make_fs_access = self.runtime_context.make_fs_access \
             if self.runtime_context.make_fs_access is not None else StdFsAccess
         ro = ResearchObject(
-            make_fs_access(""),
+            make_fs_access(root_directory),
         )
         self.runtime_context.research_obj = ro
         log_file_io = ro.open_log_file_for_activity(ro.engine_uuid)
@@ -91,58 +142,176 @@ class CoreExecutor:
     def __init__(self, file_manager: IOFileManager, provenance_directory: Optional[Path]):
         self.file_manager = file_manager
         self._workflow_path = None
-        self._data_paths = []
+        self._job_order: Dict = {}
         self.provenance_directory = provenance_directory if provenance_directory is not None else tempfile.mkdtemp()
+        self._executables_cache: Dict[Tuple[str, str], ExecutableProcess] = {}
+        self._executables_lock = threading.RLock()
+
+    @classmethod
+    def merge_data(cls, data: List[Union[str, Dict]]) -> Dict:
+        """
+        Merges the input data to a job order. If a key is defined multiple times the first definition is used.
+        :param data: the input data, as yaml strings or as already parsed mappings
+        :return: the job order
+        """
+        job_order = {}
+        for d in data:
+            if isinstance(d, str):
+                d = YAML(typ='safe', pure=False).load(d)
+            job_order = {**(d or {}), **job_order}
+        return job_order
+
+    def set_data(self, data: List[Union[str, Dict]]) -> Dict:
+        """
+        Sets the input data of the next execution. The data are kept in memory.
+        :param data: the input data, as yaml strings or as already parsed mappings
+        :return: the job order
+        """
+        self._job_order = self.merge_data(data)
+        return self._job_order
 
-    def set_data(self, data: List[str]) -> List[str]:
-        self._data_paths = [self.file_manager.write(f'{str(uuid4())}.yml', d.encode()) for d in data]
-        return self._data_paths
+    def get_run_directory(self, run_id: UUID) -> str:
+        """
+        :return: the directory where the outputs of the run are written, every run has its own directory
+        """
+        return os.path.join(self.file_manager.ROOT_DIRECTORY, str(run_id))
 
     def set_workflow_path(self, workflow_str: str) -> str:
         """
         :param workflow_str: the cwl
         :return: the path where we executor stored the workflow
         """
-        self._workflow_path = workflow_str
+        self._workflow_path = os.path.abspath(workflow_str)
         return self._workflow_path
 
-    def execute(self, provenance=False) -> Tuple[UUID, Dict, Optional[Exception], Optional[ResearchObject]]:
+    def execute(self, provenance=False, parallel: bool = False, max_cores: Optional[float] = None,
+                max_ram: Optional[int] = None, workflow_path: Optional[str] = None, job_order: Optional[Dict] = None,
+                stdout: Optional[IO] = None, stderr: Optional[IO] = None, profiler: Optional[RunProfiler] = None,
+                job_context: Optional[Callable[[], ContextManager]] = None
+                ) -> Tuple[UUID, Dict, Optional[Exception], Optional[ResearchObject]]:
         """
+        The execution does not depend on the current working directory, the relative paths are resolved against the
+        root directory of the file manager. So multiple workflows can be executed concurrently from different threads,
+        as long as they pass their workflow and their inputs as arguments instead of using the setters. The outputs of
+        every run are written to its own directory, check get_run_directory.
         :param provenance: Execute with provenance enabled/disabled.
+        :param parallel: Execute the independent jobs of the workflow in parallel.
+        :param max_cores: The maximum number of cores that the parallel jobs can allocate. Defaults to all the cores.
+        :param max_ram: The maximum RAM in MiB that the parallel jobs can allocate. Defaults to the half of the
+        available memory.
+        :param workflow_path: the path of the cwl file, defaults to the path which is set by set_workflow_path
+        :param job_order: the input data, defaults to the data which are set by set_data
+        :param stdout: the file where the jobs write their stdout, if the tool does not redirect it. By default it is
+        discarded
+        :param stderr: the file where the jobs write their stderr, if the tool does not redirect it. By default it is
+        discarded
+        :param profiler: records the time and the resources which are used by the run and by every step
+        :param job_context: returns a context manager which every job of the run enters in the thread that runs it
         :return: Run ID, dict with new files, exception if there is any.
         """
         exception_to_return = None
         run_id = uuid4()
         factory: JupyterFactory
+        workflow_path = os.path.abspath(workflow_path) if workflow_path is not None else self._workflow_path
         if not provenance:
-            factory = JupyterFactory(self.file_manager.ROOT_DIRECTORY)
+            executable = self._load_executable(workflow_path)
+            factory = executable.factory
         else:
             provenance_dir = os.path.join(self.provenance_directory.as_posix(), 'provenance')
             factory = ProvenanceFactory(
-                Path(self._workflow_path).as_uri(),
+                Path(workflow_path).as_uri(),
                 self.file_manager.ROOT_DIRECTORY,
                 provenance_dir
             )
-        old_directory = os.getcwd()
-        os.chdir(self.file_manager.ROOT_DIRECTORY)
-        executable = factory.make(self._workflow_path)
-        data = {}
-        for data_file in self._data_paths:
-            with open(data_file) as f:
-                new_data = yaml.load(f, Loader=yaml.Loader)
-                data = {**new_data, **data}
+            executable = factory.make(workflow_path)
+        # cwltool may modify the job order, the provenance of the inputs is captured by cwltool from that object
+        data = deepcopy(job_order if job_order is not None else self._job_order)
+        if profiler is not None:
+            profiler.start()
         try:
-            result: Dict = executable(**data)
+            job_executor = self._get_job_executor(parallel, max_cores, max_ram)
+            result: Dict = self._run_executable(
+                executable, job_executor, data, self.file_manager.ROOT_DIRECTORY, self.get_run_directory(run_id),
+                stdout, stderr, profiler, job_context
+            )
         except Exception as e:
             traceback.print_exc(file=sys.stderr)
             result = {}
             exception_to_return = e
+        finally:
+            if profiler is not None:
+                profiler.stop()
 
         if provenance:
             self._store_provenance(cast(ProvenanceFactory, factory), result)
-        os.chdir(old_directory)
         return run_id, result, exception_to_return, factory.runtime_context.research_obj
 
+    @classmethod
+    def _get_job_executor(cls, parallel: bool, max_cores: Optional[float] = None,
+                          max_ram: Optional[int] = None) -> JobExecutor:
+        if not parallel:
+            return SingleJobExecutor()
+        job_executor = MultithreadedJobExecutor()
+        if max_cores is not None:
+            job_executor.max_cores = float(max_cores)
+        if max_ram is not None:
+            job_executor.max_ram = int(max_ram)
+        return job_executor
+
+    @classmethod
+    def _run_executable(cls, executable: ExecutableProcess, job_executor: JobExecutor, data: Dict,
+                        basedir: str, outdir: str, stdout: Optional[IO] = None, stderr: Optional[IO] = None,
+                        profiler: Optional[RunProfiler] = None,
+                        job_context: Optional[Callable[[], ContextManager]] = None) -> Dict:
+        """Proxy method to cwltool's Callable which uses the requested job executor"""
+        runtime_context = executable.factory.runtime_context.copy()
+        runtime_context.basedir = basedir
+        Path(outdir).mkdir(parents=True, exist_ok=True)
+        runtime_context.outdir = outdir
+        if stdout is not None:
+            runtime_context.default_stdout = stdout
+        if stderr is not None:
+            runtime_context.default_stderr = stderr
+        # the copies of the runtime context, which cwltool passes to the jobs, keep the profiler and the job context
+        runtime_context.profiler = profiler
+        runtime_context.job_context = job_context
+        out, status = job_executor(executable.t, data, runtime_context)
+        if status != "success":
+            raise WorkflowStatus(out, status)
+        return out
+
+    def _load_executable(self, workflow_path: str) -> ExecutableProcess:
+        """
+        Loads the workflow through cwltool. The loaded process is cached per session and it is reused as long as the
+        content of the file does not change.
+        :param workflow_path: the path of the cwl file
+        :return: the executable process
+        """
+        with open(workflow_path, 'rb') as f:
+            content_hash = hashlib.sha256(f.read()).hexdigest()
+        key = (os.path.realpath(workflow_path), content_hash)
+        with self._executables_lock:
+            executable = self._executables_cache.get(key, None)
+            if executable is None:
+                self.invalidate_cache(workflow_path)
+                executable = JupyterFactory(self.file_manager.ROOT_DIRECTORY).make(workflow_path)
+                self._executables_cache[key] = executable
+        return executable
+
+    def invalidate_cache(self, workflow_path: Optional[str] = None) -> None:
+        """
+        Drops the cached executables of a workflow.
+        :param workflow_path: the path of the cwl file. If it is None the whole cache is cleared
+        :return: None
+        """
+        with self._executables_lock:
+            if workflow_path is None:
+                self._executables_cache.clear()
+                return
+            workflow_path = os.path.realpath(workflow_path)
+            for key in [key for key in self._executables_cache if key[0] == workflow_path]:
+                self._executables_cache.pop(key)
+
     @classmethod
     def _store_provenance(cls, factory: ProvenanceFactory, out) -> None:
         """Proxy method to cwltool's logic"""
@@ -171,7 +340,7 @@ class CoreExecutor:
             visit_class(
                 out,
                 ("File",),
-                functools.partial(add_sizes, runtime_context.make_fs_access("")),
+                functools.partial(add_sizes, runtime_context.make_fs_access(runtime_context.basedir)),
             )
 
             research_obj = runtime_context.research_obj
@@ -0,0 +1,287 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from copy import deepcopy
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+from ruamel.yaml import YAML, YAMLError
+
+
+class ExecutionCache:
+    """
+    ExecutionCache memoizes the results of executions. The key of an execution is the hash of the tool's description,
+    including the tools that it runs as steps and the files that it includes or imports, and the hash of the inputs,
+    where the files are replaced by the hash of their content and of the files next to them which may be their
+    secondary files.
+    """
+
+    # the maximum number of memoized hashes of files
+    FILES_HASHES_SIZE = 4096
+
+    def __init__(self, max_size: Optional[int] = None, max_age: Optional[float] = None):
+        """
+        @param max_size: the maximum size in bytes of the results that are referenced by the cache
+        @param max_age: the maximum age in seconds of an entry
+        """
+        self.max_size = max_size
+        self.max_age = max_age
+        # the results of the background executions are stored while the entries are listed or invalidated
+        self._lock = threading.RLock()
+        self._entries: Dict[str, Dict] = {}
+        # path -> (size, modification time, hash of the file's content), the least recently used first
+        self._files_hashes: Dict[str, Tuple[int, float, str]] = OrderedDict()
+
+    def compute_key(self, tool_path: Union[str, Path], job_order: Dict, cwd: Union[str, Path]) -> str:
+        """
+        @param tool_path: the path of the registered tool
+        @param job_order: the inputs of the execution
+        @param cwd: the directory against which the relative paths of the inputs are resolved
+        @return: the key of the execution
+        """
+        with self._lock:
+            key = hashlib.sha256()
+            key.update(self._hash_tool(str(tool_path), set()).encode())
+            normalized_inputs = self._normalize_inputs(job_order, str(cwd))
+            key.update(json.dumps(normalized_inputs, sort_keys=True, default=str).encode())
+            return key.hexdigest()
+
+    def _hash_tool(self, tool_path: str, visited: set) -> str:
+        tool_path = os.path.realpath(tool_path)
+        visited.add(tool_path)
+        with open(tool_path, 'rb') as f:
+            tool_content = f.read()
+        tool_hash = hashlib.sha256(tool_content)
+        try:
+            tool = YAML(typ='safe', pure=False).load(tool_content)
+        except YAMLError:
+            tool = None
+        for field, reference in self._references(tool):
+            reference = urlparse(reference)
+            if reference.scheme not in ('', 'file'):
+                continue
+            reference_path = os.path.join(os.path.dirname(tool_path), reference.path)
+            if os.path.realpath(reference_path) in visited or not os.path.isfile(reference_path):
+                continue
+            tool_hash.update(field.encode())
+            if field == '$include':
+                # included files are text, they are not parsed
+                tool_hash.update(self._hash_path(reference_path).encode())
+            else:
+                tool_hash.update(self._hash_tool(reference_path, visited).encode())
+        return tool_hash.hexdigest()
+
+    @classmethod
+    def _references(cls, document) -> List[Tuple[str, str]]:
+        """@return: the run, $import and $include references of the document and of its inline parts"""
+        references = []
+        to_visit = [document]
+        while len(to_visit) > 0:
+            node = to_visit.pop()
+            if isinstance(node, dict):
+                for field in ('run', '$import', '$include'):
+                    if isinstance(node.get(field, None), str):
+                        references.append((field, node[field]))
+                to_visit.extend(node.values())
+            elif isinstance(node, list):
+                to_visit.extend(node)
+        return references
+
+    def _normalize_inputs(self, inputs, cwd: str):
+        if isinstance(inputs, list):
+            return [self._normalize_inputs(i, cwd) for i in inputs]
+        if not isinstance(inputs, dict):
+            return inputs
+        if inputs.get('class', None) in ('File', 'Directory') and ('location' in inputs or 'path' in inputs):
+            normalized = {
+                k: self._normalize_inputs(v, cwd) for k, v in inputs.items() if k not in ('location', 'path')
+            }
+            path = urlparse(str(inputs.get('location', inputs.get('path')))).path
+            if not os.path.isabs(path):
+                path = os.path.join(cwd, path)
+            normalized['basename'] = inputs.get('basename', os.path.basename(path))
+            normalized['sha256'] = self._hash_path(path)
+            if os.path.isfile(path):
+                normalized['siblings'] = self._hash_siblings(path)
+            return normalized
+        return {k: self._normalize_inputs(v, cwd) for k, v in inputs.items()}
+
+    def _hash_siblings(self, path: str) -> Dict[str, str]:
+        """
+        The secondary files which a tool declares, e.g. .bai or ^.fai, are found next to the primary file and their
+        names start with the name of the primary file without its extensions. All such files are hashed, because the
+        patterns of the tool may be expressions.
+        @return: the hash of every file in the directory of the file which may be one of its secondary files
+        """
+        directory, name = os.path.split(path)
+        root = name.split('.')[0] + '.'
+        return {
+            sibling: self._hash_path(os.path.join(directory, sibling)) for sibling in sorted(os.listdir(directory))
+            if sibling != name and sibling.startswith(root) and os.path.isfile(os.path.join(directory, sibling))
+        }
+
+    def _hash_path(self, path: str) -> str:
+        if os.path.isdir(path):
+            directory_hash = hashlib.sha256()
+            for root, directories, files in os.walk(path):
+                directories.sort()
+                for file in sorted(files):
+                    file_path = os.path.join(root, file)
+                    directory_hash.update(os.path.relpath(file_path, path).encode())
+                    directory_hash.update(self._hash_path(file_path).encode())
+            return directory_hash.hexdigest()
+        if not os.path.isfile(path):
+            return ''
+        stat = os.stat(path)
+        real_path = os.path.realpath(path)
+        memoized = self._files_hashes.get(real_path, None)
+        if memoized is not None and memoized[:2] == (stat.st_size, stat.st_mtime):
+            self._files_hashes.move_to_end(real_path)
+            return memoized[2]
+        # the hash of a modified file replaces the old one
+        file_hash = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                file_hash.update(chunk)
+        self._files_hashes[real_path] = (stat.st_size, stat.st_mtime, file_hash.hexdigest())
+        self._files_hashes.move_to_end(real_path)
+        while len(self._files_hashes) > self.FILES_HASHES_SIZE:
+            self._files_hashes.popitem(last=False)
+        return file_hash.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        @return: the results of the execution with the stored paths as locations or None if the key is not cached or
+        its results do not exist anymore
+        """
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None:
+                return None
+            if self._is_expired(entry) or not all(os.path.isfile(f) for f in self._stored_files(entry['stored'])):
+                self._entries.pop(key)
+                return None
+            entry['last_used'] = time.time()
+            entry['hits'] += 1
+            results = deepcopy(entry['results'])
+            for output, stored in entry['stored'].items():
+                if isinstance(stored, list):
+                    for result, stored_file in zip(results[output], stored):
+                        result['location'] = Path(stored_file).as_uri()
+                else:
+                    results[output]['location'] = Path(stored).as_uri()
+            return results
+
+    def put(self, key: str, tool_id: str, tool_path: Union[str, Path], results: Dict,
+            stored: Dict[str, Union[str, List[str]]]) -> None:
+        """
+        @param key: the key of the execution
+        @param tool_id: the id of the executed tool
+        @param tool_path: the path of the executed tool
+        @param results: the results of the execution
+        @param stored: the paths where the results are stored, with the same structure as the results
+        """
+        with self._lock:
+            now = time.time()
+            self._entries[key] = {
+                'tool_id': tool_id,
+                'tool_path': os.path.realpath(str(tool_path)),
+                'results': deepcopy(results),
+                'stored': deepcopy(stored),
+                'size': sum(os.path.getsize(f) for f in self._stored_files(stored) if os.path.isfile(f)),
+                'created': now,
+                'last_used': now,
+                'hits': 0,
+                'pinned': False,
+            }
+            self.evict()
+
+    @classmethod
+    def _stored_files(cls, stored: Dict[str, Union[str, List[str]]]) -> List[str]:
+        files = []
+        for value in stored.values():
+            files.extend(value if isinstance(value, list) else [value])
+        return files
+
+    def _is_expired(self, entry: Dict) -> bool:
+        return not entry['pinned'] and self.max_age is not None and time.time() - entry['created'] > self.max_age
+
+    def evict(self) -> List[str]:
+        """
+        Drops the expired entries and then the least recently used ones until the size of the cache fits to the
+        max size. Pinned entries are never evicted.
+        @return: the keys of the evicted entries
+        """
+        with self._lock:
+            evicted = [key for key, entry in self._entries.items() if self._is_expired(entry)]
+            for key in evicted:
+                self._entries.pop(key)
+            if self.max_size is not None:
+                total_size = sum(entry['size'] for entry in self._entries.values())
+                least_recently_used = sorted(
+                    [key for key, entry in self._entries.items() if not entry['pinned']],
+                    key=lambda k: self._entries[k]['last_used']
+                )
+                for key in least_recently_used:
+                    if total_size <= self.max_size:
+                        break
+                    total_size -= self._entries.pop(key)['size']
+                    evicted.append(key)
+            return evicted
+
+    def find_key(self, key_prefix: str) -> str:
+        """
+        @return: the unique key which starts with the prefix
+        @raise KeyError: if there is not a unique key with that prefix
+        """
+        with self._lock:
+            keys = [key for key in self._entries if key.startswith(key_prefix)]
+            if len(keys) != 1:
+                raise KeyError(
+                    f'Cache entry {key_prefix} not found' if len(keys) == 0 else f'Ambiguous key {key_prefix}'
+                )
+            return keys[0]
+
+    def pin(self, key: str, pinned: bool = True) -> None:
+        with self._lock:
+            self._entries[self.find_key(key)]['pinned'] = pinned
+
+    def purge(self, key: Optional[str] = None) -> int:
+        """
+        Removes an entry from the cache or all the unpinned entries if the key is None.
+        @return: the number of the removed entries
+        """
+        with self._lock:
+            if key is not None:
+                self._entries.pop(self.find_key(key))
+                return 1
+            keys = [k for k, entry in self._entries.items() if not entry['pinned']]
+            for k in keys:
+                self._entries.pop(k)
+            return len(keys)
+
+    def invalidate(self, tool_path: Union[str, Path]) -> None:
+        """Drops the unpinned entries of a tool."""
+        with self._lock:
+            tool_path = os.path.realpath(str(tool_path))
+            for key in [k for k, e in self._entries.items() if e['tool_path'] == tool_path and not e['pinned']]:
+                self._entries.pop(key)
+
+    def entries(self) -> List[Dict]:
+        with self._lock:
+            return [
+                {
+                    'key': key,
+                    'tool_id': entry['tool_id'],
+                    'size': entry['size'],
+                    'created': entry['created'],
+                    'last_used': entry['last_used'],
+                    'hits': entry['hits'],
+                    'pinned': entry['pinned'],
+                }
+                for key, entry in self._entries.items()
+            ]
@@ -1,3 +1,4 @@
+import json
 import os
 import shutil
 from copy import deepcopy
@@ -5,19 +6,31 @@ from os import makedirs
 
 from os.path import exists
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple
 from urllib.parse import urlparse, ParseResult
 
+# ioctl request for cloning a file (linux/fs.h)
+_FICLONE = 0x40049409
+
 
 class IOFileManager:
     ROOT_DIRECTORY: str
+    # COPY: copy every file. LINK: try to reflink or hard link the file, move it if it belongs to one of the owned
+    # directories and copy it as a last resort
+    INGESTION_STRATEGIES = ('COPY', 'LINK')
 
-    def __init__(self, root_directory: str):
+    def __init__(self, root_directory: str, ingestion_strategy: str = 'COPY',
+                 owned_directories: Optional[List[str]] = None):
         root_directory = os.path.realpath(root_directory)
         if not exists(root_directory):
             makedirs(root_directory)
+        if ingestion_strategy.upper() not in self.INGESTION_STRATEGIES:
+            raise ValueError(f'Unknown ingestion strategy: {ingestion_strategy}')
         self.ROOT_DIRECTORY = root_directory
         self._files_registry: Dict = {}
+        self.ingestion_strategy = ingestion_strategy.upper()
+        self._owned_directories = [os.path.realpath(d) for d in owned_directories] \
+            if owned_directories is not None else []
 
     @property
     def files_counter(self):
@@ -34,7 +47,7 @@ class IOFileManager:
         real_path = os.path.realpath(os.path.join(self.ROOT_DIRECTORY, relative_path))
         Path(os.path.dirname(real_path)).mkdir(exist_ok=True, parents=True)
         with open(real_path, 'wb') as f:
-            self._files_registry[real_path] = metadata if metadata is not None else {}
+            self._register_file(real_path, metadata if metadata is not None else {})
             f.write(binary_data)
         return real_path
 
@@ -56,26 +69,249 @@ class IOFileManager:
         for p in files_to_copy:
             p = urlparse(p).path
             new_filename = os.sep.join([real_path, os.path.basename(p)])
-            shutil.copyfile(p, new_filename)
-            self._files_registry[new_filename] = metadata if metadata is not None else {}
+            ingestion_method = self._ingest_file(p, new_filename)
+            file_metadata = {**(metadata if metadata is not None else {}), '_ingestion': ingestion_method}
+            self._register_file(new_filename, file_metadata)
             new_files.append(new_filename)
         return new_files
 
+    def _ingest_file(self, source: str, destination: str) -> str:
+        """
+        Places the source file to the destination following the ingestion strategy of the manager.
+        @return: the method that was used, one of reflink, link, move and copy
+        """
+        if self.ingestion_strategy == 'LINK':
+            if os.path.lexists(destination):
+                os.remove(destination)
+            try:
+                self._reflink(source, destination)
+                return 'reflink'
+            except OSError:
+                pass
+            try:
+                os.link(source, destination)
+                return 'link'
+            except OSError:
+                pass
+            if self._is_owned(source):
+                try:
+                    os.rename(source, destination)
+                    return 'move'
+                except OSError:
+                    pass
+        shutil.copyfile(source, destination)
+        return 'copy'
+
+    @classmethod
+    def _reflink(cls, source: str, destination: str) -> None:
+        """Clones the source file to the destination. The filesystem must support copy-on-write."""
+        try:
+            import fcntl
+        except ImportError:
+            raise OSError('reflink is not supported')
+        try:
+            with open(source, 'rb') as source_file, open(destination, 'wb') as destination_file:
+                fcntl.ioctl(destination_file.fileno(), _FICLONE, source_file.fileno())
+        except OSError:
+            if os.path.exists(destination):
+                os.remove(destination)
+            raise
+
+    def _is_owned(self, path: str) -> bool:
+        path = os.path.realpath(path)
+        return any(os.path.commonpath([path, d]) == d for d in self._owned_directories)
+
     def get_files_uri(self) -> ParseResult:
         return urlparse(self.ROOT_DIRECTORY, scheme='file')
 
     def remove(self, path: str):
         os.remove(path)
-        self._files_registry.pop(path)
+        self._unregister_file(path)
+
+    def remove_directory(self, relative_path: str) -> List[str]:
+        """
+        Removes a directory of the manager with its files.
+        @return: the registered files which were removed
+        """
+        real_path = os.path.realpath(os.path.join(self.ROOT_DIRECTORY, relative_path))
+        removed = [f for f in self.get_files() if os.path.commonpath([f, real_path]) == real_path]
+        for f in removed:
+            self._unregister_file(f)
+        shutil.rmtree(real_path, ignore_errors=True)
+        return removed
 
     def clear(self):
         for f in os.listdir(self.ROOT_DIRECTORY):
             if os.path.isfile(f):
                 os.remove(f)
-                self._files_registry.pop(f)
+                self._unregister_file(f)
+
+    def _register_file(self, path: str, metadata: Dict) -> None:
+        self._files_registry[path] = metadata
+
+    def _unregister_file(self, path: str) -> Dict:
+        return self._files_registry.pop(path)
 
 
 class ResultsManager(IOFileManager):
+    CATALOG_FILENAME = 'catalog.jsonl'
+
+    def __init__(self, root_directory: str, ingestion_strategy: str = 'COPY',
+                 owned_directories: Optional[List[str]] = None, persistent: bool = False):
+        """
+        @param persistent: if it is True every change of the registry is written through to a catalog in the root
+        directory. A new results manager on the same directory loads the catalog on the first access.
+        """
+        super().__init__(root_directory, ingestion_strategy, owned_directories)
+        # secondary indexes of the registry, result's id or (produced by, result's id) -> {path: result counter}
+        self._results_by_id: Dict[str, Dict[str, int]] = {}
+        self._results_by_producer: Dict[Tuple[str, str], Dict[str, int]] = {}
+        # the path and the result counter of the last result for every key of the indexes
+        self._last_result_by_id: Dict[str, Tuple[int, str]] = {}
+        self._last_result_by_producer: Dict[Tuple[str, str], Tuple[int, str]] = {}
+        self._catalog_path: Optional[str] = os.path.join(self.ROOT_DIRECTORY, self.CATALOG_FILENAME) \
+            if persistent else None
+        self._catalog_loaded = not persistent
+        # the counter of the next result, it only increases so a newer result never gets a lower counter than an older
+        # one, even when results are removed. It is persisted in the catalog
+        self._next_result_counter = 0
+        self._listeners: List[Callable[[str, bool], None]] = []
+
+    def add_listener(self, listener: Callable[[str, bool], None]) -> None:
+        """
+        Registers a callback which is called with the reference of a result, [produced by]/[result's id], and True
+        when the first result with that reference is stored or False when the last one is removed. The results of the
+        catalog are reported when the catalog is loaded.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str, bool], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    @property
+    def files_counter(self):
+        self._load_catalog()
+        return super().files_counter
+
+    def get_files(self) -> List[str]:
+        self._load_catalog()
+        return super().get_files()
+
+    def get_files_registry(self) -> Dict:
+        self._load_catalog()
+        return super().get_files_registry()
+
+    def next_result_counter(self) -> int:
+        """@return: a new result counter, greater than the counters of all the results which have been stored"""
+        self._load_catalog()
+        counter = self._next_result_counter
+        self._next_result_counter += 1
+        return counter
+
+    def load_catalog(self) -> None:
+        """Loads the catalog of a persistent session, if it is not loaded yet."""
+        self._load_catalog()
+
+    def _load_catalog(self) -> None:
+        """Loads the catalog of a previous session. The results which do not exist anymore are dropped."""
+        if self._catalog_loaded:
+            return
+        self._catalog_loaded = True
+        if not os.path.isfile(self._catalog_path):
+            return
+        registry: Dict[str, Dict] = {}
+        with open(self._catalog_path) as f:
+            for line in f:
+                line = line.strip()
+                if len(line) == 0:
+                    continue
+                entry = json.loads(line)
+                if entry['op'] == 'add':
+                    registry[entry['path']] = entry['metadata']
+                    self._next_result_counter = max(
+                        self._next_result_counter, entry['metadata'].get('result_counter', -1) + 1
+                    )
+                elif entry['op'] == 'counter':
+                    self._next_result_counter = max(self._next_result_counter, entry['next'])
+                else:
+                    registry.pop(entry['path'], None)
+        registry = {path: metadata for path, metadata in registry.items() if os.path.isfile(path)}
+        for path, metadata in registry.items():
+            self._index_file(path, metadata)
+        with open(self._catalog_path, 'w') as f:
+            # the counter is kept even if the results with the greatest counters have been removed
+            f.write(json.dumps({'op': 'counter', 'next': self._next_result_counter}) + '\n')
+            for path, metadata in registry.items():
+                f.write(json.dumps({'op': 'add', 'path': path, 'metadata': metadata}) + '\n')
+
+    def _write_catalog_entry(self, entry: Dict) -> None:
+        if self._catalog_path is not None:
+            with open(self._catalog_path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+
+    def _register_file(self, path: str, metadata: Dict) -> None:
+        self._load_catalog()
+        metadata = dict(metadata)
+        if 'id' in metadata:
+            if 'result_counter' in metadata:
+                self._next_result_counter = max(self._next_result_counter, metadata['result_counter'] + 1)
+            else:
+                metadata['result_counter'] = self.next_result_counter()
+        if path in self._files_registry:
+            self._unregister_file(path)
+        self._index_file(path, metadata)
+        self._write_catalog_entry({'op': 'add', 'path': path, 'metadata': metadata})
+
+    def _unregister_file(self, path: str) -> Dict:
+        self._load_catalog()
+        metadata = self._unindex_file(path)
+        self._write_catalog_entry({'op': 'remove', 'path': path})
+        return metadata
+
+    def _index_file(self, path: str, metadata: Dict) -> None:
+        super()._register_file(path, metadata)
+        if 'id' not in metadata:
+            return
+        counter = metadata.get('result_counter', -1)
+        self._index(self._results_by_id, self._last_result_by_id, metadata['id'], path, counter)
+        if '_produced_by' in metadata:
+            key = (metadata['_produced_by'], metadata['id'])
+            is_new = key not in self._results_by_producer
+            self._index(self._results_by_producer, self._last_result_by_producer, key, path, counter)
+            if is_new:
+                for listener in self._listeners:
+                    listener('/'.join(key), True)
+
+    def _unindex_file(self, path: str) -> Dict:
+        metadata = super()._unregister_file(path)
+        if 'id' in metadata:
+            self._unindex(self._results_by_id, self._last_result_by_id, metadata['id'], path)
+            if '_produced_by' in metadata:
+                key = (metadata['_produced_by'], metadata['id'])
+                self._unindex(self._results_by_producer, self._last_result_by_producer, key, path)
+                if key not in self._results_by_producer:
+                    for listener in self._listeners:
+                        listener('/'.join(key), False)
+        return metadata
+
+    @classmethod
+    def _index(cls, index: Dict, last_results: Dict, key, path: str, counter: int) -> None:
+        index.setdefault(key, {})[path] = counter
+        if key not in last_results or last_results[key][0] <= counter:
+            last_results[key] = (counter, path)
+
+    @classmethod
+    def _unindex(cls, index: Dict, last_results: Dict, key, path: str) -> None:
+        results = index.get(key, {})
+        results.pop(path, None)
+        if len(results) == 0:
+            index.pop(key, None)
+            last_results.pop(key, None)
+        elif last_results[key][1] == path:
+            # on equal counters the last inserted result wins
+            last_path = max(reversed(list(results)), key=lambda p: results[p])
+            last_results[key] = (results[last_path], last_path)
 
     def get_last_result_by_id(self, result_id: str) -> Optional[str]:
         """
@@ -86,16 +322,13 @@ class ResultsManager(IOFileManager):
         @return: the path of last result with the requested id or None
         """
 
+        self._load_catalog()
         produced_by, result_id = os.path.split(result_id)
-        results_filter = filter(lambda item: item[1]['id'] == result_id, self.get_files_registry().items())
         produced_by = produced_by.strip()
         if len(produced_by) > 0:
-            results_filter = filter(lambda item: item[1]['_produced_by'] == produced_by, results_filter)
-
-        results = sorted(
-            results_filter,
-            key=lambda item: item[1]['result_counter']
-        )
-        if len(results) == 0:
+            last_result = self._last_result_by_producer.get((produced_by, result_id), None)
+        else:
+            last_result = self._last_result_by_id.get(result_id, None)
+        if last_result is None:
             return None
-        return results[-1][0]
+        return last_result[1]
@@ -0,0 +1,156 @@
+import codecs
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Set
+
+
+class _PipeWriter:
+    """
+    The write end of a pipe, which is used as the default stdout or stderr of the jobs. cwltool closes the outputs of
+    every job after it finishes, so closing it does nothing and the pipe is closed by the streamer.
+    """
+
+    def __init__(self, fd: int):
+        self._fd = fd
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def close(self) -> None:
+        pass
+
+
+class _StreamHandler(logging.Handler):
+    """Forwards the records of a logger, which are logged by the threads of the streamer, to a stream of it."""
+
+    def __init__(self, streamer: 'OutputStreamer', name: str):
+        super().__init__()
+        self._streamer = streamer
+        self._name = name
+        self.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # the logger may be shared by concurrent runs, e.g. the logger of cwltool
+        if record.thread not in self._streamer._thread_ids:
+            return
+        try:
+            self._streamer.write(self._name, self.format(record) + '\n')
+        except Exception:
+            self.handleError(record)
+
+
+class OutputStreamer:
+    """
+    OutputStreamer forwards the stdout and the stderr of the jobs, and the records of a logger, while they are
+    produced. The output is buffered and it is sent in batches, at most one message per stream every interval. If a
+    stream produces more than max_size characters in an interval only the last max_size characters are sent.
+    """
+
+    STREAMS = ('stdout', 'stderr')
+
+    def __init__(self, callback: Callable[[str, str], None], interval: float = 0.5, max_size: int = 64 * 1024):
+        """
+        @param callback: called with the name of the stream, stdout or stderr, and the text of every batch
+        @param interval: the minimum time in seconds between two batches of the same stream
+        @param max_size: the maximum number of characters of a batch
+        """
+        self._callback = callback
+        self.interval = interval
+        self.max_size = max_size
+        self._buffers: Dict[str, List[str]] = {name: [] for name in self.STREAMS}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._pipes: Dict[str, int] = {}
+        self._writers: Dict[str, _PipeWriter] = {}
+        self._threads: List[threading.Thread] = []
+        self._log_handlers: Dict[logging.Logger, _StreamHandler] = {}
+        # the threads whose log records are forwarded
+        self._thread_ids: Set[int] = set()
+        for name in self.STREAMS:
+            read_fd, write_fd = os.pipe()
+            self._pipes[name] = write_fd
+            self._writers[name] = _PipeWriter(write_fd)
+            self._threads.append(threading.Thread(target=self._read, args=(name, read_fd), daemon=True))
+        self._threads.append(threading.Thread(target=self._flush_periodically, daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def stdout(self) -> _PipeWriter:
+        return self._writers['stdout']
+
+    @property
+    def stderr(self) -> _PipeWriter:
+        return self._writers['stderr']
+
+    def add_logger(self, logger: logging.Logger, name: str = 'stderr') -> None:
+        """
+        Forwards the records of the logger to a stream until the streamer is closed. Only the records which are logged
+        by the calling thread, or by the threads that are attached with attach_thread, are forwarded.
+        """
+        self._thread_ids.add(threading.get_ident())
+        handler = _StreamHandler(self, name)
+        logger.addHandler(handler)
+        self._log_handlers[logger] = handler
+
+    @contextmanager
+    def attach_thread(self) -> Iterator[None]:
+        """Forwards the log records of the calling thread while the context is active, e.g. of a parallel job."""
+        thread_id = threading.get_ident()
+        attached = thread_id not in self._thread_ids
+        self._thread_ids.add(thread_id)
+        try:
+            yield
+        finally:
+            if attached:
+                self._thread_ids.discard(thread_id)
+
+    def write(self, name: str, text: str) -> None:
+        with self._lock:
+            self._buffers[name].append(text)
+
+    def _read(self, name: str, read_fd: int) -> None:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        with os.fdopen(read_fd, 'rb', buffering=0) as pipe:
+            while True:
+                data = pipe.read(4096)
+                if not data:
+                    break
+                self.write(name, decoder.decode(data))
+        self.write(name, decoder.decode(b'', final=True))
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self.interval):
+            self.flush()
+
+    def flush(self) -> None:
+        for name in self.STREAMS:
+            with self._lock:
+                text, self._buffers[name] = ''.join(self._buffers[name]), []
+            if len(text) > self.max_size:
+                text = f'[... {len(text) - self.max_size} characters skipped ...]\n' + text[-self.max_size:]
+            if len(text) > 0:
+                self._callback(name, text)
+
+    def close(self) -> None:
+        """Stops forwarding and sends the remaining output. The jobs which write to the streamer must have finished."""
+        if self._closed.is_set():
+            return
+        for logger, handler in self._log_handlers.items():
+            logger.removeHandler(handler)
+        self._log_handlers = {}
+        self._thread_ids = set()
+        for write_fd in self._pipes.values():
+            os.close(write_fd)
+        self._closed.set()
+        for thread in self._threads:
+            thread.join()
+        self.flush()
+
+    def __enter__(self) -> 'OutputStreamer':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
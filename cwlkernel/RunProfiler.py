@@ -0,0 +1,133 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import psutil
+
+
+class _StepMonitor:
+    """Samples the process tree of a step until it is stopped."""
+
+    def __init__(self, pid: int, interval: float):
+        self._pid = pid
+        self._interval = interval
+        self._processes: Dict[int, Dict] = {}
+        self.peak_rss = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self.sample()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            self.sample()
+
+    def sample(self) -> None:
+        try:
+            root = psutil.Process(self._pid)
+            tree = [root, *root.children(recursive=True)]
+        except psutil.Error:
+            return
+        rss = 0
+        for process in tree:
+            try:
+                with process.oneshot():
+                    cpu_times = process.cpu_times()
+                    metrics = {
+                        'cpu_time': cpu_times.user + cpu_times.system,
+                        'read_bytes': 0,
+                        'write_bytes': 0,
+                    }
+                    try:
+                        io_counters = process.io_counters()
+                        metrics['read_bytes'] = io_counters.read_bytes
+                        metrics['write_bytes'] = io_counters.write_bytes
+                    except (psutil.AccessDenied, AttributeError, NotImplementedError):
+                        pass
+                    rss += process.memory_info().rss
+            except psutil.Error:
+                continue
+            # the counters are cumulative, the last sample of every process is kept
+            self._processes[(process.pid, process.create_time())] = metrics
+        self.peak_rss = max(self.peak_rss, rss)
+
+    def totals(self) -> Dict:
+        return {
+            'cpu_time': sum(p['cpu_time'] for p in self._processes.values()),
+            'peak_rss': self.peak_rss,
+            'read_bytes': sum(p['read_bytes'] for p in self._processes.values()),
+            'write_bytes': sum(p['write_bytes'] for p in self._processes.values()),
+        }
+
+
+class RunProfiler:
+    """
+    RunProfiler records the wall time, the CPU time, the peak resident memory and the bytes read and written by every
+    step of a run. The process tree of every step is sampled every interval, so the processes which live less than
+    the interval may be under-reported. The totals of the run sum the steps, except the peak memory which is the
+    maximum of the steps.
+    """
+
+    INTERVAL = 0.1
+
+    def __init__(self, interval: Optional[float] = None):
+        """
+        @param interval: the time in seconds between two samples of the processes of a step
+        """
+        self.interval = interval if interval is not None else self.INTERVAL
+        self._steps: List[Dict] = []
+        self._lock = threading.Lock()
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+    def start(self) -> None:
+        self._started = time.time()
+
+    def stop(self) -> None:
+        self._finished = time.time()
+
+    @contextmanager
+    def profile_step(self, name: str, pid: int) -> Iterator[None]:
+        """
+        Profiles the process with that pid, and its children, for as long as the context is open.
+        @param name: the name of the step
+        @param pid: the process id of the step
+        """
+        monitor = _StepMonitor(pid, self.interval)
+        started = time.time()
+        monitor.start()
+        try:
+            yield
+        finally:
+            monitor.stop()
+            step = {'step': name, 'wall_time': time.time() - started, **monitor.totals()}
+            with self._lock:
+                self._steps.append(step)
+
+    def steps(self) -> List[Dict]:
+        with self._lock:
+            return [dict(step) for step in self._steps]
+
+    def summary(self) -> Dict:
+        """@return: the totals of the run"""
+        steps = self.steps()
+        started = self._started if self._started is not None else time.time()
+        finished = self._finished if self._finished is not None else time.time()
+        return {
+            'wall_time': finished - started,
+            'cpu_time': sum(step['cpu_time'] for step in steps),
+            'peak_rss': max([step['peak_rss'] for step in steps], default=0),
+            'read_bytes': sum(step['read_bytes'] for step in steps),
+            'write_bytes': sum(step['write_bytes'] for step in steps),
+        }
+
+    def profile(self) -> Dict:
+        """@return: the totals of the run and the profile of every step"""
+        return {**self.summary(), 'steps': self.steps()}
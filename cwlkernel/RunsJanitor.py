@@ -0,0 +1,152 @@
+import inspect
+import os
+import shutil
+import threading
+import time
+import weakref
+from typing import Callable, Dict, List, Optional
+
+
+class RunsJanitor:
+    """
+    RunsJanitor bounds the disk usage of the executions of a session. Every execution writes its outputs to its own
+    directory in the scratch directory and its results are stored to a directory with the same name, the id of the
+    run, in the results directory. The janitor removes the scratch directories of the finished runs and, when the
+    results exceed the quota, it evicts the least recently used runs which are not pinned. The work is done on demand
+    with collect or periodically by a background thread.
+    """
+
+    INTERVAL = 60
+
+    def __init__(self, scratch_directory: str, results_directory: str, quota: Optional[int] = None,
+                 on_evict: Optional[Callable[[str], None]] = None):
+        """
+        @param scratch_directory: the directory where the runs write their outputs
+        @param results_directory: the directory where the results of the runs are stored
+        @param quota: the maximum size in bytes of the results, if it is None the results are never evicted
+        @param on_evict: called with the id of every evicted run before its results are removed. A bound method is kept
+        by a weak reference, so the background thread does not keep its object alive
+        """
+        self.scratch_directory = os.path.realpath(scratch_directory)
+        self.results_directory = os.path.realpath(results_directory)
+        self.quota = quota
+        self._on_evict: Callable[[], Optional[Callable[[str], None]]] = \
+            weakref.WeakMethod(on_evict) if inspect.ismethod(on_evict) else lambda: on_evict
+        self._runs: Dict[str, Dict] = {}
+        self._unclean_runs: List[str] = []
+        self._lock = threading.RLock()
+        self._wake_up = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_run(self, run_id: str) -> None:
+        """Registers a finished run. Its results must have been stored already."""
+        now = time.time()
+        with self._lock:
+            self._runs[run_id] = {
+                'size': self._directory_size(os.path.join(self.results_directory, run_id)),
+                'created': now,
+                'last_used': now,
+                'pinned': False,
+            }
+            self._unclean_runs.append(run_id)
+        self._wake_up.set()
+
+    def touch(self, run_id: str) -> None:
+        with self._lock:
+            if run_id in self._runs:
+                self._runs[run_id]['last_used'] = time.time()
+
+    def run_of_path(self, path: str) -> Optional[str]:
+        """@return: the id of the registered run which the result with that path belongs to or None"""
+        path = os.path.realpath(path)
+        if os.path.commonpath([path, self.results_directory]) != self.results_directory:
+            return None
+        run_id = os.path.relpath(path, self.results_directory).split(os.sep)[0]
+        return run_id if run_id in self._runs else None
+
+    def pin(self, run_id: str, pinned: bool = True) -> None:
+        with self._lock:
+            if run_id not in self._runs:
+                raise KeyError(f'Run {run_id} not found')
+            self._runs[run_id]['pinned'] = pinned
+
+    def usage(self) -> int:
+        """@return: the size in bytes of the results of the registered runs"""
+        with self._lock:
+            return sum(run['size'] for run in self._runs.values())
+
+    def runs(self) -> List[Dict]:
+        with self._lock:
+            return [{'run_id': run_id, **run} for run_id, run in self._runs.items()]
+
+    def collect(self) -> List[str]:
+        """
+        Removes the scratch directories of the finished runs and evicts the least recently used runs until the usage
+        fits to the quota. Pinned runs are never evicted.
+        @return: the ids of the evicted runs
+        """
+        with self._lock:
+            unclean_runs, self._unclean_runs = self._unclean_runs, []
+            evicted = []
+            if self.quota is not None:
+                usage = self.usage()
+                least_recently_used = sorted(
+                    [run_id for run_id, run in self._runs.items() if not run['pinned']],
+                    key=lambda r: self._runs[r]['last_used']
+                )
+                for run_id in least_recently_used:
+                    if usage <= self.quota:
+                        break
+                    usage -= self._runs.pop(run_id)['size']
+                    evicted.append(run_id)
+        # the callback is called without holding the lock, it may wait for a thread which is adding a run
+        for run_id in unclean_runs:
+            shutil.rmtree(os.path.join(self.scratch_directory, run_id), ignore_errors=True)
+        on_evict = self._on_evict()
+        for run_id in evicted:
+            if on_evict is not None:
+                on_evict(run_id)
+            shutil.rmtree(os.path.join(self.results_directory, run_id), ignore_errors=True)
+        return evicted
+
+    def start(self) -> None:
+        """Starts the background thread, it collects periodically and every time that a run is added."""
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='runs-janitor', daemon=True)
+        self._thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        """
+        @param wait: wait for the background thread to finish. The thread can not be joined when the janitor is
+        finalized, either by its own thread or while the interpreter shuts down
+        """
+        self._stopped.set()
+        self._wake_up.set()
+        if wait and self._thread is not None:
+            self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake_up.wait(self.INTERVAL)
+            self._wake_up.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.collect()
+            except Exception:
+                # the next pass retries, the janitor must not stop
+                pass
+
+    @classmethod
+    def _directory_size(cls, directory: str) -> int:
+        size = 0
+        for path, _, files in os.walk(directory):
+            for name in files:
+                file_path = os.path.join(path, name)
+                if not os.path.islink(file_path):
+                    size += os.path.getsize(file_path)
+        return size
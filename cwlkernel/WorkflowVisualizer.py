@@ -0,0 +1,145 @@
+import hashlib
+import logging
+import os
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from io import StringIO
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import pydot
+from cwltool.cwlviewer import CWLViewer
+from cwltool.main import main as cwltool_main
+
+from .cwlrepository.CWLComponent import CWLWorkflow, WorkflowComponent
+from .cwlrepository.WorkflowGraph import WorkflowGraph
+
+
+class WorkflowVisualizer:
+    """
+    WorkflowVisualizer renders the registered workflows as SVG images. The graphs of the workflows which are composed
+    in the kernel, or registered as instances of CWLWorkflow, are built directly from their steps, inputs and outputs.
+    The rest of the tools are described through cwltool's RDF. The images are cached by the id of the tool and the
+    hash of its content.
+    """
+
+    MAX_ENTRIES = 32
+
+    def __init__(self, max_entries: Optional[int] = None):
+        """
+        @param max_entries: the maximum number of cached images, the least recently used are dropped
+        """
+        self.max_entries = max_entries if max_entries is not None else self.MAX_ENTRIES
+        self._images: Dict[Tuple[str, str], str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def render(self, tool_id: str, path: Path, component: Optional[WorkflowComponent] = None) -> str:
+        """
+        @param tool_id: the id of the registered tool
+        @param path: the path of the registered tool
+        @param component: the registered tool, if it is a CWLWorkflow its graph is built without cwltool
+        @return: the html of the image
+        """
+        with open(path, 'rb') as f:
+            key = (tool_id, hashlib.sha256(f.read()).hexdigest())
+        with self._lock:
+            image = self._images.get(key, None)
+            if image is not None:
+                self._images.move_to_end(key)
+                return image
+        if isinstance(component, CWLWorkflow):
+            dot_graph = self.to_dot(component)
+        else:
+            dot_graph = self._rdf_to_dot(path)
+        ET.register_namespace('', 'http://www.w3.org/2000/svg')
+        image_xml = ET.fromstring(dot_graph.create('dot', 'svg').decode())
+        image = f'<div style="max-width: 100%;">{ET.tostring(image_xml, method="html").decode()}</div>'
+        with self._lock:
+            self._images[key] = image
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+        return image
+
+    def invalidate(self, tool_id: Optional[str] = None) -> None:
+        """
+        Drops the cached images of a tool.
+        @param tool_id: the id of the tool. If it is None the whole cache is cleared
+        """
+        with self._lock:
+            for key in [key for key in self._images if tool_id is None or key[0] == tool_id]:
+                self._images.pop(key)
+
+    @classmethod
+    def _rdf_to_dot(cls, path: Path) -> pydot.Dot:
+        rdf_stream = StringIO()
+        cwltool_main(['--print-rdf', os.path.abspath(path)], stdout=rdf_stream, logger_handler=logging.StreamHandler())
+        (dot_graph,) = pydot.graph_from_dot_data(CWLViewer(rdf_stream.getvalue()).dot())
+        return dot_graph
+
+    @classmethod
+    def _node(cls, name: str, label: str, fillcolor: str) -> pydot.Node:
+        node = pydot.Node('', fillcolor=fillcolor, style='filled', label=label, shape='record')
+        node.set_name(name)
+        return node
+
+    @classmethod
+    def to_dot(cls, workflow: CWLWorkflow) -> pydot.Dot:
+        """
+        Builds the graph of a workflow from its steps, inputs and outputs, with the same style as cwltool's CWLViewer.
+        @return: the dot graph
+        """
+        graph = pydot.Dot(graph_type='digraph', simplify=False)
+        graph.set_bgcolor('#eeeeee')
+        graph.set_clusterrank('local')
+        graph.set_labelloc('bottom')
+        graph.set_labeljust('right')
+
+        steps = workflow.steps
+        inputs_ids = {workflow_input['id'] for workflow_input in workflow.inputs}
+
+        def source_node(source: str) -> Optional[str]:
+            if source in inputs_ids:
+                return f'inputs/{source}'
+            step_id = source.split('/')[0]
+            return f'steps/{step_id}' if step_id in steps else None
+
+        for step_id in steps:
+            graph.add_node(cls._node(f'steps/{step_id}', step_id, 'lightgoldenrodyellow'))
+
+        inputs_subgraph = pydot.Subgraph(graph_name='cluster_inputs')
+        graph.add_subgraph(inputs_subgraph)
+        inputs_subgraph.set_rank('same')
+        inputs_subgraph.set('style', 'dashed')
+        inputs_subgraph.set_label('Workflow Inputs')
+        for workflow_input in workflow.inputs:
+            inputs_subgraph.add_node(cls._node(f'inputs/{workflow_input["id"]}', workflow_input['id'], '#94DDF4'))
+
+        edges = {(f'steps/{source}', f'steps/{target}') for source, target in workflow.graph.edges()
+                 if source in steps and target in steps}
+        for step_id, step in steps.items():
+            step_in = step.get('in', {})
+            step_in = step_in.values() if isinstance(step_in, dict) else step_in
+            for connection in step_in:
+                for source in WorkflowGraph.sources_of(connection):
+                    if source in inputs_ids:
+                        edges.add((f'inputs/{source}', f'steps/{step_id}'))
+
+        outputs_subgraph = pydot.Subgraph(graph_name='cluster_outputs')
+        graph.add_subgraph(outputs_subgraph)
+        outputs_subgraph.set_rank('same')
+        outputs_subgraph.set('style', 'dashed')
+        outputs_subgraph.set_label('Workflow Outputs')
+        outputs_subgraph.set_labelloc('b')
+        for workflow_output in workflow.outputs:
+            outputs_subgraph.add_node(
+                cls._node(f'outputs/{workflow_output["id"]}', workflow_output['id'], '#94DDF4')
+            )
+            for source in WorkflowGraph.sources_of(workflow_output.get('outputSource', None)):
+                node = source_node(source)
+                if node is not None:
+                    edges.add((node, f'outputs/{workflow_output["id"]}'))
+
+        for source, target in sorted(edges):
+            graph.add_edge(pydot.Edge(source, target))
+        return graph
@@ -1,10 +1,63 @@
+import hashlib
+import json
+import os
 import uuid
 from abc import ABC, abstractmethod
-from copy import deepcopy
+from copy import copy, deepcopy
 from io import StringIO
-from typing import Dict, List, Union, Optional
+from typing import Callable, Dict, List, Union, Optional
 
 from ruamel import yaml
+from ruamel.yaml import YAML
+
+from .WorkflowGraph import WorkflowGraph
+
+
+def _read_only(*args, **kwargs):
+    raise TypeError('the data of a registered component are read only, use a copy of them')
+
+
+class ReadOnlyDict(dict):
+    """A dict that cannot be modified. Copies of it, through copy.copy and copy.deepcopy, are mutable dicts."""
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = __ior__ = _read_only
+
+    def __copy__(self) -> Dict:
+        return dict(self)
+
+    def __deepcopy__(self, memo) -> Dict:
+        return {key: deepcopy(value, memo) for key, value in self.items()}
+
+    def __reduce_ex__(self, protocol):
+        return ReadOnlyDict, (dict(self),)
+
+
+class ReadOnlyList(list):
+    """A list that cannot be modified. Copies of it, through copy.copy and copy.deepcopy, are mutable lists."""
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __copy__(self) -> List:
+        return list(self)
+
+    def __deepcopy__(self, memo) -> List:
+        return [deepcopy(value, memo) for value in self]
+
+    def __reduce_ex__(self, protocol):
+        return ReadOnlyList, (list(self),)
+
+
+def freeze(data):
+    """
+    Converts recursively the dicts and the lists of the data to read only ones. The data which are already read only
+    are returned as is, so they are shared without copying.
+    """
+    if isinstance(data, (ReadOnlyDict, ReadOnlyList)):
+        return data
+    if isinstance(data, dict):
+        return ReadOnlyDict((key, freeze(value)) for key, value in data.items())
+    if isinstance(data, list):
+        return ReadOnlyList(freeze(value) for value in data)
+    return data
 
 
 class WorkflowComponent(ABC):
@@ -44,6 +97,12 @@ class WorkflowComponent(ABC):
     def compose_requirements(self) -> Dict:
         pass
 
+    def snapshot(self) -> 'WorkflowComponent':
+        """
+        @return: a copy of the component which is not affected by the later changes of that component
+        """
+        return deepcopy(self)
+
     @classmethod
     def _convert_inputs_from_dict_to_list(cls, inputs: Dict) -> List[Dict]:
         return [{'id': id, **cwl_input} for id, cwl_input in inputs.items()]
@@ -64,24 +123,80 @@ class WorkflowComponent(ABC):
                 return inp
         return None
 
+    def content_hash(self) -> str:
+        """@return: the sha256 of the description of the component"""
+        return hashlib.sha256(json.dumps(self.to_dict(), sort_keys=True, default=str).encode()).hexdigest()
+
+    def validate(self, resolve: Optional[Callable[[str], Optional['WorkflowComponent']]] = None) -> List[str]:
+        """
+        Checks the description of the component without loading it with cwltool.
+        @param resolve: returns the registered component with that id or None, it is used to find the tools of steps
+        @return: the problems which are found, it is empty if the component is valid
+        """
+        problems = []
+        for ports_name, ports in (('input', self.inputs), ('output', self.outputs)):
+            for port_id in self._duplicates(port.get('id', None) for port in ports):
+                problems.append(f"duplicate {ports_name} id '{port_id}'")
+            for port in ports:
+                if 'type' not in port:
+                    problems.append(f"{ports_name} '{port.get('id', None)}' has no type")
+        return problems
+
+    @classmethod
+    def _duplicates(cls, ids) -> List[str]:
+        seen, duplicates = set(), []
+        for port_id in ids:
+            if port_id in seen and port_id not in duplicates:
+                duplicates.append(port_id)
+            seen.add(port_id)
+        return duplicates
+
+    @classmethod
+    def _port_type(cls, port_type) -> Optional[str]:
+        """
+        @return: the type of a port as a string, e.g. File or File[], without the optional marker or None if the type
+        is not simple enough to be compared
+        """
+        if isinstance(port_type, str):
+            port_type = port_type[:-1] if port_type.endswith('?') else port_type
+            if port_type.endswith('[]'):
+                items_type = cls._port_type(port_type[:-2])
+                return f'{items_type}[]' if items_type is not None else None
+            return 'File' if port_type in ('stdout', 'stderr') else port_type
+        if isinstance(port_type, list):
+            port_type = [t for t in port_type if t != 'null']
+            return cls._port_type(port_type[0]) if len(port_type) == 1 else None
+        if isinstance(port_type, dict) and port_type.get('type', None) == 'array':
+            items_type = cls._port_type(port_type.get('items', None))
+            return f'{items_type}[]' if items_type is not None else None
+        return None
+
+    @classmethod
+    def _is_optional(cls, port: Dict) -> bool:
+        port_type = port.get('type', None)
+        return 'default' in port \
+            or (isinstance(port_type, str) and port_type.endswith('?')) \
+            or (isinstance(port_type, list) and 'null' in port_type)
+
 
 class CWLTool(WorkflowComponent):
 
     def __init__(self, workflow_id: str, command_line_tool: Dict):
         super().__init__(workflow_id, command_line_tool)
-        self._command_line_tool = command_line_tool
+        self._command_line_tool = freeze(command_line_tool)
 
     @property
     def command_line_tool(self) -> Dict:
+        """The read only description of the tool."""
         return self._command_line_tool
 
     @command_line_tool.setter
     def command_line_tool(self, command_line_tool: Dict):
-        self._command_line_tool = command_line_tool
+        self._command_line_tool = freeze(command_line_tool)
 
     def to_yaml(self) -> str:
         yaml_text = StringIO()
-        yaml.dump(self.command_line_tool, yaml_text)
+        yaml.dump(self.to_dict(), yaml_text)
         return yaml_text.getvalue()
 
     def to_dict(self) -> Dict:
@@ -89,11 +204,15 @@ class CWLTool(WorkflowComponent):
 
     @property
     def inputs(self) -> List[Dict]:
-        return deepcopy(self._command_line_tool['inputs'])
+        return self._command_line_tool['inputs']
 
     @property
     def outputs(self) -> List[Dict]:
-        return deepcopy(self._command_line_tool['outputs'])
+        return self._command_line_tool['outputs']
+
+    def snapshot(self) -> 'CWLTool':
+        # the description is read only, so the snapshot shares it
+        return CWLTool(self.id, self._command_line_tool)
 
     def _packed_steps(self) -> Dict:
         to_return = self.to_dict()
@@ -108,55 +227,141 @@ class CWLWorkflow(WorkflowComponent):
 
     def __init__(self, workflow_id: str, workflow: Optional[Dict] = None) -> None:
         super().__init__(workflow_id, workflow)
+        # inputs and outputs are read only and they are replaced on every change, steps are modified in place and
+        # their read only view is built on demand
         if workflow is None:
-            self._inputs: List[Dict] = []
-            self._outputs: List[Dict] = []
+            self._inputs: List[Dict] = ReadOnlyList()
+            self._outputs: List[Dict] = ReadOnlyList()
             self._steps: Dict = {}
             self._requirements: Dict = {}
         else:
-            self._inputs: List[Dict] = deepcopy(workflow['inputs'])
-            self._outputs: List[Dict] = deepcopy(workflow['outputs'])
+            self._inputs: List[Dict] = freeze(workflow['inputs'])
+            self._outputs: List[Dict] = freeze(workflow['outputs'])
             self._steps: Dict = deepcopy(workflow['steps'])
             self._requirements = {}
             if 'requirements' in workflow:
                 self._requirements: Dict = deepcopy(workflow['requirements'])
+        self._steps_view: Optional[Dict] = None
+        self._graph = WorkflowGraph()
+        for step_id in self._steps:
+            self._graph.add_node(step_id)
+        for step_id, step in self._steps.items():
+            for connection in self._step_in_connections(step):
+                self._connect(connection, step_id)
 
     @property
-    def steps(self):
-        steps = {}
-        for step in self._steps:
-            steps[step] = deepcopy(self._steps[step])
-            if not isinstance(steps[step]['run'], str):
-                steps[step]['run'] = steps[step]['run'][1]
-        return deepcopy(steps)
+    def graph(self) -> WorkflowGraph:
+        """The dependency graph of the steps. It follows the changes of the workflow and it must not be modified."""
+        return self._graph
+
+    @classmethod
+    def _step_in_connections(cls, step: Dict) -> List:
+        step_in = step.get('in', {})
+        return list(step_in.values()) if isinstance(step_in, dict) else list(step_in)
+
+    @classmethod
+    def _dependencies(cls, connection) -> List[str]:
+        """@return: the ids of the steps which the connection refers to, the workflow inputs are not steps"""
+        return [source.split('/')[0] for source in WorkflowGraph.sources_of(connection) if '/' in source]
+
+    def _connect(self, connection, step_id: str) -> None:
+        # the references to unknown steps are not part of the graph, validate reports them
+        for dependency in self._dependencies(connection):
+            if dependency in self._graph:
+                self._graph.add_edge(dependency, step_id)
+
+    def _disconnect(self, connection, step_id: str) -> None:
+        for dependency in self._dependencies(connection):
+            if dependency in self._graph:
+                self._graph.remove_edge(dependency, step_id)
+
+    @property
+    def steps(self) -> Dict:
+        """The read only steps of the workflow, where the run field of the composed steps is the reference."""
+        if self._steps_view is None:
+            self._steps_view = freeze({
+                step_id: {**step, 'run': step['run'][1]} if isinstance(step['run'], tuple) else step
+                for step_id, step in self._steps.items()
+            })
+        return self._steps_view
 
     def add(self, component: WorkflowComponent, step_name: str, run_reference: Optional[str] = None) -> None:
         if run_reference is None:
             run_reference = f'{component.id}.cwl'
+        if step_name in self._steps:
+            for connection in self._step_in_connections(self._steps[step_name]):
+                self._disconnect(connection, step_name)
+        else:
+            self._graph.add_node(step_name)
+            # the steps which already refer to the new step are connected to it
+            for step_id, step in self._steps.items():
+                for connection in self._step_in_connections(step):
+                    for dependency in self._dependencies(connection):
+                        if dependency == step_name:
+                            self._graph.add_edge(step_name, step_id)
         self._steps[step_name] = {
             'run': (component, run_reference),
             'in': {},
             'out': []
         }
+        self._steps_view = None
         self._requirements = {**self._requirements, **component.compose_requirements()}
 
+    def _runs(self, step: Dict, component: WorkflowComponent) -> bool:
+        run = step['run']
+        if isinstance(run, tuple):
+            return run[0].id == component.id
+        if isinstance(run, str):
+            return os.path.splitext(os.path.basename(run))[0] == component.id
+        return isinstance(run, dict) and run.get('id', None) == component.id
+
     def remove(self, component: WorkflowComponent) -> None:
-        raise NotImplementedError()
+        """
+        Removes the steps which run the component. The inputs of the other steps and the outputs of the workflow which
+        are connected to the removed steps are removed too.
+        @raise KeyError: if there is no step which runs the component
+        """
+        removed_steps = {step_id for step_id, step in self._steps.items() if self._runs(step, component)}
+        if len(removed_steps) == 0:
+            raise KeyError(f'{component.id} is not a step of the workflow {self.id}')
+        for step_id in removed_steps:
+            for successor in self._graph.successors(step_id):
+                if successor in removed_steps:
+                    continue
+                step_in = self._steps[successor]['in']
+                for in_id, connection in list(step_in.items()) if isinstance(step_in, dict) else enumerate(step_in):
+                    if removed_steps.intersection(self._dependencies(connection)):
+                        self._disconnect(connection, successor)
+                        step_in[in_id] = None
+                self._steps[successor]['in'] = {k: v for k, v in step_in.items() if v is not None} \
+                    if isinstance(step_in, dict) else [v for v in step_in if v is not None]
+            self._graph.remove_node(step_id)
+            self._steps.pop(step_id)
+        self._outputs = freeze([
+            output for output in self._outputs
+            if not removed_steps.intersection(self._dependencies(output.get('outputSource', None)))
+        ])
+        self._steps_view = None
 
     def add_input(self, workflow_input: Dict, step_id: str, in_step_id: str):
-        self._inputs.append(workflow_input)
+        if in_step_id in self._steps[step_id]['in']:
+            self._disconnect(self._steps[step_id]['in'][in_step_id], step_id)
         self._steps[step_id]['in'][in_step_id] = workflow_input['id']
-        self._inputs = list({inp['id']: inp for inp in self._inputs}.values())
+        self._steps_view = None
+        inputs = {inp['id']: inp for inp in self._inputs}
+        inputs[workflow_input['id']] = workflow_input
+        self._inputs = freeze(list(inputs.values()))
 
     def add_output_source(self, output_ref: str, type_of: str):
         references = output_ref.split('/')
         output_id = references[-1]
         references = references[:-1]
-        self._outputs.append(
-            {'id': output_id, 'type': type_of, 'outputSource': output_ref}
+        self._outputs = freeze(
+            [*self._outputs, {'id': output_id, 'type': type_of, 'outputSource': output_ref}]
         )
         self._steps[references[0]]['out'].append(output_id)
         self._steps[references[0]]['out'] = list(set(self._steps[references[0]]['out']))
+        self._steps_view = None
 
     def to_yaml(self) -> str:
         yaml_text = StringIO()
@@ -170,28 +375,147 @@ class CWLWorkflow(WorkflowComponent):
             'cwlVersion': 'v1.0',
             'class': 'Workflow',
             'id': self.id,
-            'inputs': self._inputs,
-            'outputs': self._outputs,
-            'steps': self.steps,
+            'inputs': deepcopy(self._inputs),
+            'outputs': deepcopy(self._outputs),
+            'steps': deepcopy(self.steps),
             'requirements': self._requirements
         }
 
-    def validate(self):
-        raise NotImplementedError()
+    def get_step_components(self, resolve: Optional[Callable[[str], Optional[WorkflowComponent]]] = None) \
+            -> Dict[str, Optional[WorkflowComponent]]:
+        """
+        @param resolve: returns the registered component with that id or None, it is used for the steps which refer to
+        their tool by path
+        @return: the component which every step runs or None if it is not found
+        """
+        return {step_id: self._step_component(step, resolve) for step_id, step in self._steps.items()}
+
+    @classmethod
+    def _step_component(cls, step: Dict, resolve: Optional[Callable[[str], Optional[WorkflowComponent]]]) \
+            -> Optional[WorkflowComponent]:
+        run = step['run']
+        if isinstance(run, tuple):
+            return run[0]
+        if isinstance(run, dict):
+            if 'id' not in run:
+                # the id is derived from the description, so the component and its hash are the same every time
+                run = {'id': hashlib.sha256(json.dumps(run, sort_keys=True, default=str).encode()).hexdigest(), **run}
+            try:
+                return WorkflowComponentFactory().get_workflow_component_from_dict(run)
+            except (KeyError, NotImplementedError):
+                return None
+        if isinstance(run, str) and resolve is not None:
+            return resolve(os.path.splitext(os.path.basename(run))[0])
+        return None
+
+    def validate(self, resolve: Optional[Callable[[str], Optional[WorkflowComponent]]] = None) -> List[str]:
+        """
+        Checks the ids of the workflow, that every connection refers to an existing input or step output, that the
+        types of the connected ports match, that the required inputs of the steps are connected and that the steps do
+        not form a cycle.
+        @param resolve: returns the registered component with that id or None, it is used to find the tools of steps
+        @return: the problems which are found, it is empty if the component is valid
+        """
+        problems = super().validate(resolve)
+        inputs = {}
+        for workflow_input in self._inputs:
+            inputs.setdefault(workflow_input.get('id', None), workflow_input)
+        for step_id in self._steps:
+            if step_id in inputs:
+                problems.append(f"step '{step_id}' has the same id with an input")
+        components = self.get_step_components(resolve)
+        for step_id, component in components.items():
+            if component is None:
+                problems.append(f"step '{step_id}': tool '{self.steps[step_id]['run']}' is not found")
+
+        def scattered(step_id: str) -> List[str]:
+            scatter = self._steps[step_id].get('scatter', [])
+            return [scatter] if isinstance(scatter, str) else list(scatter)
+
+        def source_type(source: str, location: str) -> Optional[str]:
+            """@return: the type of the source, or None if it is unknown, and records the dangling sources"""
+            if '/' not in source:
+                if source not in inputs:
+                    problems.append(f"{location}: source '{source}' is not an input of the workflow")
+                    return None
+                return self._port_type(inputs[source].get('type', None))
+            step_id, output_id = source.split('/', 1)
+            if step_id not in self._steps:
+                problems.append(f"{location}: source '{source}' refers to the unknown step '{step_id}'")
+                return None
+            step_out = [out['id'] if isinstance(out, dict) else out for out in self._steps[step_id].get('out', [])]
+            component = components[step_id]
+            if output_id not in step_out or (component is not None and component.get_output(output_id) is None):
+                problems.append(f"{location}: source '{source}' is not an output of the step '{step_id}'")
+                return None
+            if component is None:
+                return None
+            output_type = self._port_type(component.get_output(output_id).get('type', None))
+            return f'{output_type}[]' if output_type is not None and len(scattered(step_id)) > 0 else output_type
+
+        def check_types(location: str, sources: List[str], sink_type: Optional[str], unchecked: bool) -> None:
+            types = [source_type(source, location) for source in sources]
+            if len(types) != 1 or unchecked or sink_type is None or types[0] is None or 'Any' in (sink_type, types[0]):
+                return
+            if types[0] != sink_type:
+                problems.append(f"{location}: type {types[0]} of '{sources[0]}' does not match the type {sink_type}")
+
+        for step_id, step in self._steps.items():
+            component = components[step_id]
+            step_in = step.get('in', {})
+            step_in = step_in if isinstance(step_in, dict) else {entry.get('id', None): entry for entry in step_in}
+            for in_id, connection in step_in.items():
+                location = f"step '{step_id}' input '{in_id}'"
+                sink = component.get_input(in_id) if component is not None else None
+                sink_type = self._port_type(sink.get('type', None)) if sink is not None else None
+                if sink_type is not None and in_id in scattered(step_id):
+                    sink_type = f'{sink_type}[]'
+                # the value of the merged or the transformed connections is not known before the execution
+                unchecked = isinstance(connection, dict) and ('linkMerge' in connection or 'valueFrom' in connection)
+                check_types(location, WorkflowGraph.sources_of(connection), sink_type, unchecked)
+            if component is not None:
+                for tool_input in component.inputs:
+                    if tool_input['id'] not in step_in and not self._is_optional(tool_input):
+                        problems.append(f"step '{step_id}': required input '{tool_input['id']}' is not connected")
+        for workflow_output in self._outputs:
+            location = f"output '{workflow_output.get('id', None)}'"
+            sources = WorkflowGraph.sources_of(workflow_output.get('outputSource', None))
+            if len(sources) == 0:
+                problems.append(f'{location}: outputSource is missing')
+            check_types(
+                location, sources, self._port_type(workflow_output.get('type', None)), 'linkMerge' in workflow_output
+            )
+        if self._graph.has_cycle():
+            problems.append('the steps form a cycle')
+        return problems
 
     def add_step_in_out(self, connect: Union[str, dict], step_in_name: str, step_in: str,
                         step_out: Optional[str] = None, step_out_id: Optional[str] = None):
+        if step_in_name in self._steps[step_in]['in']:
+            self._disconnect(self._steps[step_in]['in'][step_in_name], step_in)
         self._steps[step_in]['in'][step_in_name] = deepcopy(connect)
+        self._connect(connect, step_in)
         if step_out is not None and step_out_id is not None:
             self._steps[step_out]['out'].append(step_out_id)
+        self._steps_view = None
 
     @property
     def inputs(self) -> List[Dict]:
-        return deepcopy(self._inputs)
+        return self._inputs
 
     @property
     def outputs(self) -> List[Dict]:
-        return deepcopy(self._outputs)
+        return self._outputs
+
+    def snapshot(self) -> 'CWLWorkflow':
+        # inputs and outputs are read only, the steps are copied but the composed components are shared
+        workflow = copy(self)
+        workflow._steps = {
+            step_id: {key: copy(value) for key, value in step.items()} for step_id, step in self._steps.items()
+        }
+        workflow._requirements = deepcopy(self._requirements)
+        workflow._graph = self._graph.copy()
+        return workflow
 
     def compose_requirements(self) -> Dict:
         return {'SubworkflowFeatureRequirement': {}}
@@ -199,7 +523,11 @@ class CWLWorkflow(WorkflowComponent):
 
 class WorkflowComponentFactory:
     def get_workflow_component(self, yaml_string: str) -> WorkflowComponent:
-        component = yaml.safe_load(StringIO(yaml_string))
+        return self.get_workflow_component_from_dict(YAML(typ='safe', pure=False).load(StringIO(yaml_string)))
+
+    def get_workflow_component_from_dict(self, component: Dict) -> WorkflowComponent:
+        """Creates the component from an already parsed description, the description is not modified."""
+        component = dict(component)
         if 'id' not in component:
             component['id'] = str(uuid.uuid4())
         if component['class'] == 'CommandLineTool':
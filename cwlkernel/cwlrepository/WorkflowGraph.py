@@ -0,0 +1,192 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+
+class CycleError(ValueError):
+    pass
+
+
+class WorkflowGraph:
+    """
+    The dependency graph of the steps of a workflow. Every step is a node and there is an edge from a step to every
+    step which consumes one of its outputs. The edges are counted, so a connection can be removed without affecting
+    the other connections between the same steps.
+    While the graph is acyclic a topological order of the nodes is kept. When an edge is added, only the nodes between
+    its two ends in the order are searched to detect a cycle and they are reordered (Pearce and Kelly), so an edge
+    which agrees with the order is added in constant time. After a removal which may break a cycle, whether the graph
+    has a cycle is recomputed the next time that it is requested.
+    """
+
+    def __init__(self):
+        self._successors: Dict[str, Dict[str, int]] = OrderedDict()
+        self._predecessors: Dict[str, Dict[str, int]] = OrderedDict()
+        # None when it has to be recomputed after a removal
+        self._cyclic: Optional[bool] = False
+        # the position of every node in a topological order, it is valid while the graph is acyclic
+        self._index: Dict[str, int] = {}
+        self._next_index = 0
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._successors)
+
+    def successors(self, node: str) -> List[str]:
+        return list(self._successors[node])
+
+    def predecessors(self, node: str) -> List[str]:
+        return list(self._predecessors[node])
+
+    def __contains__(self, node: str) -> bool:
+        return node in self._successors
+
+    def edges(self) -> List[Tuple[str, str]]:
+        return [(source, target) for source, targets in self._successors.items() for target in targets]
+
+    def add_node(self, node: str) -> None:
+        if node not in self._successors:
+            self._successors[node] = OrderedDict()
+            self._predecessors[node] = OrderedDict()
+            self._index[node] = self._next_index
+            self._next_index += 1
+
+    def remove_node(self, node: str) -> None:
+        """Removes the node and all its edges."""
+        for target in self._successors.pop(node):
+            self._predecessors[target].pop(node)
+        for source in self._predecessors.pop(node):
+            self._successors[source].pop(node)
+        self._index.pop(node)
+        if self._cyclic:
+            self._cyclic = None
+
+    def add_edge(self, source: str, target: str) -> None:
+        """
+        Adds an edge between two nodes of the graph.
+        @raise KeyError: if one of the nodes does not exist
+        """
+        for node in (source, target):
+            if node not in self._successors:
+                raise KeyError(f'Unknown step: {node}')
+        new_edge = target not in self._successors[source]
+        self._successors[source][target] = self._successors[source].get(target, 0) + 1
+        self._predecessors[target][source] = self._successors[source][target]
+        if new_edge and self._cyclic is False:
+            self._reorder(source, target)
+
+    def remove_edge(self, source: str, target: str) -> None:
+        """Removes one edge between the nodes, if there are other edges between them they are kept."""
+        count = self._successors[source][target] - 1
+        if count > 0:
+            self._successors[source][target] = self._predecessors[target][source] = count
+            return
+        self._successors[source].pop(target)
+        self._predecessors[target].pop(source)
+        if self._cyclic:
+            self._cyclic = None
+
+    def has_cycle(self) -> bool:
+        if self._cyclic is None:
+            try:
+                order = self.topological_order()
+                self._cyclic = False
+                self._index = {node: index for index, node in enumerate(order)}
+                self._next_index = len(order)
+            except CycleError:
+                self._cyclic = True
+        return self._cyclic
+
+    def _reorder(self, source: str, target: str) -> None:
+        """Restores the topological order after the edge from the source to the target is added."""
+        lower, upper = self._index[target], self._index[source]
+        if lower > upper:
+            return
+        # the nodes after the target which come before the source in the order and are reachable from the target
+        forward = self._search(target, self._successors, lambda node: self._index[node] <= upper)
+        if source in forward:
+            self._cyclic = True
+            return
+        # the nodes before the source which come after the target in the order and reach the source
+        backward = self._search(source, self._predecessors, lambda node: self._index[node] > lower)
+        affected = sorted(backward, key=self._index.get) + sorted(forward, key=self._index.get)
+        for node, index in zip(affected, sorted(self._index[node] for node in affected)):
+            self._index[node] = index
+
+    @classmethod
+    def _search(cls, start: str, neighbours: Dict[str, Dict[str, int]], is_affected: Callable[[str], bool]) \
+            -> Set[str]:
+        visited, to_visit = {start}, [start]
+        while len(to_visit) > 0:
+            for neighbour in neighbours[to_visit.pop()]:
+                if neighbour not in visited and is_affected(neighbour):
+                    visited.add(neighbour)
+                    to_visit.append(neighbour)
+        return visited
+
+    def topological_order(self) -> List[str]:
+        """
+        @return: the nodes ordered so that every node comes after all its predecessors
+        @raise CycleError: if the graph has a cycle
+        """
+        in_degree = {node: len(sources) for node, sources in self._predecessors.items()}
+        ready = [node for node, degree in in_degree.items() if degree == 0]
+        order = []
+        while len(ready) > 0:
+            node = ready.pop(0)
+            order.append(node)
+            for target in self._successors[node]:
+                in_degree[target] -= 1
+                if in_degree[target] == 0:
+                    ready.append(target)
+        if len(order) != len(self._successors):
+            raise CycleError(f'the steps {sorted(set(self._successors) - set(order))} are in a cycle')
+        return order
+
+    def critical_path(self, weights: Optional[Dict[str, float]] = None) -> Tuple[List[str], float]:
+        """
+        Finds the path with the maximum total weight, which bounds the duration of a run when the independent steps
+        run in parallel.
+        @param weights: the weight, e.g. the duration, of every node. By default every node weights 1
+        @return: the nodes of the path and its total weight
+        @raise CycleError: if the graph has a cycle
+        """
+        weights = weights if weights is not None else {}
+        cost: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        for node in self.topological_order():
+            best = max(self._predecessors[node], key=lambda source: cost[source], default=None)
+            cost[node] = weights.get(node, 1) + (cost[best] if best is not None else 0)
+            previous[node] = best
+        if len(cost) == 0:
+            return [], 0
+        node = max(cost, key=lambda n: cost[n])
+        total = cost[node]
+        path = []
+        while node is not None:
+            path.append(node)
+            node = previous[node]
+        return path[::-1], total
+
+    def copy(self) -> 'WorkflowGraph':
+        graph = WorkflowGraph()
+        graph._successors = OrderedDict((node, OrderedDict(targets)) for node, targets in self._successors.items())
+        graph._predecessors = OrderedDict(
+            (node, OrderedDict(sources)) for node, sources in self._predecessors.items()
+        )
+        graph._cyclic = self._cyclic
+        graph._index = dict(self._index)
+        graph._next_index = self._next_index
+        return graph
+
+    @classmethod
+    def sources_of(cls, connection) -> Iterable[str]:
+        """
+        @param connection: the value of an entry of the in field of a step or an outputSource
+        @return: the references of the connection, e.g. step/output or the id of a workflow input
+        """
+        if isinstance(connection, dict):
+            connection = connection.get('source', None)
+        if isinstance(connection, str):
+            return [connection.lstrip('#')]
+        if isinstance(connection, list):
+            return [source.lstrip('#') for source in connection if isinstance(source, str)]
+        return []
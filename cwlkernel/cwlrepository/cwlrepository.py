@@ -1,19 +1,40 @@
-from collections import Iterable
-from copy import deepcopy
+import hashlib
+import inspect
+import os
+import threading
+import weakref
+from collections import Iterable, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Iterator, Optional, Tuple
+from typing import Dict, Iterator, Optional, Tuple, List, Callable, Set
 
 from cwlkernel.IOManager import IOFileManager
-from cwlkernel.cwlrepository.CWLComponent import WorkflowComponent
+from cwlkernel.cwlrepository.CWLComponent import WorkflowComponent, CWLWorkflow
 
 
 class WorkflowRepository(Iterable):
     class __SingletonWorkflowRepository__:
         _registry: Dict[str, Tuple[WorkflowComponent, Path]]
         _file_repository: IOFileManager
+        # the listeners are kept by a function which returns them, bound methods are kept by a weak reference so the
+        # repository does not keep their objects alive
+        _listeners: List[Callable[[], Optional[Callable[[str, Path], None]]]]
+        # the ids of the registered tools which have not been written to their path yet
+        _unwritten_tools: Set[str]
+        # guards the registry and the unwritten tools, the tools are written by the background executions too
+        _lock: threading.RLock
+        # the number of threads which write the tools when there are many unwritten tools
+        WRITE_WORKERS = 4
+        # the results of the validations by the hash of the tool and of the tools of its steps
+        _validation_cache: Dict[str, List[str]]
+        VALIDATION_CACHE_SIZE = 1024
 
         def __init__(self, directory: Path):
             self._registry = {}
+            self._listeners = []
+            self._unwritten_tools = set()
+            self._lock = threading.RLock()
+            self._validation_cache = OrderedDict()
             directory.mkdir(parents=True, exist_ok=True)
             self._file_repository = IOFileManager(str(directory.absolute()))
 
@@ -36,38 +57,180 @@ class WorkflowRepository(Iterable):
                     raise MissingIdError(f'Missing id for outputs: {output}')
 
         def register_tool(self, tool: WorkflowComponent, relative_directory: Optional[Path] = None) -> None:
-            self.validate(tool)
-            if tool.id in self._registry:
-                raise KeyError(f'Dublicate key error: {tool.id}')
-            relative_directory = relative_directory.as_posix() if relative_directory is not None else f'{tool.id}.cwl'
-            path = Path(self._file_repository.write(relative_directory, tool.to_yaml().encode()))
-            self._registry[tool.id] = (deepcopy(tool), path)
+            """
+            Registers a snapshot of the tool. The tool is written to its path when a path of the repository is
+            requested for the first time.
+            """
+            self.register_many([tool], [relative_directory])
+
+        def register_many(self, tools: List[WorkflowComponent],
+                          relative_directories: Optional[List[Optional[Path]]] = None) -> List[Path]:
+            """
+            Registers multiple tools at once. All the tools are validated before any of them is registered, so either
+            all of them or none of them are registered.
+            :raises TypeError, MissingIdError if one of the tools is not valid
+            :raises KeyError if one of the tools' id is already registered or it is duplicated
+            :param tools: the tools to register
+            :param relative_directories: the paths of the tools relative to the repository, by default [tool id].cwl
+            :return: the paths of the tools
+            """
+            if relative_directories is None:
+                relative_directories = [None] * len(tools)
+            if len(relative_directories) != len(tools):
+                raise ValueError('Expected one relative directory for every tool')
+            paths = []
+            for tool, relative_directory in zip(tools, relative_directories):
+                self.validate(tool)
+                relative_directory = relative_directory.as_posix() if relative_directory is not None \
+                    else f'{tool.id}.cwl'
+                paths.append(
+                    Path(os.path.realpath(os.path.join(self._file_repository.ROOT_DIRECTORY, relative_directory)))
+                )
+            with self._lock:
+                tools_ids = set()
+                for tool in tools:
+                    if tool.id in self._registry or tool.id in tools_ids:
+                        raise KeyError(f'Dublicate key error: {tool.id}')
+                    tools_ids.add(tool.id)
+                try:
+                    for tool, path in zip(tools, paths):
+                        self._registry[tool.id] = (tool.snapshot(), path)
+                        self._unwritten_tools.add(tool.id)
+                except Exception:
+                    for tool_id in tools_ids:
+                        self._registry.pop(tool_id, None)
+                        self._unwritten_tools.discard(tool_id)
+                    raise
+            for tool, path in zip(tools, paths):
+                self._notify_listeners(tool.id, path)
+            return paths
+
+        def add_files(self, files: List[Tuple[Path, bytes]]) -> List[Path]:
+            """
+            Writes files which the tools refer to, like the files of the $import and $include directives, next to them.
+            The files are removed when the repository is deleted.
+            :param files: the paths of the files relative to the repository and their content
+            :return: the paths of the files
+            """
+            return [
+                Path(self._file_repository.write(relative_directory.as_posix(), content))
+                for relative_directory, content in files
+            ]
+
+        def _write_tools(self) -> None:
+            """
+            Writes the unwritten tools. They are written all together because workflows refer to other tools by their
+            relative paths. The lock is held until they are written, so a concurrent caller does not get the path of a
+            tool before it is written.
+            """
+            def write_tool(entry: Tuple[WorkflowComponent, Path]) -> None:
+                tool, path = entry
+                self._file_repository.write(
+                    os.path.relpath(path, self._file_repository.ROOT_DIRECTORY), tool.to_yaml().encode()
+                )
+
+            with self._lock:
+                unwritten_tools = sorted(self._unwritten_tools)
+                entries = [self._registry[tool_id] for tool_id in unwritten_tools]
+                if len(entries) < self.WRITE_WORKERS:
+                    for entry in entries:
+                        write_tool(entry)
+                else:
+                    with ThreadPoolExecutor(max_workers=self.WRITE_WORKERS) as executor:
+                        list(executor.map(write_tool, entries))
+                self._unwritten_tools.difference_update(unwritten_tools)
+
+        def validate_by_id(self, tool_id: str) -> List[str]:
+            """
+            Checks a registered tool against the registered tools that its steps run, see WorkflowComponent.validate.
+            The results are cached by the content of the tools, so a tool is checked again only if it or one of its
+            steps change.
+            :raises KeyError if the tool is not registered
+            :return: the problems which are found, it is empty if the tool is valid
+            """
+            tool = self.get_by_id(tool_id)
+            if tool is None:
+                raise KeyError(f'Tool {tool_id} is not registered')
+            key = self._validation_key(tool, set())
+            problems = self._validation_cache.get(key, None)
+            if problems is None:
+                problems = tool.validate(self.get_by_id)
+                self._validation_cache[key] = problems
+                while len(self._validation_cache) > self.VALIDATION_CACHE_SIZE:
+                    self._validation_cache.popitem(last=False)
+            return list(problems)
+
+        def _validation_key(self, tool: WorkflowComponent, visited: Set[int]) -> str:
+            key = hashlib.sha256(tool.content_hash().encode())
+            visited.add(id(tool))
+            if isinstance(tool, CWLWorkflow):
+                for step_id, component in tool.get_step_components(self.get_by_id).items():
+                    key.update(step_id.encode())
+                    if component is None:
+                        key.update(b'missing')
+                    elif id(component) not in visited:
+                        key.update(self._validation_key(component, visited).encode())
+            return key.hexdigest()
+
+        def add_listener(self, listener: Callable[[str, Path], None]) -> None:
+            """
+            Registers a callback which is called with the tool's id and path every time that a tool is registered or
+            deleted. If the callback is a bound method it is removed when its object is garbage collected.
+            """
+            self._listeners.append(weakref.WeakMethod(listener) if inspect.ismethod(listener) else lambda: listener)
+
+        def remove_listener(self, listener: Callable[[str, Path], None]) -> None:
+            self._listeners = [reference for reference in self._listeners if reference() not in (listener, None)]
+
+        def _notify_listeners(self, tool_id: str, path: Path) -> None:
+            self._listeners = [reference for reference in self._listeners if reference() is not None]
+            for reference in list(self._listeners):
+                listener = reference()
+                if listener is not None:
+                    listener(tool_id, path)
 
         def get_by_id(self, tool_id: str) -> Optional[WorkflowComponent]:
             comp = self._registry.get(tool_id, None)
             return comp[0] if comp is not None else None
 
         def get_entry_by_id(self, tool_id: str):
-            return self._registry.get(tool_id, None)
+            with self._lock:
+                self._write_tools()
+                return self._registry.get(tool_id, None)
 
         def __iter__(self) -> Iterator[WorkflowComponent]:
-            for tool in self._registry.values():
+            with self._lock:
+                tools = list(self._registry.values())
+            for tool in tools:
                 yield tool[0]
 
         def delete(self):
-            self._registry = {}
-            self._file_repository.clear()
+            with self._lock:
+                registry = self._registry
+                self._registry = {}
+                self._unwritten_tools = set()
+                self._file_repository.clear()
+            for tool_id, (_, path) in registry.items():
+                self._notify_listeners(tool_id, path)
 
         def get_tools_path_by_id(self, tool_id: str) -> Optional[Path]:
-            comp = self._registry.get(tool_id, None)
+            with self._lock:
+                self._write_tools()
+                comp = self._registry.get(tool_id, None)
             return comp[1] if comp is not None else None
 
         def delete_by_id(self, tool_id: str) -> Optional[WorkflowComponent]:
-            path = self.get_tools_path_by_id(tool_id)
-            if path is None:
-                return None
-            self._file_repository.remove(path.as_posix())
-            self._registry.pop(tool_id)
+            with self._lock:
+                comp = self._registry.get(tool_id, None)
+                if comp is None:
+                    return None
+                path = comp[1]
+                if tool_id in self._unwritten_tools:
+                    self._unwritten_tools.discard(tool_id)
+                else:
+                    self._file_repository.remove(path.as_posix())
+                self._registry.pop(tool_id)
+            self._notify_listeners(tool_id, path)
 
     __repo__: __SingletonWorkflowRepository__ = None
 
@@ -0,0 +1,70 @@
+import os
+import subprocess
+from pathlib import Path
+from typing import Dict, Tuple
+from urllib.parse import urlparse
+
+from .CWLGitResolver import CWLGitResolver
+
+
+class CWLGitCloneResolver(CWLGitResolver):
+    """
+    CWLGitCloneResolver makes a shallow clone of the repository once and resolves the cwl files from the local
+    checkout, instead of fetching every file through the github api. The url has the form
+    [repository url]/blob/[ref]/[path], so it works with github urls and with local repositories, e.g.
+    file:///srv/git/repo.git/blob/master/workflows/main.cwl
+    """
+
+    CLONES_DIRECTORY = '.clones'
+
+    def __init__(self, local_directory: Path, max_workers: int = 8):
+        super().__init__(local_directory, max_workers=max_workers)
+        # (owner, repository, ref) -> the directory of the checkout
+        self._checkouts: Dict[Tuple[str, str, str], str] = {}
+
+    def resolve_graph(self, git_url: str) -> Dict[str, Dict]:
+        repository_url, git_ref, git_path = self._parse_url(git_url)
+        repository_path = [p for p in urlparse(repository_url).path.split('/') if len(p) > 0]
+        git_owner = repository_path[-2] if len(repository_path) > 1 else '_'
+        git_repo = repository_path[-1][:-len('.git')] if repository_path[-1].endswith('.git') else repository_path[-1]
+        checkout_directory = os.path.join(
+            str(self._local_root_directory), self.CLONES_DIRECTORY, git_owner, git_repo, git_ref
+        )
+        self._checkout(repository_url, git_ref, checkout_directory)
+        self._checkouts[(git_owner, git_repo, git_ref)] = checkout_directory
+        return self._resolve_paths(git_path, git_owner, git_repo, git_ref)
+
+    @classmethod
+    def _parse_url(cls, git_url: str) -> Tuple[str, str, str]:
+        """@return: the url of the repository, the ref and the path of the file in the repository"""
+        if '/blob/' not in git_url:
+            raise ValueError(f'Expected a url of the form [repository url]/blob/[ref]/[path]: {git_url}')
+        repository_url, blob = git_url.split('/blob/', 1)
+        git_ref, git_path = blob.split('/', 1)
+        # the url and the ref are passed to git, so they must not be read as options
+        if repository_url.startswith('-') or git_ref.startswith('-'):
+            raise ValueError(f'Invalid repository url or ref: {git_url}')
+        return repository_url, git_ref, git_path
+
+    @classmethod
+    def _checkout(cls, repository_url: str, git_ref: str, checkout_directory: str) -> None:
+        """Clones shallowly the ref of the repository or, if it is already cloned, fetches the latest commit of it."""
+        if not os.path.isdir(os.path.join(checkout_directory, '.git')):
+            Path(checkout_directory).mkdir(parents=True, exist_ok=True)
+            cls._git('init', '-q', cwd=checkout_directory)
+            cls._git('remote', 'add', '--', 'origin', repository_url, cwd=checkout_directory)
+        cls._git('fetch', '-q', '--depth', '1', '--', 'origin', git_ref, cwd=checkout_directory)
+        cls._git('checkout', '-q', '--force', 'FETCH_HEAD', cwd=checkout_directory)
+
+    @classmethod
+    def _git(cls, *args: str, cwd: str) -> None:
+        try:
+            result = subprocess.run(['git', *args], cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except FileNotFoundError:
+            raise RuntimeError('git executable is not available')
+        if result.returncode != 0:
+            raise RuntimeError(f'Error on git {args[0]}: {result.stderr.decode()}')
+
+    def _fetch_file(self, path: str, git_owner: str, git_repo: str, git_branch: str) -> bytes:
+        with open(os.path.join(self._checkouts[(git_owner, git_repo, git_branch)], path), 'rb') as f:
+            return f.read()
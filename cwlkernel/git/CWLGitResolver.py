@@ -1,55 +1,172 @@
 import base64
+import json
 import os.path
+import posixpath
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from pathlib import Path
-from typing import List, Tuple, Dict
-from urllib.parse import urlparse
+from typing import List, Tuple, Dict, Optional, Set
+from urllib.parse import urlparse, quote
 
 import requests
-import ruamel.yaml as yaml
-from requests.compat import urljoin
+from ruamel.yaml import YAML
+from requests.adapters import HTTPAdapter
 
 
 class CWLGitResolver:
-    """CWLGitResolver fetches the required cwl files from a remote git url."""
+    """
+    CWLGitResolver fetches the required cwl files from a remote git url. The files of every level of the workflow are
+    fetched concurrently over a pooled session and they are cached on the disk. The cached files are revalidated with
+    their ETag, so unchanged files are not downloaded again.
+    """
 
-    def __init__(self, local_directory: Path):
+    GITHUB_API_URL = 'https://api.github.com'
+    CACHE_DIRECTORY = '.cache'
+    # the kinds of the resolved files, processes are the tools and the workflows
+    PROCESS = 'process'
+    IMPORT = 'import'
+    INCLUDE = 'include'
+
+    def __init__(self, local_directory: Path, base_url: Optional[str] = None, max_workers: int = 8):
+        """
+        @param local_directory: the directory where the fetched files are stored
+        @param base_url: the url of the github api, defaults to https://api.github.com
+        @param max_workers: the maximum number of concurrent requests
+        """
         self._local_root_directory = local_directory
         self._local_root_directory.mkdir(exist_ok=True)
+        self._base_url = (base_url if base_url is not None else self.GITHUB_API_URL).rstrip('/')
+        self._max_workers = max_workers
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
 
     def resolve(self, github_url: str) -> List[str]:
+        """@return: the local paths of the tool or workflow and of the tools that its steps run"""
+        return [
+            filename for filename, node in self.resolve_graph(github_url).items() if node['kind'] == self.PROCESS
+        ]
+
+    def resolve_graph(self, github_url: str) -> Dict[str, Dict]:
+        """
+        Resolves the dependency graph of a tool or a workflow.
+        @return: the local path of every resolved file -> its kind (process, import or include), its path in the
+        repository and the local paths of its dependencies. The files are ordered by their distance from the root.
+        """
         github_path = urlparse(github_url).path.split('/')
         git_owner = github_path[1]
         git_repo = github_path[2]
         git_branch = github_path[4]
         git_path = '/'.join(github_path[5:])
-        workflow_files = set()
-        root_path = git_path[:git_path.rfind('/')]
-        search_stack = {git_path}
-        while len(search_stack) > 0:
-            current_path = search_stack.pop()
-            if current_path not in workflow_files:
-                workflow_filename, workflow = self._resolve_file(current_path, git_owner, git_repo, git_branch)
-                workflow_files.add(workflow_filename)
-                if 'steps' in workflow:
-                    for step in workflow['steps']:
-                        if isinstance(workflow['steps'][step]['run'], str):
-                            file = '/'.join([root_path, workflow['steps'][step]['run']])
-                            if file not in workflow_files and file not in search_stack:
-                                search_stack.add(file)
-        return list(workflow_files)
-
-    def _resolve_file(self, path: str, git_owner: str, git_repo: str, git_branch: str) -> Tuple[str, Dict]:
-        url = urljoin(f"https://api.github.com/repos/{git_owner}/{git_repo}/contents/",
-                      f"{path}?ref={git_branch}")
-        github_response = requests.get(url)
+        return self._resolve_paths(git_path, git_owner, git_repo, git_branch)
+
+    def _resolve_paths(self, git_path: str, git_owner: str, git_repo: str, git_branch: str) -> Dict[str, Dict]:
+        """
+        Resolves the file and its dependencies, level by level. Every file is fetched once, even if multiple documents
+        refer to it.
+        """
+        def resolve_reference(reference: Tuple[str, str]):
+            path, kind = reference
+            return path, kind, self._resolve_file(path, git_owner, git_repo, git_branch, kind != self.INCLUDE)
+
+        graph: Dict[str, Dict] = OrderedDict()
+        visited: Set[str] = {git_path}
+        frontier = [(git_path, self.PROCESS)]
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            while len(frontier) > 0:
+                resolved_files = executor.map(resolve_reference, frontier)
+                frontier = []
+                for path, kind, (filename, document) in resolved_files:
+                    dependencies = self._get_references(path, document) if kind != self.INCLUDE else []
+                    graph[filename] = {
+                        'kind': kind,
+                        'path': path,
+                        'dependencies': [self._local_filename(d, git_owner, git_repo) for d, _ in dependencies],
+                    }
+                    for dependency in dependencies:
+                        if dependency[0] not in visited:
+                            visited.add(dependency[0])
+                            frontier.append(dependency)
+        return graph
+
+    @classmethod
+    def _get_references(cls, path: str, document) -> List[Tuple[str, str]]:
+        """
+        Finds the files that the document refers to, the tools that the steps of its workflows run, including the
+        inline ones, and the $import and $include directives.
+        @return: the normalized paths of the files relative to the repository's root and their kind
+        """
+        references: List[Tuple[str, str]] = []
+
+        def add_reference(reference: str, kind: str):
+            reference = urlparse(reference)
+            # skip the references to the same document and to other locations, the absolute paths and the urls are
+            # not files of the repository
+            if len(reference.scheme) > 0 or len(reference.netloc) > 0 or len(reference.path) == 0 \
+                    or posixpath.isabs(reference.path):
+                return
+            reference_path = posixpath.normpath(posixpath.join(posixpath.dirname(path), reference.path))
+            if not reference_path.startswith('..') and reference_path not in [r[0] for r in references]:
+                references.append((reference_path, kind))
+
+        def walk(node):
+            if isinstance(node, dict):
+                if isinstance(node.get('$import', None), str):
+                    add_reference(node['$import'], cls.IMPORT)
+                elif isinstance(node.get('$include', None), str):
+                    add_reference(node['$include'], cls.INCLUDE)
+                else:
+                    steps = node.get('steps', None) if node.get('class', 'Workflow') == 'Workflow' else None
+                    steps = steps.values() if isinstance(steps, dict) else steps if isinstance(steps, list) else []
+                    for step in steps:
+                        if isinstance(step, dict) and isinstance(step.get('run', None), str):
+                            add_reference(step['run'], cls.PROCESS)
+                    for value in node.values():
+                        walk(value)
+            elif isinstance(node, list):
+                for value in node:
+                    walk(value)
+
+        walk(document)
+        return references
+
+    def _local_filename(self, path: str, git_owner: str, git_repo: str) -> str:
+        return os.path.join(str(self._local_root_directory), git_owner, git_repo, path)
+
+    def _resolve_file(self, path: str, git_owner: str, git_repo: str, git_branch: str,
+                      parse: bool = True) -> Tuple[str, Optional[Dict]]:
+        content = self._fetch_file(path, git_owner, git_repo, git_branch)
+        workflow = YAML(typ='safe', pure=False).load(BytesIO(content)) if parse else None
+        workflow_filename = self._local_filename(path, git_owner, git_repo)
+        Path(os.path.dirname(workflow_filename)).mkdir(exist_ok=True, parents=True)
+        with open(workflow_filename, 'wb') as f:
+            f.write(content)
+        return workflow_filename, workflow
+
+    def _fetch_file(self, path: str, git_owner: str, git_repo: str, git_branch: str) -> bytes:
+        """
+        Fetches the content of a file. If the file is cached the request is conditional and the cached content is used
+        when the file has not been modified.
+        """
+        url = f"{self._base_url}/repos/{git_owner}/{git_repo}/contents/{quote(path)}?ref={git_branch}"
+        cache_filename = os.path.join(
+            str(self._local_root_directory), self.CACHE_DIRECTORY, git_owner, git_repo, git_branch, f'{path}.json'
+        )
+        cached = None
+        if os.path.isfile(cache_filename):
+            with open(cache_filename) as f:
+                cached = json.load(f)
+        headers = {'If-None-Match': cached['etag']} if cached is not None and cached['etag'] is not None else {}
+        github_response = self._session.get(url, headers=headers)
+        if github_response.status_code == 304 and cached is not None:
+            return base64.b64decode(cached['content'])
         if github_response.status_code != 200:
             raise RuntimeError(
                 f"Error on github api call for: {url}: {github_response.status_code}: {github_response.text}")
-        github_response = github_response.json()
-        workflow = yaml.load(BytesIO(base64.b64decode(github_response['content'])), yaml.Loader)
-        workflow_filename = os.path.join(str(self._local_root_directory), git_owner, git_repo, path)
-        Path(os.path.dirname(workflow_filename)).mkdir(exist_ok=True, parents=True)
-        with open(workflow_filename, 'w') as f:
-            yaml.dump(workflow, f)
-        return workflow_filename, workflow
+        content = github_response.json()['content']
+        Path(os.path.dirname(cache_filename)).mkdir(exist_ok=True, parents=True)
+        with open(cache_filename, 'w') as f:
+            json.dump({'etag': github_response.headers.get('ETag', None), 'content': content}, f)
+        return base64.b64decode(content)
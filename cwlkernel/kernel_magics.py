@@ -1,19 +1,18 @@
 import argparse
+import io
+import itertools
 import json
 import os
-import random
+import re
 import subprocess
 import traceback
-import xml.etree.ElementTree as ET
 from collections import OrderedDict
 from copy import deepcopy
 from io import StringIO
 from pathlib import Path
 from typing import List, Tuple, Dict, Optional
+from urllib.parse import urlparse
 
-import pydot
-from cwltool.cwlviewer import CWLViewer
-from cwltool.main import main as cwltool_main
 from ruamel.yaml import YAML
 
 from .CWLBuilder import CWLSnippetBuilder
@@ -123,6 +122,15 @@ class MagicSnippetBuilder:
 
 
 class ExecutionMagics:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('tool_id', type=str)
+    parser.add_argument('--parallel', dest='parallel', action='store_true', default=None)
+    parser.add_argument('--serial', dest='parallel', action='store_false')
+    parser.add_argument('--max-cores', dest='max_cores', type=float, default=None)
+    parser.add_argument('--max-ram', dest='max_ram', type=int, default=None)
+    parser.add_argument('--cache', dest='cache', action='store_true', default=None)
+    parser.add_argument('--no-cache', dest='cache', action='store_false')
+    parser.add_argument('--stream', dest='stream', action='store_true', default=None)
 
     @staticmethod
     def _parse_args(execute_argument_string: str):
@@ -131,20 +139,39 @@ class ExecutionMagics:
         yaml_str_data = '\n'.join(execute_argument_string[1:])
         return cwl_id, yaml_str_data
 
+    @classmethod
+    def _parse_execution_args(cls, args_line: str) -> argparse.Namespace:
+        try:
+            return cls.parser.parse_args(args_line.split())
+        except SystemExit:
+            raise RuntimeError('wrong arguments on execute')
+
+    @classmethod
+    def _parse_execution_options(cls, kernel: CWLKernel, args_line: str) -> Tuple[str, Dict]:
+        args = cls._parse_execution_args(args_line)
+        return args.tool_id, kernel._get_executor_options(
+            args.parallel, args.max_cores, args.max_ram, args.cache, args.stream
+        )
+
     @staticmethod
     def _execute(kernel: CWLKernel, execute_argument_string: str, provenance: bool = False):
-        cwl_id, yaml_str_data = ExecutionMagics._parse_args(execute_argument_string)
+        args_line, yaml_str_data = ExecutionMagics._parse_args(execute_argument_string)
+        cwl_id, executor_options = ExecutionMagics._parse_execution_options(kernel, args_line)
         cwl_component_path: Path = kernel.workflow_repository.get_tools_path_by_id(cwl_id)
         kernel._set_data(yaml_str_data)
-        kernel._execute_workflow(cwl_component_path, cwl_id, provenance=provenance)
+        kernel._execute_workflow(cwl_component_path, cwl_id, provenance=provenance, executor_options=executor_options)
         kernel._clear_data()
 
     @staticmethod
     @CWLKernel.register_magic()
     def execute(kernel: CWLKernel, execute_argument_string: str):
         """
-        Execute registered tool by id.
-        % execute [tool-id]
+        Execute registered tool by id. The jobs of the workflow run in parallel when the kernel is configured with
+        CWLKERNEL_MODE=PARALLEL or the --parallel flag is set. With the --cache flag, or with
+        CWLKERNEL_EXECUTION_CACHE=TRUE, if the tool has already been executed with the same inputs the stored results
+        are reused. With the --stream flag, or with CWLKERNEL_STREAM_OUTPUT=TRUE, the stdout and the stderr of the jobs
+        are displayed while they run.
+        % execute [tool-id] [--parallel | --serial] [--max-cores N] [--max-ram MiB] [--cache | --no-cache] [--stream]
         [yaml input ...]
 
         @param kernel: the kernel instance
@@ -159,96 +186,399 @@ class ExecutionMagics:
     def execute_with_provenance(kernel: CWLKernel, execute_argument_string: str):
         ExecutionMagics._execute(kernel, execute_argument_string, provenance=True)
 
+    @staticmethod
+    @CWLKernel.register_magic('executeAsync')
+    def execute_async(kernel: CWLKernel, execute_argument_string: str):
+        """
+        Execute registered tool by id in the background. The kernel is available while the tool runs.
+        % executeAsync [tool-id] [--parallel | --serial] [--max-cores N] [--max-ram MiB] [--cache | --no-cache]
+        [--stream] [yaml input ...]
+
+        @param kernel: the kernel instance
+        @param execute_argument_string: a multiple line string containins in the first line the tool id and in the next
+        lines the input parameters in yaml syntax
+        @return: None
+        """
+        args_line, yaml_str_data = ExecutionMagics._parse_args(execute_argument_string)
+        cwl_id, executor_options = ExecutionMagics._parse_execution_options(kernel, args_line)
+        cwl_component_path: Path = kernel.workflow_repository.get_tools_path_by_id(cwl_id)
+        kernel._set_data(yaml_str_data)
+        job_id = kernel._submit_workflow(cwl_component_path, cwl_id, executor_options=executor_options)
+        kernel._clear_data()
+        kernel.send_text_to_stdout(f"job {job_id} ({cwl_id}) submitted\n")
+
+    @staticmethod
+    @CWLKernel.register_magic()
+    def jobs(kernel: CWLKernel, *args):
+        """
+        Display the jobs submitted with % executeAsync and their status.
+        % jobs
+        """
+        kernel.send_json_response(kernel.get_jobs())
+
+    @staticmethod
+    @CWLKernel.register_magic()
+    def wait(kernel: CWLKernel, job_ids: str):
+        """
+        Wait for background jobs to finish. If no job id is given it waits for all the jobs.
+        % wait [job-id ...]
+        """
+        job_ids = job_ids.split()
+        kernel.send_json_response(kernel.wait_jobs(job_ids if len(job_ids) > 0 else None))
+
     @staticmethod
     @CWLKernel.register_magics_suggester('execute')
+    @CWLKernel.register_magics_suggester('executeAsync')
+    @CWLKernel.register_magics_suggester('executeWithProvenance')
+    @CWLKernel.register_magics_suggester('view')
+    @CWLKernel.register_magics_suggester('viewTool')
+    @CWLKernel.register_magics_suggester('validate')
     def suggest_execution_id(query_token: str, *args, **kwargs) -> List[str]:
-        return [
-            command for command in
-            CWLKernel.instance()._workflow_repository._registry.keys()
-            if command.upper().startswith(query_token.upper())
-        ]
+        return CWLKernel.instance().completion_index.suggest_tools(query_token)
 
+    _data_reference = re.compile(r'\$data:[ ]*(?P<reference>[^\s,}]*)')
+    _input_key = re.compile(r'[\w.-]*')
+
+    @staticmethod
+    @CWLKernel.register_magics_body_suggester('execute')
+    @CWLKernel.register_magics_body_suggester('executeAsync')
+    @CWLKernel.register_magics_body_suggester('executeWithProvenance')
+    def suggest_execution_inputs(args: str, line: str, cursor_pos: int) -> Tuple[List[str], int, int]:
+        """Suggests the references of the results after $data: and the ids of the tool's inputs as top level keys"""
+        index = CWLKernel.instance().completion_index
+        for match in ExecutionMagics._data_reference.finditer(line):
+            if match.start('reference') <= cursor_pos <= match.end('reference'):
+                prefix = line[match.start('reference'):cursor_pos]
+                return index.suggest_results(prefix), match.start('reference'), match.end('reference')
+        key = ExecutionMagics._input_key.match(line)
+        tool_id = args.split()[0] if len(args.split()) > 0 else None
+        if tool_id is not None and cursor_pos <= key.end():
+            return index.suggest_inputs(tool_id, line[:cursor_pos]), 0, key.end()
+        return [], cursor_pos, cursor_pos
 
-@CWLKernel.register_magic('displayData')
-def display_data(kernel: CWLKernel, data_name: str) -> None:
+
+@CWLKernel.register_magic()
+def cache(kernel: CWLKernel, args: str):
     """
-    Display the data generated by workflow.
-    Usage % displayData [data id]
+    Inspect and manage the cache of the executions.
+    % cache
+    % cache pin [key]
+    % cache unpin [key]
+    % cache purge [key]
 
     @param kernel: the kernel instance
-    @param data_name: the data id
-    @return None
+    @param args: the action and the key, or a unique prefix of the key, of the cache's entry
+    @return: None
     """
-    if not isinstance(data_name, str) or len(data_name.split()) == 0:
+    args = args.split()
+    if len(args) == 0:
+        kernel.send_json_response(kernel.execution_cache.entries())
+    elif args[0] in ('pin', 'unpin') and len(args) == 2:
+        kernel.execution_cache.pin(args[1], args[0] == 'pin')
+        kernel.send_text_to_stdout(f'cache entry {args[1]} {args[0]}ned')
+    elif args[0] == 'purge' and len(args) <= 2:
+        purged = kernel.execution_cache.purge(args[1] if len(args) == 2 else None)
+        kernel.send_text_to_stdout(f'{purged} cache entries purged')
+    else:
         kernel.send_error_response(
-            'ERROR: you must select an output to display. Correct format:\n % displayData [output name]'
+            'ERROR: unknown cache command. Correct format:\n % cache [pin|unpin|purge] [key]'
         )
-        return
-    result = kernel.results_manager.get_last_result_by_id(data_name)
-    if result is None:
-        kernel.send_response(kernel.iopub_socket, 'stream', {'name': 'stderr', 'text': 'Result not found'})
-        return
-    with open(result) as f:
-        data = f.read()
-    kernel.send_response(kernel.iopub_socket, 'stream', {'name': 'stdout', 'text': data})
 
 
-@CWLKernel.register_magic('displayDataCSV')
-def display_data_csv(kernel: CWLKernel, data_name: str):
-    import pandas as pd
-    if not isinstance(data_name, str) or len(data_name.split()) == 0:
+@CWLKernel.register_magic()
+def runs(kernel: CWLKernel, args: str):
+    """
+    Inspect and manage the stored runs. When the results exceed the CWLKERNEL_DISK_QUOTA the least recently used runs,
+    which are not pinned, are removed.
+    % runs
+    % runs pin [run id]
+    % runs unpin [run id]
+    % runs collect
+
+    @param kernel: the kernel instance
+    @param args: the action and the id of the run
+    @return: None
+    """
+    args = args.split()
+    if len(args) == 0:
+        kernel.send_json_response({'usage': kernel.runs_janitor.usage(), 'runs': kernel.runs_janitor.runs()})
+    elif args[0] in ('pin', 'unpin') and len(args) == 2:
+        kernel.runs_janitor.pin(args[1], args[0] == 'pin')
+        kernel.send_text_to_stdout(f'run {args[1]} {args[0]}ned')
+    elif args[0] == 'collect' and len(args) == 1:
+        evicted = kernel.runs_janitor.collect()
+        kernel.send_text_to_stdout(f'{len(evicted)} runs evicted')
+    else:
         kernel.send_error_response(
-            'ERROR: you must select an output to display. Correct format:\n % display_data_csv [output name]'
+            'ERROR: unknown runs command. Correct format:\n % runs [pin|unpin|collect] [run id]'
         )
+
+
+@CWLKernel.register_magic()
+def profile(kernel: CWLKernel, args: str):
+    """
+    Display the wall time, the CPU time, the peak memory and the bytes read and written by a run and by every step of
+    it. The steps are sorted by their wall time, the slowest first. By default the profile of the last run is shown.
+    % profile [run id]
+
+    @param kernel: the kernel instance
+    @param args: the id of the run
+    @return: None
+    """
+    args = args.split()
+    if len(args) > 1:
+        kernel.send_error_response('ERROR: Correct format:\n % profile [run id]')
         return
-    result = kernel.results_manager.get_last_result_by_id(data_name)
-    if result is None:
-        kernel.send_error_response('Result not found')
+    run_profile = kernel.get_profile(args[0] if len(args) == 1 else None)
+    if run_profile is None:
+        kernel.send_error_response(f'ERROR: profile of run {args[0]} not found' if len(args) == 1 else
+                                   'ERROR: there is no profiled run')
         return
-
-    df = pd.read_csv(result, header=None)
-    kernel.send_response(
-        kernel.iopub_socket,
-        'display_data',
-        {
-            'data': {
-                "text/html": f"""{df.to_html(index=False)}""",
-                "text/plain": f"{str(df)}"
-            },
-            'metadata': {},
-        },
+    kernel.send_json_response(
+        {**run_profile, 'steps': sorted(run_profile['steps'], key=lambda s: s['wall_time'], reverse=True)}
     )
 
 
-@CWLKernel.register_magic('sampleCSV')
-def sample_csv(kernel: CWLKernel, args: str):
-    import pandas as pd
+def _line_range(value: str) -> Tuple[Optional[int], Optional[int]]:
     try:
-        data_name, sample_percent = args.split()
-        sample_percent = float(sample_percent)
-    except Exception:
-        kernel.send_error_response(
-            'ERROR: you must select an output to display. Correct format:\n '
-            '% sample_csv [output name] [percent size (0.5)]'
-        )
-        return
-    result = kernel.results_manager.get_last_result_by_id(data_name)
-    if result is None:
-        kernel.send_error_response('Result not found')
-        return
+        start, stop = [int(v) if len(v.strip()) > 0 else None for v in value.split(':')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid range: {value}')
+    if any(v is not None and v < 0 for v in (start, stop)):
+        raise argparse.ArgumentTypeError(f'invalid range: {value}')
+    return start, stop
 
-    df = pd.read_csv(result, header=None, skiprows=lambda i: i > 0 and random.random() > sample_percent)
-    kernel.send_response(
-        kernel.iopub_socket,
-        'display_data',
-        {
-            'data': {
-                "text/html": f"""{df.to_html(index=False)}""",
-                "text/plain": f"{str(df)}"
+
+class DisplayData:
+    # the maximum number of characters of a message, the output is sent in multiple messages of that size
+    CHUNK_SIZE = 64 * 1024
+    PAGE_SIZE = 1000
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('data_name', type=str)
+    _selection = parser.add_mutually_exclusive_group()
+    _selection.add_argument('--head', type=int, default=None)
+    _selection.add_argument('--tail', type=int, default=None)
+    _selection.add_argument('--range', dest='line_range', type=_line_range, default=None)
+    _selection.add_argument('--page', type=int, default=None)
+    parser.add_argument('--page-size', dest='page_size', type=int, default=PAGE_SIZE)
+
+    @staticmethod
+    @CWLKernel.register_magic('displayData')
+    def display_data(kernel: CWLKernel, args_line: str) -> None:
+        """
+        Display the data generated by workflow. The data are read and sent in chunks, so large outputs can be
+        displayed partially by selecting the first or the last lines, a range of lines [start:stop) or a page.
+        Usage % displayData [data id] [--head N | --tail N | --range START:STOP | --page K [--page-size N]]
+
+        @param kernel: the kernel instance
+        @param args_line: the data id and the selection of the lines to display
+        @return None
+        """
+        try:
+            args = DisplayData.parser.parse_args(args_line.split())
+        except SystemExit:
+            kernel.send_error_response(
+                'ERROR: you must select an output to display. Correct format:\n % displayData [output name]'
+            )
+            return
+        result = kernel.results_manager.get_last_result_by_id(args.data_name)
+        if result is None:
+            kernel.send_response(kernel.iopub_socket, 'stream', {'name': 'stderr', 'text': 'Result not found'})
+            return
+        with open(result, 'rb') as binary_file:
+            if args.tail is not None:
+                binary_file.seek(DisplayData._tail_offset(binary_file, args.tail))
+            with io.TextIOWrapper(binary_file, errors='replace') as f:
+                if args.head is not None:
+                    chunks = itertools.islice(f, max(args.head, 0))
+                elif args.line_range is not None:
+                    start, stop = args.line_range
+                    chunks = itertools.islice(f, start, stop)
+                elif args.page is not None:
+                    start = max(args.page - 1, 0) * args.page_size
+                    chunks = itertools.islice(f, start, start + args.page_size)
+                else:
+                    chunks = iter(lambda: f.read(DisplayData.CHUNK_SIZE), '')
+                DisplayData._send_chunks(kernel, chunks)
+
+    @classmethod
+    def _tail_offset(cls, binary_file, lines: int) -> int:
+        """
+        Reads the file backwards in blocks until it finds the beginning of the last lines.
+        @return: the offset of the first of the last lines
+        """
+        end = binary_file.seek(0, io.SEEK_END)
+        if lines <= 0:
+            return end
+        position = end
+        if end > 0:
+            binary_file.seek(end - 1)
+            if binary_file.read(1) == b'\n':
+                position -= 1
+        found_lines = 0
+        while position > 0:
+            block_size = min(cls.CHUNK_SIZE, position)
+            position -= block_size
+            binary_file.seek(position)
+            block = binary_file.read(block_size)
+            index = len(block)
+            while True:
+                index = block.rfind(b'\n', 0, index)
+                if index < 0:
+                    break
+                found_lines += 1
+                if found_lines == lines:
+                    return position + index + 1
+        return 0
+
+    @classmethod
+    def _send_chunks(cls, kernel: CWLKernel, chunks) -> None:
+        buffer, buffer_size, sent = [], 0, False
+        for chunk in chunks:
+            buffer.append(chunk)
+            buffer_size += len(chunk)
+            if buffer_size >= cls.CHUNK_SIZE:
+                kernel.send_response(kernel.iopub_socket, 'stream', {'name': 'stdout', 'text': ''.join(buffer)})
+                buffer, buffer_size, sent = [], 0, True
+        if len(buffer) > 0 or not sent:
+            kernel.send_response(kernel.iopub_socket, 'stream', {'name': 'stdout', 'text': ''.join(buffer)})
+
+
+def _columns(value: str) -> List[int]:
+    try:
+        return [int(column) for column in value.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid columns: {value}')
+
+
+class CSVData:
+    # number of rows which are read at once from the csv files
+    CHUNK_SIZE = 100000
+
+    display_parser = argparse.ArgumentParser()
+    display_parser.add_argument('data_name', type=str)
+    display_parser.add_argument('--max-rows', dest='max_rows', type=int, default=None)
+    display_parser.add_argument('--columns', type=_columns, default=None)
+
+    sample_parser = argparse.ArgumentParser()
+    sample_parser.add_argument('data_name', type=str)
+    sample_parser.add_argument('fraction', type=float, nargs='?', default=None)
+    sample_parser.add_argument('--size', type=int, default=None)
+    sample_parser.add_argument('--seed', type=int, default=None)
+    sample_parser.add_argument('--max-rows', dest='max_rows', type=int, default=None)
+    sample_parser.add_argument('--columns', type=_columns, default=None)
+
+    @staticmethod
+    @CWLKernel.register_magic('displayDataCSV')
+    def display_data_csv(kernel: CWLKernel, args_line: str):
+        """
+        Display the first rows of a csv output. Only the displayed rows are read from the file.
+        % displayDataCSV [output name] [--max-rows N] [--columns 0,1,...]
+
+        @param kernel: the kernel instance
+        @param args_line: the output's id, the maximum number of rows and the indices of the columns to display
+        @return: None
+        """
+        try:
+            args = CSVData.display_parser.parse_args(args_line.split())
+        except SystemExit:
+            kernel.send_error_response(
+                'ERROR: you must select an output to display. Correct format:\n % display_data_csv [output name]'
+            )
+            return
+        result = kernel.results_manager.get_last_result_by_id(args.data_name)
+        if result is None:
+            kernel.send_error_response('Result not found')
+            return
+        import pandas as pd
+        max_rows = CSVData._max_rows(args.max_rows)
+        # one more row reveals whether the data are truncated
+        df = pd.read_csv(result, header=None, usecols=args.columns, nrows=max_rows + 1)
+        CSVData._send_data_frame(kernel, df, max_rows)
+
+    @staticmethod
+    @CWLKernel.register_magic('sampleCSV')
+    def sample_csv(kernel: CWLKernel, args_line: str):
+        """
+        Display a random sample of the rows of a csv output. The file is read in chunks, so the memory depends on the
+        size of the sample and not on the size of the file. The sample is either a fraction of the rows or a fixed
+        number of rows.
+        % sampleCSV [output name] [fraction (0.5) | --size N] [--seed S] [--max-rows N] [--columns 0,1,...]
+
+        @param kernel: the kernel instance
+        @param args_line: the output's id and the parameters of the sample
+        @return: None
+        """
+        try:
+            args = CSVData.sample_parser.parse_args(args_line.split())
+            if (args.fraction is None) == (args.size is None):
+                raise SystemExit()
+        except SystemExit:
+            kernel.send_error_response(
+                'ERROR: you must select an output to display. Correct format:\n '
+                '% sample_csv [output name] [percent size (0.5)]'
+            )
+            return
+        result = kernel.results_manager.get_last_result_by_id(args.data_name)
+        if result is None:
+            kernel.send_error_response('Result not found')
+            return
+        import numpy as np
+        import pandas as pd
+        random_state = np.random.RandomState(args.seed)
+        chunks = pd.read_csv(result, header=None, usecols=args.columns, chunksize=CSVData.CHUNK_SIZE)
+        if args.size is not None:
+            df = CSVData._reservoir_sample(chunks, args.size, random_state)
+        else:
+            df = pd.concat([chunk.sample(frac=args.fraction, random_state=random_state) for chunk in chunks])
+            df = df.sort_index()
+        CSVData._send_data_frame(kernel, df, CSVData._max_rows(args.max_rows))
+
+    @classmethod
+    def _reservoir_sample(cls, chunks, size: int, random_state):
+        """
+        Samples uniformly rows without replacement by keeping the rows with the smallest random keys. Every chunk is
+        merged with the reservoir, so at most size + CHUNK_SIZE rows are in memory.
+        @return: the sampled rows in the order of the file
+        """
+        import numpy as np
+        import pandas as pd
+        reservoir, reservoir_keys = None, None
+        for chunk in chunks:
+            keys = random_state.random_sample(len(chunk))
+            if reservoir is not None:
+                chunk = pd.concat([reservoir, chunk])
+                keys = np.concatenate([reservoir_keys, keys])
+            selected = keys.argsort(kind='stable')[:size]
+            reservoir, reservoir_keys = chunk.iloc[selected], keys[selected]
+        if reservoir is None:
+            return pd.DataFrame()
+        return reservoir.sort_index()
+
+    @classmethod
+    def _max_rows(cls, max_rows: Optional[int]) -> int:
+        return max_rows if max_rows is not None else int(float(CWLKernel_CONF.CWLKERNEL_CSV_MAX_ROWS))
+
+    @classmethod
+    def _send_data_frame(cls, kernel: CWLKernel, df, max_rows: int):
+        truncated = len(df) > max_rows
+        df = df.head(max_rows)
+        html, text = df.to_html(index=False), str(df)
+        if truncated:
+            html += f'<p>showing the first {max_rows} rows</p>'
+            text += f'\nshowing the first {max_rows} rows'
+        kernel.send_response(
+            kernel.iopub_socket,
+            'display_data',
+            {
+                'data': {
+                    "text/html": html,
+                    "text/plain": text
+                },
+                'metadata': {},
             },
-            'metadata': {},
-        },
-    )
+        )
 
 
 @CWLKernel.register_magic('displayDataImage')
@@ -342,23 +672,56 @@ def data(kernel: CWLKernel, *args):
 
 
 @CWLKernel.register_magic('githubImport')
-def github_import(kernel: CWLKernel, url: str):
+def github_import(kernel: CWLKernel, args: str):
+    """
+    Import a tool or a workflow, with the tools of its steps, from a git repository. The files are fetched through the
+    github api, unless the --clone flag is set or the url is a file:// url. In that case the repository is shallowly
+    cloned once and the files are read from the local checkout. Either all the tools are registered or none of them.
+    The files that the tools import or include are placed next to them in the repository.
+    % githubImport [--clone] [repository url]/blob/[ref]/[path]
+
+    @param kernel: the kernel instance
+    @param args: the url of the file and the optional --clone flag
+    @return: None
+    """
+    args = args.split()
+    clone = '--clone' in args
+    url = [arg for arg in args if arg != '--clone'][0]
+    if clone or urlparse(url).scheme == 'file':
+        resolver = kernel._git_clone_resolver
+    else:
+        resolver = kernel._github_resolver
     cwl_factory = WorkflowComponentFactory()
-    for cwl_file in kernel._github_resolver.resolve(url):
-        try:
-            with open(cwl_file) as f:
-                file_data = f.read()
-            cwl_component = cwl_factory.get_workflow_component(file_data)
+    components, relative_dirs, dependencies = [], [], []
+    try:
+        for cwl_file, node in resolver.resolve_graph(url).items():
+            relative_dir = Path(os.path.relpath(cwl_file, resolver._local_root_directory.as_posix()))
+            if node['kind'] != resolver.PROCESS:
+                # the files of the $import and $include directives are placed next to the tools which refer to them
+                with open(cwl_file, 'rb') as f:
+                    dependencies.append((relative_dir, f.read()))
+                continue
+            try:
+                with open(cwl_file) as f:
+                    file_data = f.read()
+                cwl_component = cwl_factory.get_workflow_component(file_data)
+            except Exception:
+                kernel.send_error_response(f'Error on loading tool "{cwl_file}"\n')
+                raise
             cwl_component._id = os.path.splitext(os.path.basename(cwl_file))[0]
-            relative_dir = Path(os.path.relpath(cwl_file, kernel._github_resolver._local_root_directory.as_posix()))
-            kernel.workflow_repository.register_tool(cwl_component, relative_dir)
-            kernel.send_response(kernel.iopub_socket, 'stream',
-                                 {'name': 'stdout', 'text': f"tool '{cwl_component.id}' registered\n"})
-        except Exception as e:
-            kernel.send_error_response(f'Error on loading tool "{cwl_file}"\n')
-            stacktrace_error = StringIO()
-            traceback.print_exc(file=stacktrace_error)
-            kernel.send_error_response(f'Error: {e}\n{stacktrace_error.getvalue()}')
+            components.append(cwl_component)
+            relative_dirs.append(relative_dir)
+        kernel.workflow_repository.register_many(components, relative_dirs)
+        kernel.workflow_repository.add_files(dependencies)
+    except Exception as e:
+        stacktrace_error = StringIO()
+        traceback.print_exc(file=stacktrace_error)
+        kernel.send_error_response(f'Error: {e}\n{stacktrace_error.getvalue()}')
+        return
+    kernel.send_response(kernel.iopub_socket, 'stream', {
+        'name': 'stdout',
+        'text': ''.join(f"tool '{cwl_component.id}' registered\n" for cwl_component in components)
+    })
 
 
 @CWLKernel.register_magic('viewTool')
@@ -370,6 +733,37 @@ def view_tool(kernel: CWLKernel, workflow_id: str):
         kernel.send_error_response(f"Tool '{workflow_id}' is not registered")
 
 
+@CWLKernel.register_magic()
+def validate(kernel: CWLKernel, args: str):
+    """
+    Check registered tools without loading them with cwltool: the ids, the connections and the types of the connected
+    ports, and the required inputs of the steps. By default all the registered tools are checked.
+    % validate [tool id ...]
+
+    @param kernel: the kernel instance
+    @param args: the ids of the tools
+    @return: None
+    """
+    tools_ids = args.split()
+    if len(tools_ids) == 0:
+        tools_ids = [tool.id for tool in kernel.workflow_repository]
+    messages, valid = [], True
+    for tool_id in tools_ids:
+        try:
+            problems = kernel.workflow_repository.validate_by_id(tool_id)
+        except KeyError:
+            problems = ['it is not registered']
+        valid = valid and len(problems) == 0
+        messages.append(
+            f"tool '{tool_id}' is valid" if len(problems) == 0 else
+            f"tool '{tool_id}' is not valid:\n" + ''.join(f'\t- {problem}\n' for problem in problems).rstrip('\n')
+        )
+    if valid:
+        kernel.send_text_to_stdout('\n'.join(messages) + '\n')
+    else:
+        kernel.send_error_response('\n'.join(messages) + '\n')
+
+
 @CWLKernel.register_magic()
 def magics(kernel: CWLKernel, arg: str):
     arg = arg.split()
@@ -404,18 +798,22 @@ def magics(kernel: CWLKernel, arg: str):
 
 @CWLKernel.register_magic('view')
 def visualize_graph(kernel: CWLKernel, tool_id: str):
-    """Visualize a Workflow"""
+    """
+    Visualize a Workflow. The images are cached until the workflow changes.
+    % view [workflow id]
+
+    @param kernel: the kernel instance
+    @param tool_id: the id of the workflow
+    @return: None
+    """
     tool_id = tool_id.strip()
     path = kernel.workflow_repository.get_tools_path_by_id(tool_id)
-    rdf_stream = StringIO()
-    import logging
-    handler = logging.StreamHandler()
-    cwltool_main(['--print-rdf', os.path.abspath(path)], stdout=rdf_stream, logger_handler=handler)
-    cwl_viewer = CWLViewer(rdf_stream.getvalue())
-    (dot_object,) = pydot.graph_from_dot_data(cwl_viewer.dot())
-    ET.register_namespace('', 'http://www.w3.org/2000/svg')
-    image_xml = ET.fromstring(dot_object.create('dot', 'svg').decode())
-    image_container = f'<div style="max-width: 100%;">{ET.tostring(image_xml, method="html").decode()}</div>'
+    if path is None:
+        kernel.send_error_response(f"Tool '{tool_id}' is not registered")
+        return
+    image_container = kernel.workflow_visualizer.render(
+        tool_id, path, kernel.workflow_repository.get_by_id(tool_id)
+    )
     kernel.send_response(
         kernel.iopub_socket,
         'display_data',
@@ -552,7 +950,7 @@ def edit(kernel: CWLKernel, args: str) -> Optional[Dict]:
 @CWLKernel.register_magic('compile')
 def compile_executed_steps_as_workflow(kernel: CWLKernel, args: str):
     """
-    Compose a workflow from executed workflows.
+    Compose a workflow from the workflows executed with % execute or % executeAsync.
 
     @param kernel:
     @param args:
@@ -560,23 +958,24 @@ def compile_executed_steps_as_workflow(kernel: CWLKernel, args: str):
     """
     new_workflow_id = args.strip()
     yml = YAML(typ='rt')
-    executions_history = map(
-        lambda item: (
-            item[1].splitlines()[0].strip(),
-            yml.load(StringIO('\n'.join(item[1].splitlines()[1:])))
-        ),
-        filter(
-            lambda h: h[0] == 'magic' and h[1].split()[1] == 'execute',
-            kernel.history
-        ))
+    executions_history = []
+    for kind, code in kernel.history:
+        if kind != 'magic':
+            continue
+        command = re.sub(r'^%[ ]+', '', code.splitlines()[0]).split(maxsplit=1)
+        if command[0] not in ('execute', 'executeAsync'):
+            continue
+        # the tool id is parsed like in the execution, so the flags of the execution are skipped
+        tool_id = ExecutionMagics._parse_execution_args(command[1] if len(command) > 1 else '').tool_id
+        executions_history.append((tool_id, yml.load(StringIO('\n'.join(code.splitlines()[1:]))) or {}))
     workflow_composer = CWLWorkflow(new_workflow_id)
 
     tools_data_tuples = [
-        (kernel.workflow_repository.get_instance().get_entry_by_id(command.split()[2]), data)
-        for command, data in executions_history
+        (kernel.workflow_repository.get_instance().get_entry_by_id(tool_id), data)
+        for tool_id, data in executions_history
     ]
 
-    outputs: Dict[str, List[Dict]] = {out[0][0].id: out[0][0].outputs for out in tools_data_tuples}
+    outputs: Dict[str, List[Dict]] = {out[0][0].id: list(out[0][0].outputs) for out in tools_data_tuples}
     repository_root_dir = kernel.workflow_repository.get_instance()._file_repository.ROOT_DIRECTORY
     for (tool, tools_full_path), data in tools_data_tuples:  # type: WorkflowComponent, OrderedDict
         workflow_composer.add(tool, tool.id, os.path.relpath(tools_full_path, repository_root_dir))
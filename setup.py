@@ -65,7 +65,6 @@ setup(
         "pandas>=1.0.4",
         "notebook>=6.0.3",
         "requests>=2.23.0",
-        "pygtrie>=2.3.3",
         "pydot>=1.4.1",
     ],
     data_files=DATA_FILES,
@@ -0,0 +1,73 @@
+import unittest
+
+from cwlkernel.cwlrepository.WorkflowGraph import WorkflowGraph, CycleError
+
+
+class WorkflowGraphTest(unittest.TestCase):
+
+    def test_topological_order_and_critical_path(self):
+        graph = WorkflowGraph()
+        for node in ['a', 'b', 'c', 'd', 'e']:
+            graph.add_node(node)
+        for source, target in [('a', 'b'), ('a', 'c'), ('b', 'd'), ('c', 'd'), ('d', 'e')]:
+            graph.add_edge(source, target)
+        graph.add_node('f')
+        self.assertListEqual(['a', 'f', 'b', 'c', 'd', 'e'], graph.topological_order())
+        self.assertFalse(graph.has_cycle())
+        self.assertEqual((['a', 'b', 'd', 'e'], 4), graph.critical_path())
+        self.assertEqual((['a', 'c', 'd', 'e'], 13), graph.critical_path({'c': 10}))
+        self.assertEqual((['f'], 20), graph.critical_path({'f': 20}))
+
+    def test_cycles(self):
+        graph = WorkflowGraph()
+        for node in ['a', 'b', 'c']:
+            graph.add_node(node)
+        graph.add_edge('a', 'b')
+        graph.add_edge('b', 'c')
+        graph.add_edge('b', 'c')
+        graph.add_edge('c', 'a')
+        self.assertTrue(graph.has_cycle())
+        self.assertRaises(CycleError, graph.topological_order)
+        self.assertRaises(CycleError, graph.critical_path)
+
+        copy = graph.copy()
+        graph.remove_edge('b', 'c')
+        self.assertTrue(graph.has_cycle())
+        graph.remove_edge('b', 'c')
+        self.assertFalse(graph.has_cycle())
+        self.assertListEqual(['c', 'a', 'b'], graph.topological_order())
+        self.assertTrue(copy.has_cycle())
+
+        copy.remove_node('a')
+        self.assertFalse(copy.has_cycle())
+        self.assertListEqual([('b', 'c')], copy.edges())
+
+    def test_incremental_order(self):
+        graph = WorkflowGraph()
+        for node in ['a', 'b', 'c', 'd', 'e']:
+            graph.add_node(node)
+        # every edge goes against the order in which the nodes were added
+        for source, target in [('e', 'd'), ('d', 'c'), ('b', 'a'), ('c', 'b')]:
+            graph.add_edge(source, target)
+            self.assertFalse(graph.has_cycle())
+            for edge_source, edge_target in graph.edges():
+                self.assertLess(graph._index[edge_source], graph._index[edge_target])
+        self.assertListEqual(['e', 'd', 'c', 'b', 'a'], sorted(graph.nodes, key=graph._index.get))
+        graph.add_edge('a', 'e')
+        self.assertTrue(graph.has_cycle())
+        graph.remove_edge('a', 'e')
+        self.assertFalse(graph.has_cycle())
+        graph.add_edge('a', 'a')
+        self.assertTrue(graph.has_cycle())
+
+    def test_unknown_nodes(self):
+        graph = WorkflowGraph()
+        graph.add_node('a')
+        self.assertRaises(KeyError, graph.add_edge, 'a', 'b')
+        self.assertRaises(KeyError, graph.add_edge, 'b', 'a')
+        self.assertListEqual(['a'], graph.nodes)
+        self.assertListEqual([], graph.edges())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,9 @@
+import copy
 import logging
 import os
+import sys
 import tempfile
+import threading
 import unittest
 import uuid
 from io import StringIO
@@ -291,6 +294,288 @@ class CWLComponentTest(unittest.TestCase):
         self.assertEqual(os.path.realpath(repo.get_tools_path_by_id('head').absolute()),
                          os.path.realpath(os.path.join(location, 'head.cwl')))
 
+    def test_file_repository_listeners(self):
+        conf = CWLExecuteConfigurator()
+        location = os.sep.join([conf.CWLKERNEL_BOOT_DIRECTORY, str(uuid.uuid4()), 'repo'])
+        repo = WorkflowRepository(Path(location))
+        repo.delete()
+        events = []
+        listener = lambda tool_id, path: events.append(tool_id)  # noqa: E731
+        repo.add_listener(listener)
+        cwl_factory = WorkflowComponentFactory()
+        with open(os.sep.join([self.cwl_directory, 'head.cwl'])) as f:
+            repo.register_tool(cwl_factory.get_workflow_component(f.read()))
+        repo.delete_by_id('head')
+        repo.remove_listener(listener)
+        with open(os.sep.join([self.cwl_directory, 'head.cwl'])) as f:
+            repo.register_tool(cwl_factory.get_workflow_component(f.read()))
+        self.assertListEqual(['head', 'head'], events)
+
+    def test_read_only_component_data(self):
+        cwl_factory = WorkflowComponentFactory()
+        with open(os.sep.join([self.cwl_directory, 'head.cwl'])) as f:
+            head: CWLTool = cwl_factory.get_workflow_component(f.read())
+        self.assertIs(head.inputs, head.inputs)
+        self.assertRaises(TypeError, head.inputs.append, {'id': 'new_input'})
+        self.assertRaises(TypeError, head.inputs[0].__setitem__, 'id', 'new_id')
+        self.assertRaises(TypeError, head.command_line_tool.pop, 'inputs')
+        inputs = copy.deepcopy(head.inputs)
+        inputs[0]['id'] = 'new_id'
+        self.assertNotEqual('new_id', head.inputs[0]['id'])
+        head_dict = head.to_dict()
+        head_dict.pop('inputs')
+        self.assertIn('inputs', head.to_dict())
+
+        workflow = CWLWorkflow('main')
+        workflow.add(head, 'head')
+        workflow.add_input({'id': 'inputfile', 'type': 'File'}, step_id='head', in_step_id='headinput')
+        steps = workflow.steps
+        self.assertIs(steps, workflow.steps)
+        self.assertRaises(TypeError, steps['head']['in'].__setitem__, 'number_of_lines', 'lines')
+        snapshot = workflow.snapshot()
+        workflow.add_input({'id': 'lines', 'type': 'int'}, step_id='head', in_step_id='number_of_lines')
+        self.assertDictEqual({'headinput': 'inputfile'}, steps['head']['in'])
+        self.assertDictEqual({'headinput': 'inputfile', 'number_of_lines': 'lines'}, workflow.steps['head']['in'])
+        self.assertListEqual([{'id': 'inputfile', 'type': 'File'}], snapshot.inputs)
+        self.assertDictEqual({'headinput': 'inputfile'}, snapshot.steps['head']['in'])
+
+    def test_file_repository_writes_lazily(self):
+        conf = CWLExecuteConfigurator()
+        location = os.sep.join([conf.CWLKERNEL_BOOT_DIRECTORY, str(uuid.uuid4()), 'repo'])
+        repo = WorkflowRepository(Path(location))
+        repo.delete()
+        cwl_factory = WorkflowComponentFactory()
+        tool_ids = [f'head-{uuid.uuid4()}', f'tail-{uuid.uuid4()}']
+        for tool_id, tool_file in zip(tool_ids, ['head.cwl', 'tail.cwl']):
+            with open(os.sep.join([self.cwl_directory, tool_file])) as f:
+                tool = cwl_factory.get_workflow_component(f.read())
+            tool._id = tool_id
+            repo.register_tool(tool)
+        head_path = repo._registry[tool_ids[0]][1]
+        self.assertFalse(head_path.exists())
+        repo.delete_by_id(tool_ids[1])
+
+        self.assertEqual(head_path, repo.get_tools_path_by_id(tool_ids[0]))
+        self.assertTrue(head_path.exists())
+        self.assertDictEqual(
+            repo.get_by_id(tool_ids[0]).to_dict(),
+            yaml.load(head_path.read_text(), Loader=yaml.Loader)
+        )
+        repo.delete_by_id(tool_ids[0])
+        self.assertFalse(head_path.exists())
+
+    def test_workflow_component_from_dict(self):
+        with open(os.sep.join([self.cwl_directory, 'head.cwl'])) as f:
+            description = yaml.safe_load(f)
+        description.pop('id', None)
+        description['inputs'] = {i['id']: {k: v for k, v in i.items() if k != 'id'} for i in description['inputs']}
+        original = copy.deepcopy(description)
+        head = WorkflowComponentFactory().get_workflow_component_from_dict(description)
+        self.assertIsInstance(head, CWLTool)
+        self.assertDictEqual(original, description)
+        self.assertIsInstance(head.id, str)
+        self.assertListEqual(sorted(original['inputs']), sorted(i['id'] for i in head.inputs))
+
+    def test_workflow_component_keeps_yaml_1_2_scalars(self):
+        tool = WorkflowComponentFactory().get_workflow_component(
+            'cwlVersion: v1.0\n'
+            'class: CommandLineTool\n'
+            'id: chmod\n'
+            'baseCommand: chmod\n'
+            'inputs:\n'
+            '  on:\n'
+            '    type: string\n'
+            '    default: yes\n'
+            '  mode:\n'
+            '    type: int\n'
+            '    default: 0755\n'
+            'outputs: []\n'
+        )
+        self.assertDictEqual(
+            {'on': 'yes', 'mode': 755}, {tool_input['id']: tool_input['default'] for tool_input in tool.inputs}
+        )
+
+    def test_file_repository_register_many(self):
+        conf = CWLExecuteConfigurator()
+        location = os.sep.join([conf.CWLKERNEL_BOOT_DIRECTORY, str(uuid.uuid4()), 'repo'])
+        repo = WorkflowRepository(Path(location))
+        repo.delete()
+        events = []
+        listener = lambda tool_id, path: events.append(tool_id)  # noqa: E731
+        repo.add_listener(listener)
+        cwl_factory = WorkflowComponentFactory()
+        tools = []
+        for i in range(repo.WRITE_WORKERS + 1):
+            with open(os.sep.join([self.cwl_directory, 'head.cwl'])) as f:
+                tool = cwl_factory.get_workflow_component(f.read())
+            tool._id = f'head-{i}-{uuid.uuid4()}'
+            tools.append(tool)
+
+        # the duplicate id and the invalid tool are rejected and nothing is registered
+        self.assertRaises(KeyError, repo.register_many, [tools[0], tools[0]])
+        self.assertRaises(TypeError, repo.register_many, [tools[0], {'id': 'not-a-tool'}])
+        self.assertIsNone(repo.get_by_id(tools[0].id))
+        self.assertListEqual([], events)
+
+        paths = repo.register_many(tools[1:], [Path('tools', f'{t.id}.cwl') for t in tools[1:]])
+        self.assertListEqual([t.id for t in tools[1:]], events)
+        self.assertListEqual(paths, [repo.get_tools_path_by_id(t.id) for t in tools[1:]])
+        for path in paths:
+            self.assertTrue(path.exists())
+        self.assertRaises(KeyError, repo.register_many, tools)
+        self.assertIsNone(repo.get_by_id(tools[0].id))
+        repo.remove_listener(listener)
+
+    def test_file_repository_concurrent_writes(self):
+        conf = CWLExecuteConfigurator()
+        location = os.sep.join([conf.CWLKERNEL_BOOT_DIRECTORY, str(uuid.uuid4()), 'repo'])
+        repo = WorkflowRepository(Path(location))
+        repo.delete()
+        with open(os.sep.join([self.cwl_directory, 'head.cwl'])) as f:
+            head = WorkflowComponentFactory().get_workflow_component(f.read())
+        written = []
+        write = repo._file_repository.write
+
+        def counted_write(path, *args, **kwargs):
+            written.append(path)
+            return write(path, *args, **kwargs)
+
+        repo._file_repository.write = counted_write
+        tools_ids = [f'head-{i}-{uuid.uuid4()}' for i in range(40)]
+        errors = []
+
+        def register(ids):
+            try:
+                for tool_id in ids:
+                    tool = head.snapshot()
+                    tool._id = tool_id
+                    repo.register_tool(tool)
+                    self.assertTrue(repo.get_tools_path_by_id(tool_id).exists())
+            except Exception as e:
+                errors.append(e)
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=register, args=(tools_ids[i::4],)) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(switch_interval)
+            repo._file_repository.write = write
+        self.assertListEqual([], errors)
+        self.assertListEqual(sorted(f'{tool_id}.cwl' for tool_id in tools_ids), sorted(written))
+        repo.delete()
+
+    def test_validate(self):
+        conf = CWLExecuteConfigurator()
+        location = os.sep.join([conf.CWLKERNEL_BOOT_DIRECTORY, str(uuid.uuid4()), 'repo'])
+        repo = WorkflowRepository(Path(location))
+        repo.delete()
+        cwl_factory = WorkflowComponentFactory()
+        with open(os.sep.join([self.cwl_directory, '3stepWorkflow.cwl'])) as f:
+            workflow = cwl_factory.get_workflow_component(f.read())
+        repo.register_tool(workflow)
+        self.assertListEqual(
+            ["step 'head': tool 'head.cwl' is not found", "step 'grepstep': tool 'grep.cwl' is not found",
+             "step 'grep2': tool 'grep.cwl' is not found"],
+            repo.validate_by_id('threesteps')
+        )
+        for tool in ['head', 'grep']:
+            with open(os.sep.join([self.cwl_directory, f'{tool}.cwl'])) as f:
+                repo.register_tool(cwl_factory.get_workflow_component(f.read()))
+        self.assertListEqual([], repo.validate_by_id('threesteps'))
+        self.assertListEqual([], repo.validate_by_id('head'))
+        self.assertRaises(KeyError, repo.validate_by_id, 'missing')
+
+        invalid_workflow = cwl_factory.get_workflow_component_from_dict({
+            'class': 'Workflow', 'id': 'invalid',
+            'inputs': [{'id': 'inputfile', 'type': 'File'}, {'id': 'inputfile', 'type': 'int'}],
+            'outputs': [{'id': 'count', 'type': 'int', 'outputSource': 'head/headoutput'},
+                        {'id': 'missing', 'type': 'File', 'outputSource': 'tail/tailoutput'}],
+            'steps': {
+                'head': {'run': 'head.cwl', 'in': {'headinput': 'inputfile'}, 'out': ['headoutput']},
+                'grep': {'run': 'grep.cwl', 'in': {'grepinput': 'head/headoutput', 'query': 'query'}, 'out': []}
+            }
+        })
+        repo.register_tool(invalid_workflow)
+        problems = [
+            "duplicate input id 'inputfile'",
+            "step 'grep' input 'query': source 'query' is not an input of the workflow",
+            "output 'count': type File of 'head/headoutput' does not match the type int",
+            "output 'missing': source 'tail/tailoutput' refers to the unknown step 'tail'",
+        ]
+        self.assertListEqual(problems, invalid_workflow.validate(repo.get_by_id))
+        self.assertListEqual(problems, repo.validate_by_id('invalid'))
+        cache_size = len(repo._validation_cache)
+        self.assertListEqual(problems, repo.validate_by_id('invalid'))
+        self.assertEqual(cache_size, len(repo._validation_cache))
+
+        # the steps which run an inline tool without an id hit the cache as well
+        repo.register_tool(cwl_factory.get_workflow_component_from_dict({
+            'class': 'Workflow', 'id': 'inline',
+            'inputs': [{'id': 'message', 'type': 'string'}],
+            'outputs': [],
+            'steps': {
+                'echo': {
+                    'run': {'class': 'CommandLineTool', 'baseCommand': 'echo',
+                            'inputs': [{'id': 'text', 'type': 'string'}], 'outputs': []},
+                    'in': {'text': 'message'}, 'out': []
+                }
+            }
+        }))
+        self.assertListEqual([], repo.validate_by_id('inline'))
+        cache_size = len(repo._validation_cache)
+        self.assertListEqual([], repo.validate_by_id('inline'))
+        self.assertListEqual([], repo.validate_by_id('inline'))
+        self.assertEqual(cache_size, len(repo._validation_cache))
+
+    def test_workflow_graph(self):
+        with open(os.sep.join([self.cwl_directory, '3stepWorkflow.cwl'])) as f:
+            workflow: CWLWorkflow = WorkflowComponentFactory().get_workflow_component(f.read())
+        self.assertListEqual(['head', 'grepstep', 'grep2'], workflow.graph.topological_order())
+        self.assertEqual((['head', 'grepstep', 'grep2'], 3), workflow.graph.critical_path())
+
+        tool = CWLTool('tool', {'class': 'CommandLineTool', 'id': 'tool', 'inputs': [], 'outputs': []})
+        snapshot = workflow.snapshot()
+        workflow.add(tool, 'after_head')
+        workflow.add_step_in_out('head/headoutput', 'tool_input', 'after_head')
+        self.assertListEqual(['grepstep', 'after_head'], workflow.graph.successors('head'))
+        self.assertListEqual(['grepstep'], snapshot.graph.successors('head'))
+        workflow.add_step_in_out('grep2/grepoutput', 'tool_input', 'after_head')
+        self.assertListEqual(['grepstep'], workflow.graph.successors('head'))
+        workflow.add_step_in_out('after_head/output', 'grepinput', 'head')
+        self.assertTrue(workflow.graph.has_cycle())
+
+        workflow.remove(WorkflowComponentFactory().get_workflow_component_from_dict(
+            {'class': 'CommandLineTool', 'id': 'grep', 'inputs': [], 'outputs': []}))
+        self.assertListEqual(['head', 'after_head'], workflow.graph.nodes)
+        self.assertFalse(workflow.graph.has_cycle())
+        self.assertDictEqual({}, workflow.steps['after_head']['in'])
+        self.assertListEqual([], workflow.outputs)
+        self.assertRaises(KeyError, workflow.remove, CWLTool(
+            'missing', {'class': 'CommandLineTool', 'id': 'missing', 'inputs': [], 'outputs': []}))
+
+    def test_workflow_graph_with_unknown_steps(self):
+        workflow = WorkflowComponentFactory().get_workflow_component_from_dict({
+            'cwlVersion': 'v1.0', 'class': 'Workflow', 'id': 'dangling', 'inputs': [], 'outputs': [],
+            'steps': {'second': {'run': 'tool.cwl', 'in': {'tool_input': 'first/output'}, 'out': []}}
+        })
+        self.assertListEqual(['second'], workflow.graph.nodes)
+        self.assertListEqual([], workflow.graph.edges())
+        self.assertIn(
+            "step 'second' input 'tool_input': source 'first/output' refers to the unknown step 'first'",
+            workflow.validate()
+        )
+
+        tool = CWLTool('tool', {'class': 'CommandLineTool', 'id': 'tool', 'inputs': [], 'outputs': []})
+        workflow.add(tool, 'first')
+        self.assertListEqual([('first', 'second')], workflow.graph.edges())
+        workflow.add_step_in_out('first/output', 'tool_input', 'second')
+        self.assertListEqual([('first', 'second')], workflow.graph.edges())
+
     def test_connect_workflow_with_workflow(self):
         cwl_factory = WorkflowComponentFactory()
         with open(os.sep.join([self.cwl_directory, 'scatter_head.cwl'])) as f:
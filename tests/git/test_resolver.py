@@ -1,11 +1,22 @@
+import base64
+import hashlib
+import json
 import os
+import shutil
+import socketserver
+import subprocess
 import tempfile
+import threading
 import unittest
+from http.server import HTTPServer, BaseHTTPRequestHandler
 from pathlib import Path
+from urllib.parse import urlparse
 
 import requests
 from mockito import when, mock, unstub
+from ruamel.yaml.constructor import ConstructorError
 
+from cwlkernel.git.CWLGitCloneResolver import CWLGitCloneResolver
 from cwlkernel.git.CWLGitResolver import CWLGitResolver
 
 
@@ -14,10 +25,11 @@ class GitResolverTest(unittest.TestCase):
 
     @classmethod
     def set_mock_github_responses(cls):
-        when(requests) \
-            .get("https://api.github.com/repos/giannisdoukas/CWLJNIKernel/contents/tests/cwl/head.cwl?ref=dev") \
+        when(requests.Session) \
+            .get("https://api.github.com/repos/giannisdoukas/CWLJNIKernel/contents/tests/cwl/head.cwl?ref=dev", ...) \
             .thenReturn(mock({
             'status_code': 200,
+            'headers': {},
             'json': lambda: {
                 "name": "head.cwl",
                 "path": "tests/cwl/head.cwl",
@@ -37,11 +49,12 @@ class GitResolverTest(unittest.TestCase):
                 }
             }
         }))
-        when(requests) \
-            .get("https://api.github.com/repos/giannisdoukas/CWLJNIKernel/contents/tests/cwl/3stepWorkflow.cwl?ref=dev") \
+        when(requests.Session) \
+            .get("https://api.github.com/repos/giannisdoukas/CWLJNIKernel/contents/tests/cwl/3stepWorkflow.cwl?ref=dev", ...) \
             .thenReturn(mock(
             {
                 'status_code': 200,
+                'headers': {},
                 'json': lambda: {
                     "name": "3stepWorkflow.cwl",
                     "path": "tests/cwl/3stepWorkflow.cwl",
@@ -61,11 +74,12 @@ class GitResolverTest(unittest.TestCase):
                     }
                 }
             }))
-        when(requests) \
-            .get("https://api.github.com/repos/giannisdoukas/CWLJNIKernel/contents/tests/cwl/grep.cwl?ref=dev") \
+        when(requests.Session) \
+            .get("https://api.github.com/repos/giannisdoukas/CWLJNIKernel/contents/tests/cwl/grep.cwl?ref=dev", ...) \
             .thenReturn(mock(
             {
                 'status_code': 200,
+                'headers': {},
                 'json': lambda: {
                     "name": "grep.cwl",
                     "path": "tests/cwl/grep.cwl",
@@ -103,6 +117,211 @@ class GitResolverTest(unittest.TestCase):
         )
         unstub()
 
+    def test_resolve_from_local_server_with_cache(self):
+        cwl_directory = os.sep.join([os.path.dirname(os.path.realpath(__file__)), '..', 'cwl'])
+        requests_log = []
+
+        class GithubContentsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                # /repos/[owner]/[repo]/contents/[path]?ref=[branch]
+                path = urlparse(self.path).path.split('/', 5)[5]
+                with open(os.path.join(cwl_directory, os.path.basename(path)), 'rb') as f:
+                    content = f.read()
+                etag = f'"{hashlib.sha1(content).hexdigest()}"'
+                requests_log.append((path, self.headers.get('If-None-Match') == etag))
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                body = json.dumps({'path': path, 'content': base64.b64encode(content).decode()}).encode()
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        # http.server.ThreadingHTTPServer is not available before python 3.7
+        class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), GithubContentsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            git_dir = Path(tempfile.mkdtemp())
+            git_resolver = CWLGitResolver(git_dir, f'http://127.0.0.1:{server.server_address[1]}/')
+            workflow_url = "https://github.com/giannisdoukas/CWLJNIKernel/blob/dev/tests/cwl/3stepWorkflow.cwl"
+            expected_files = sorted([
+                os.path.join(git_dir, 'giannisdoukas/CWLJNIKernel/tests/cwl', f)
+                for f in ['3stepWorkflow.cwl', 'head.cwl', 'grep.cwl']
+            ])
+            self.assertListEqual(expected_files, sorted(git_resolver.resolve(workflow_url)))
+            self.assertListEqual(
+                [('tests/cwl/3stepWorkflow.cwl', False), ('tests/cwl/grep.cwl', False), ('tests/cwl/head.cwl', False)],
+                sorted(requests_log)
+            )
+            with open(os.path.join(cwl_directory, 'head.cwl'), 'rb') as f:
+                self.assertEqual(f.read(), Path(expected_files[2]).read_bytes())
+
+            requests_log.clear()
+            self.assertListEqual(expected_files, sorted(git_resolver.resolve(workflow_url)))
+            self.assertListEqual(
+                [('tests/cwl/3stepWorkflow.cwl', True), ('tests/cwl/grep.cwl', True), ('tests/cwl/head.cwl', True)],
+                sorted(requests_log)
+            )
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    @classmethod
+    def create_local_repository(cls) -> str:
+        cwl_directory = os.sep.join([os.path.dirname(os.path.realpath(__file__)), '..', 'cwl'])
+        repository = os.path.join(tempfile.mkdtemp(), 'CWLJNIKernel')
+        os.makedirs(os.path.join(repository, 'tests', 'cwl'))
+        for f in ['3stepWorkflow.cwl', 'head.cwl', 'grep.cwl']:
+            shutil.copy(os.path.join(cwl_directory, f), os.path.join(repository, 'tests', 'cwl', f))
+        for command in [['init', '-q'], ['checkout', '-q', '-b', 'dev'], ['add', '.'],
+                        ['-c', 'user.name=test', '-c', 'user.email=test@example.com', 'commit', '-q', '-m', 'tools']]:
+            subprocess.run(['git', *command], cwd=repository, check=True)
+        return repository
+
+    def test_resolve_from_local_clone(self):
+        repository = self.create_local_repository()
+        git_dir = Path(tempfile.mkdtemp())
+        git_resolver = CWLGitCloneResolver(git_dir)
+        workflow_url = f"{Path(repository).as_uri()}/blob/dev/tests/cwl/3stepWorkflow.cwl"
+        expected_files = sorted([
+            os.path.join(git_dir, os.path.basename(os.path.dirname(repository)), 'CWLJNIKernel/tests/cwl', f)
+            for f in ['3stepWorkflow.cwl', 'grep.cwl', 'head.cwl']
+        ])
+        self.assertListEqual(expected_files, sorted(git_resolver.resolve(workflow_url)))
+        with open(os.path.join(repository, 'tests', 'cwl', 'grep.cwl'), 'rb') as f:
+            self.assertEqual(f.read(), Path(expected_files[1]).read_bytes())
+
+        # a new import fetches the latest commit of the ref
+        with open(os.path.join(repository, 'tests', 'cwl', 'grep.cwl'), 'a') as f:
+            f.write('\ndoc: updated\n')
+        subprocess.run(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com', 'commit', '-q', '-am',
+                        'update'], cwd=repository, check=True)
+        self.assertListEqual(expected_files, sorted(git_resolver.resolve(workflow_url)))
+        self.assertTrue(Path(expected_files[1]).read_text().endswith('doc: updated\n'))
+
+        self.assertRaises(ValueError, git_resolver.resolve, repository)
+        self.assertRaises(
+            ValueError, git_resolver.resolve,
+            f"{Path(repository).as_uri()}/blob/--upload-pack=touch pwned/tests/cwl/3stepWorkflow.cwl"
+        )
+        self.assertRaises(ValueError, git_resolver.resolve, "--upload-pack=touch pwned/blob/dev/3stepWorkflow.cwl")
+
+    def test_resolve_graph(self):
+        cwl_directory = os.sep.join([os.path.dirname(os.path.realpath(__file__)), '..', 'cwl'])
+        repository = os.path.join(tempfile.mkdtemp(), 'nested')
+        for directory in ['workflows', 'tools', 'types', 'scripts']:
+            os.makedirs(os.path.join(repository, directory))
+        shutil.copy(os.path.join(cwl_directory, 'head.cwl'), os.path.join(repository, 'tools', 'head.cwl'))
+        shutil.copy(os.path.join(cwl_directory, 'grep.cwl'), os.path.join(repository, 'tools', 'grep.cwl'))
+        with open(os.path.join(repository, 'types', 'types.yml'), 'w') as f:
+            f.write('- name: lines\n  type: enum\n  symbols: [all, some]\n')
+        with open(os.path.join(repository, 'scripts', 'lines.js'), 'w') as f:
+            f.write('function lines() { return 5; }\n')
+        with open(os.path.join(repository, 'workflows', 'main.cwl'), 'w') as f:
+            f.write(
+                'cwlVersion: v1.0\n'
+                'class: Workflow\n'
+                'requirements:\n'
+                '  SchemaDefRequirement:\n'
+                '    types:\n'
+                '      - $import: ../types/types.yml\n'
+                '  InlineJavascriptRequirement:\n'
+                '    expressionLib:\n'
+                '      - $include: ../scripts/lines.js\n'
+                'inputs: []\n'
+                'outputs: []\n'
+                'steps:\n'
+                '  head:\n'
+                '    run: ../tools/head.cwl\n'
+                '    in: {}\n'
+                '    out: []\n'
+                '  inner:\n'
+                '    run:\n'
+                '      class: Workflow\n'
+                '      inputs: []\n'
+                '      outputs: []\n'
+                '      steps:\n'
+                '        - id: grep\n'
+                '          run: ../tools/grep.cwl#grep\n'
+                '          in: {}\n'
+                '          out: []\n'
+                '        - id: head\n'
+                '          run: ../workflows/../tools/head.cwl\n'
+                '          in: {}\n'
+                '          out: []\n'
+                '    in: {}\n'
+                '    out: []\n'
+            )
+        for command in [['init', '-q'], ['checkout', '-q', '-b', 'master'], ['add', '.'],
+                        ['-c', 'user.name=test', '-c', 'user.email=test@example.com', 'commit', '-q', '-m', 'tools']]:
+            subprocess.run(['git', *command], cwd=repository, check=True)
+
+        git_dir = Path(tempfile.mkdtemp())
+        git_resolver = CWLGitCloneResolver(git_dir)
+        workflow_url = f"{Path(repository).as_uri()}/blob/master/workflows/main.cwl"
+        graph = git_resolver.resolve_graph(workflow_url)
+        local_directory = os.path.join(git_dir, os.path.basename(os.path.dirname(repository)), 'nested')
+        self.assertDictEqual(
+            {
+                'workflows/main.cwl': ('process', ['tools/head.cwl', 'types/types.yml', 'scripts/lines.js',
+                                                   'tools/grep.cwl']),
+                'types/types.yml': ('import', []),
+                'scripts/lines.js': ('include', []),
+                'tools/head.cwl': ('process', []),
+                'tools/grep.cwl': ('process', []),
+            },
+            {
+                node['path']: (node['kind'], [os.path.relpath(d, local_directory) for d in node['dependencies']])
+                for node in graph.values()
+            }
+        )
+        for filename, node in graph.items():
+            self.assertEqual(os.path.join(local_directory, node['path']), filename)
+            self.assertTrue(os.path.isfile(filename))
+        self.assertListEqual(
+            [os.path.join(local_directory, f) for f in ['workflows/main.cwl', 'tools/head.cwl', 'tools/grep.cwl']],
+            git_resolver.resolve(workflow_url)
+        )
+
+    def test_get_references_skips_absolute_and_url_references(self):
+        document = {
+            'class': 'Workflow',
+            'requirements': [
+                {'$import': 'https://example.com/types.yml'},
+                {'$include': '/opt/scripts/lines.js'},
+            ],
+            'steps': {
+                'local': {'run': '../tools/head.cwl'},
+                'absolute': {'run': '/usr/share/tools/grep.cwl'},
+                'url': {'run': 'https://raw.githubusercontent.com/owner/repo/master/tools/grep.cwl'},
+                'file': {'run': 'file:///usr/share/tools/grep.cwl'},
+                'same_document': {'run': '#grep'},
+            }
+        }
+        self.assertListEqual(
+            [('tools/head.cwl', CWLGitResolver.PROCESS)],
+            CWLGitResolver._get_references('workflows/main.cwl', document)
+        )
+
+    def test_resolve_file_uses_the_safe_loader(self):
+        git_resolver = CWLGitResolver(Path(tempfile.mkdtemp()))
+        when(git_resolver)._fetch_file('tool.cwl', 'owner', 'repo', 'master') \
+            .thenReturn(b"!!python/object/apply:os.system ['touch pwned']\n")
+        try:
+            self.assertRaises(ConstructorError, git_resolver._resolve_file, 'tool.cwl', 'owner', 'repo', 'master')
+        finally:
+            unstub()
+
 
 if __name__ == '__main__':
     unittest.main()
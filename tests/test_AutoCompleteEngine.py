@@ -49,6 +49,23 @@ class TestAutoCompleteEngine(unittest.TestCase):
         )
         self.assertDictEqual({'cursor_start': 8, 'cursor_end': 11}, suggestion)
 
+    def test_suggest_magics_in_large_cell(self):
+        auto_complete_engine = AutoCompleteEngine(['newWorkflow', 'newWorkflowBuild', 'execute'])
+        code = 'cwlVersion: v1.0\n' * 10000 + '% new'
+        suggestion = auto_complete_engine.suggest(code, len(code))
+        self.assertDictEqual(
+            {'matches': ['newWorkflow', 'newWorkflowBuild'], 'cursor_start': len(code) - 3, 'cursor_end': len(code)},
+            suggestion
+        )
+        suggestion['matches'].clear()
+        self.assertListEqual(
+            ['newWorkflow', 'newWorkflowBuild'], auto_complete_engine.suggest(code, len(code))['matches']
+        )
+        auto_complete_engine.add_magic_command('newTool')
+        self.assertListEqual(
+            ['newTool', 'newWorkflow', 'newWorkflowBuild'], auto_complete_engine.suggest(code, len(code))['matches']
+        )
+
     def test_suggest_magics_args(self):
         auto_complete_engine = CWLKernel._auto_complete_engine
 
@@ -84,6 +101,27 @@ class TestAutoCompleteEngine(unittest.TestCase):
             auto_complete_engine.suggest(code, 17)
         )
 
+    def test_suggest_magics_body(self):
+        auto_complete_engine = AutoCompleteEngine(['execute', 'view'])
+        calls = []
+
+        def suggester(args, line, cursor_pos):
+            calls.append((args, line, cursor_pos))
+            return ['message'], 0, cursor_pos
+
+        auto_complete_engine.add_magic_body_suggester('execute', suggester)
+        code = '% execute echo\nmessage: foo\nme'
+        self.assertDictEqual(
+            {'matches': ['message'], 'cursor_start': len(code) - 2, 'cursor_end': len(code)},
+            auto_complete_engine.suggest(code, len(code))
+        )
+        self.assertListEqual([(' echo', 'me', 2)], calls)
+        code = '% view echo\nme'
+        self.assertListEqual([], auto_complete_engine.suggest(code, len(code))['matches'])
+        code = 'cwlVersion: v1.0\nme'
+        self.assertListEqual([], auto_complete_engine.suggest(code, len(code))['matches'])
+        self.assertEqual(1, len(calls))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -15,9 +15,29 @@ class TestCWLExecuteConfigurator(unittest.TestCase):
         conf = CWLExecuteConfigurator()
         self.assertEqual(conf.CWLKERNEL_MODE, 'simple')
 
+        os.environ['CWLKERNEL_MODE'] = 'parallel'
+        conf = CWLExecuteConfigurator()
+        self.assertEqual(conf.CWLKERNEL_MODE, 'parallel')
+
         os.environ['CWLKERNEL_MODE'] = 'something new'
         self.assertRaises(RuntimeError, CWLExecuteConfigurator)
 
+    def test_load_CWLKERNEL_MAX_CORES_and_RAM(self):
+        conf = CWLExecuteConfigurator()
+        self.assertIsNone(conf.CWLKERNEL_MAX_CORES)
+        self.assertIsNone(conf.CWLKERNEL_MAX_RAM)
+
+        os.environ['CWLKERNEL_MAX_CORES'] = '4'
+        os.environ['CWLKERNEL_MAX_RAM'] = '2048'
+        conf = CWLExecuteConfigurator()
+        self.assertEqual(conf.CWLKERNEL_MAX_CORES, '4')
+        self.assertEqual(conf.CWLKERNEL_MAX_RAM, '2048')
+
+        os.environ['CWLKERNEL_MAX_CORES'] = 'many'
+        self.assertRaises(RuntimeError, CWLExecuteConfigurator)
+        os.environ['CWLKERNEL_MAX_CORES'] = '0'
+        self.assertRaises(RuntimeError, CWLExecuteConfigurator)
+
     def test_load_CWLKERNEL_BOOT_DIRECTORY(self):
         conf = CWLExecuteConfigurator()
         self.assertEqual(conf.CWLKERNEL_BOOT_DIRECTORY, '/tmp/CWLKERNEL_DATA')
@@ -27,16 +47,58 @@ class TestCWLExecuteConfigurator(unittest.TestCase):
         os.environ['CWLKERNEL_BOOT_DIRECTORY'] = '/tmp/CWLKERNEL_DATA'
         self.assertEqual(conf.CWLKERNEL_BOOT_DIRECTORY, '/tmp/CWLKERNEL_DATA1')
 
+    def test_load_CWLKERNEL_RESULTS_SESSION(self):
+        conf = CWLExecuteConfigurator()
+        self.assertIsNone(conf.CWLKERNEL_RESULTS_SESSION)
+
+        os.environ['CWLKERNEL_RESULTS_SESSION'] = 'my-project'
+        conf = CWLExecuteConfigurator()
+        self.assertEqual(conf.CWLKERNEL_RESULTS_SESSION, 'my-project')
+
+        os.environ['CWLKERNEL_RESULTS_SESSION'] = '../my-project'
+        self.assertRaises(RuntimeError, CWLExecuteConfigurator)
+
+    def test_load_CWLKERNEL_EXECUTION_CACHE(self):
+        conf = CWLExecuteConfigurator()
+        self.assertEqual(conf.CWLKERNEL_EXECUTION_CACHE, 'FALSE')
+        self.assertIsNone(conf.CWLKERNEL_EXECUTION_CACHE_MAX_SIZE)
+        self.assertIsNone(conf.CWLKERNEL_EXECUTION_CACHE_MAX_AGE)
+
+        os.environ['CWLKERNEL_EXECUTION_CACHE'] = 'true'
+        os.environ['CWLKERNEL_EXECUTION_CACHE_MAX_SIZE'] = '1024'
+        os.environ['CWLKERNEL_EXECUTION_CACHE_MAX_AGE'] = '3600'
+        conf = CWLExecuteConfigurator()
+        self.assertEqual(conf.CWLKERNEL_EXECUTION_CACHE, 'true')
+        self.assertEqual(conf.CWLKERNEL_EXECUTION_CACHE_MAX_SIZE, '1024')
+        self.assertEqual(conf.CWLKERNEL_EXECUTION_CACHE_MAX_AGE, '3600')
+
+        os.environ['CWLKERNEL_EXECUTION_CACHE'] = 'sometimes'
+        self.assertRaises(RuntimeError, CWLExecuteConfigurator)
+
+    def test_load_CWLKERNEL_MAX_CONCURRENT_JOBS(self):
+        conf = CWLExecuteConfigurator()
+        self.assertEqual(conf.CWLKERNEL_MAX_CONCURRENT_JOBS, '1')
+
+        os.environ['CWLKERNEL_MAX_CONCURRENT_JOBS'] = '4'
+        conf = CWLExecuteConfigurator()
+        self.assertEqual(conf.CWLKERNEL_MAX_CONCURRENT_JOBS, '4')
+
+        os.environ['CWLKERNEL_MAX_CONCURRENT_JOBS'] = '0.5'
+        self.assertRaises(RuntimeError, CWLExecuteConfigurator)
+
     def test_all_properties_have_default_value(self):
         conf = CWLExecuteConfigurator()
         for property in conf.properties:
             self.assertTrue(conf.properties[property][1](conf.__getattribute__(property)))
 
     def tearDown(self) -> None:
-        try:
-            os.environ.pop('CWLKERNEL_MODE')
-        except KeyError:
-            pass
+        for property_name in ['CWLKERNEL_MODE', 'CWLKERNEL_MAX_CORES', 'CWLKERNEL_MAX_RAM', 'CWLKERNEL_RESULTS_SESSION',
+                              'CWLKERNEL_EXECUTION_CACHE', 'CWLKERNEL_EXECUTION_CACHE_MAX_SIZE',
+                              'CWLKERNEL_EXECUTION_CACHE_MAX_AGE', 'CWLKERNEL_MAX_CONCURRENT_JOBS']:
+            try:
+                os.environ.pop(property_name)
+            except KeyError:
+                pass
 
 
 if __name__ == '__main__':
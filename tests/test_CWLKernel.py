@@ -1,6 +1,7 @@
 import logging
 import os
 import shutil
+import sys
 import tarfile
 import tempfile
 import unittest
@@ -146,6 +147,11 @@ class TestCWLKernel(unittest.TestCase):
             'user_expressions': {},
         }, exec_result)
 
+    def test_input_data_keeps_yaml_1_2_scalars(self):
+        kernel = self.get_kernel()
+        kernel._set_data('on: yes\nflag: off\nmode: 0755\n')
+        self.assertDictEqual({'on': 'yes', 'flag': 'off', 'mode': 755}, kernel._input_data)
+
     def test_handle_input_data_files(self):
         import yaml
         kernel = self.get_kernel()
@@ -401,6 +407,36 @@ class TestCWLKernel(unittest.TestCase):
         self.assertTrue(os.path.isdir(os.path.join(provenance_directory, 'workflow')))
         shutil.rmtree(provenance_directory)
 
+    def test_collected_kernel_removes_session_dir(self):
+        import gc
+        import weakref
+        kernel = self.get_kernel()
+        session_directory = kernel._session_dir
+        with open(os.sep.join([self.cwl_directory, 'echo_stdout.cwl'])) as f:
+            kernel.do_execute(f.read(), False)
+        self.assertTrue(os.path.isdir(session_directory))
+        # neither the repository's listeners nor the janitor's thread keep the kernel alive
+        kernel_reference = weakref.ref(kernel)
+        del kernel
+        gc.collect()
+        self.assertIsNone(kernel_reference())
+        self.assertFalse(os.path.isdir(session_directory))
+
+    def test_results_of_previous_session_are_indexed_at_init(self):
+        # the configuration of the module, which may have been reloaded by another test
+        conf = sys.modules[CWLKernel.__module__].CONF
+        session = f'test-session-{os.getpid()}'
+        conf.CWLKERNEL_RESULTS_SESSION = session
+        try:
+            kernel = self.get_kernel()
+            kernel.results_manager.write('run1/output', b'1', {'id': 'output', '_produced_by': 'tool'})
+            reattached_kernel = self.get_kernel()
+            self.assertTrue(reattached_kernel.results_manager._catalog_loaded)
+            self.assertListEqual(['tool/output'], reattached_kernel.completion_index.suggest_results('out'))
+        finally:
+            conf.CWLKERNEL_RESULTS_SESSION = None
+            shutil.rmtree(os.path.join(conf.CWLKERNEL_BOOT_DIRECTORY, 'results', session), ignore_errors=True)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,7 @@
 import json
 import logging
 import os
+import subprocess
 import tarfile
 import tempfile
 import unittest
@@ -119,6 +120,317 @@ class TestCWLKernelMagics(unittest.TestCase):
             responses[-1][0][2]['text']
         )
 
+    def test_display_data_partially(self):
+        from cwlkernel.CWLKernel import CWLKernel
+        from cwlkernel.kernel_magics import DisplayData
+        kernel = CWLKernel()
+        # monitor responses
+        responses = []
+        kernel.send_response = lambda *args, **kwargs: responses.append((args, kwargs))
+        lines = [f'line {i}\n' for i in range(10)]
+        kernel.results_manager.write('lines.txt', ''.join(lines).encode(), metadata={'id': 'lines'})
+
+        kernel.do_execute('% displayData lines --head 3')
+        self.assertEqual(''.join(lines[:3]), responses[-1][0][2]['text'])
+        kernel.do_execute('% displayData lines --tail 2')
+        self.assertEqual(''.join(lines[-2:]), responses[-1][0][2]['text'])
+        kernel.do_execute('% displayData lines --tail 20')
+        self.assertEqual(''.join(lines), responses[-1][0][2]['text'])
+        kernel.do_execute('% displayData lines --range 4:6')
+        self.assertEqual(''.join(lines[4:6]), responses[-1][0][2]['text'])
+        kernel.do_execute('% displayData lines --range 8:')
+        self.assertEqual(''.join(lines[8:]), responses[-1][0][2]['text'])
+        kernel.do_execute('% displayData lines --page 2 --page-size 4')
+        self.assertEqual(''.join(lines[4:8]), responses[-1][0][2]['text'])
+
+        kernel.do_execute('% displayData lines --head 3 --tail 3')
+        self.assertEqual('stderr', responses[-1][0][2]['name'])
+        kernel.do_execute('% displayData lines --range 4')
+        self.assertEqual('stderr', responses[-1][0][2]['name'])
+
+        chunk_size = DisplayData.CHUNK_SIZE
+        try:
+            DisplayData.CHUNK_SIZE = 16
+            responses.clear()
+            kernel.do_execute('% displayData lines')
+            self.assertListEqual(
+                [''.join(lines)[i:i + 16] for i in range(0, len(''.join(lines)), 16)],
+                [r[0][2]['text'] for r in responses]
+            )
+            responses.clear()
+            kernel.do_execute('% displayData lines --tail 5')
+            self.assertEqual(''.join(lines[-5:]), ''.join([r[0][2]['text'] for r in responses]))
+            self.assertEqual(3, len(responses))
+        finally:
+            DisplayData.CHUNK_SIZE = chunk_size
+
+    def test_execute_parallel_magic_command(self):
+        from cwlkernel.CWLKernel import CWLKernel
+        kernel = CWLKernel()
+        # monitor responses
+        responses = []
+        kernel.send_response = lambda *args, **kwargs: responses.append((args, kwargs))
+
+        with open(os.sep.join([self.cwl_directory, 'echo_stdout.cwl'])) as f:
+            workflow_str = f.read()
+        kernel.do_execute(workflow_str, False)
+        with open(os.sep.join([self.data_directory, 'echo-job.yml'])) as f:
+            data = f"% execute echo --parallel --max-cores 1 --max-ram 4096\n{f.read()}"
+        self.assertDictEqual(
+            {'status': 'ok', 'execution_count': 0, 'payload': [], 'user_expressions': {}},
+            kernel.do_execute(data, False)
+        )
+        kernel.do_execute('% displayData echo_output')
+        self.assertEqual(
+            'Hello world!\n',
+            responses[-1][0][2]['text']
+        )
+
+        self.assertDictEqual(
+            {'status': 'error', 'execution_count': 0, 'payload': [], 'user_expressions': {}},
+            kernel.do_execute('% execute echo --max-cores many', False)
+        )
+
+    def test_execute_async_magic_command(self):
+        from cwlkernel.CWLKernel import CWLKernel
+        kernel = CWLKernel()
+        # monitor responses
+        responses = []
+        kernel.send_response = lambda *args, **kwargs: responses.append((args, kwargs))
+
+        with open(os.sep.join([self.cwl_directory, 'echo_stdout.cwl'])) as f:
+            workflow_str = f.read()
+        self.assertDictEqual(
+            {'status': 'ok', 'execution_count': 0, 'payload': [], 'user_expressions': {}},
+            kernel.do_execute(workflow_str, False)
+        )
+
+        with open(os.sep.join([self.data_directory, 'echo-job.yml'])) as f:
+            data = f"% executeAsync echo\n{f.read()}"
+        self.assertDictEqual(
+            {'status': 'ok', 'execution_count': 0, 'payload': [], 'user_expressions': {}},
+            kernel.do_execute(data, False)
+        )
+        self.assertDictEqual(
+            {'status': 'ok', 'execution_count': 0, 'payload': [], 'user_expressions': {}},
+            kernel.do_execute('% wait 1')
+        )
+        self.assertListEqual(
+            [{'job_id': '1', 'tool_id': 'echo', 'status': 'done'}],
+            responses[-1][0][2]['data']['application/json']
+        )
+
+        kernel.do_execute('% jobs')
+        self.assertListEqual(
+            [{'job_id': '1', 'tool_id': 'echo', 'status': 'done'}],
+            responses[-1][0][2]['data']['application/json']
+        )
+
+        kernel.do_execute('% displayData echo_output')
+        self.assertEqual(
+            'Hello world!\n',
+            responses[-1][0][2]['text']
+        )
+
+        self.assertDictEqual(
+            {'status': 'error', 'execution_count': 0, 'payload': [], 'user_expressions': {}},
+            kernel.do_execute('% wait 2')
+        )
+
+    def test_execution_cache_magic_command(self):
+        from cwlkernel.CWLKernel import CWLKernel
+        kernel = CWLKernel()
+        # monitor responses
+        responses = []
+        kernel.send_response = lambda *args, **kwargs: responses.append((args, kwargs))
+
+        with open(os.sep.join([self.cwl_directory, 'echo_stdout.cwl'])) as f:
+            workflow_str = f.read()
+        kernel.do_execute(workflow_str, False)
+        with open(os.sep.join([self.data_directory, 'echo-job.yml'])) as f:
+            data = f.read()
+
+        kernel.do_execute(f"% execute echo\n{data}", False)
+        kernel.do_execute('% cache')
+        self.assertListEqual([], responses[-1][0][2]['data']['application/json'])
+
+        kernel.do_execute(f"% execute echo --cache\n{data}", False)
+        kernel.do_execute('% cache')
+        entries = responses[-1][0][2]['data']['application/json']
+        self.assertEqual(1, len(entries))
+        self.assertEqual('echo', entries[0]['tool_id'])
+        self.assertEqual(0, entries[0]['hits'])
+
+        self.assertDictEqual(
+            {'status': 'ok', 'execution_count': 0, 'payload': [], 'user_expressions': {}},
+            kernel.do_execute(f"% execute echo --cache\n{data}", False)
+        )
+        self.assertIn(
+            'results of echo loaded from the execution cache\n',
+            [r[0][2].get('text') for r in responses if r[0][1] == 'stream']
+        )
+        reused = kernel.results_manager.get_files_registry()[
+            kernel.results_manager.get_last_result_by_id('echo_output')
+        ]
+        self.assertTrue(reused['_cache_hit'])
+        self.assertNotIn('_profile', reused)
+        kernel.do_execute('% displayData echo_output')
+        self.assertEqual('Hello world!\n', responses[-1][0][2]['text'])
+        self.assertEqual(1, kernel.execution_cache.entries()[0]['hits'])
+
+        kernel.do_execute(f"% execute echo --no-cache\n{data}", False)
+        self.assertEqual(1, kernel.execution_cache.entries()[0]['hits'])
+
+        kernel.do_execute(f"% cache pin {entries[0]['key'][:8]}")
+        self.assertTrue(kernel.execution_cache.entries()[0]['pinned'])
+        kernel.do_execute('% cache purge')
+        self.assertEqual(1, len(kernel.execution_cache.entries()))
+        kernel.do_execute(f"% cache unpin {entries[0]['key']}")
+        kernel.do_execute('% cache purge')
+        self.assertListEqual([], kernel.execution_cache.entries())
+        kernel.do_execute('% cache drop')
+        self.assertEqual('stderr', responses[-1][0][2]['name'])
+
+    def test_execute_with_stream(self):
+        from cwlkernel.CWLKernel import CWLKernel
+        kernel = CWLKernel()
+        # monitor responses
+        responses = []
+        kernel.send_response = lambda *args, **kwargs: responses.append((args, kwargs))
+
+        with open(os.sep.join([self.cwl_directory, 'echo.cwl'])) as f:
+            kernel.do_execute(f.read(), False)
+        self.assertDictEqual(
+            {'status': 'ok', 'execution_count': 0, 'payload': [], 'user_expressions': {}},
+            kernel.do_execute("% execute echo --no-cache --stream\nmessage: streamed message", False)
+        )
+        streams = [r[0][2] for r in responses if r[0][1] == 'stream']
+        self.assertIn('streamed message\n', ''.join(s['text'] for s in streams if s['name'] == 'stdout'))
+        self.assertIn('completed success', ''.join(s['text'] for s in streams if s['name'] == 'stderr'))
+
+    def test_runs_magic_command(self):
+        from cwlkernel.CWLKernel import CWLKernel
+        kernel = CWLKernel()
+        # monitor responses
+        responses = []
+        kernel.send_response = lambda *args, **kwargs: responses.append((args, kwargs))
+
+        with open(os.sep.join([self.cwl_directory, 'echo_stdout.cwl'])) as f:
+            workflow_str = f.read()
+        kernel.do_execute(workflow_str, False)
+        with open(os.sep.join([self.data_directory, 'echo-job.yml'])) as f:
+            data = f.read()
+        kernel.do_execute(f"% execute echo --no-cache\n{data}", False)
+        kernel.do_execute('% runs')
+        runs = responses[-1][0][2]['data']['application/json']['runs']
+        self.assertEqual(1, len(runs))
+        output = kernel.results_manager.get_last_result_by_id('echo_output')
+        self.assertEqual(runs[0]['run_id'], os.path.basename(os.path.dirname(output)))
+
+        kernel.do_execute(f"% runs pin {runs[0]['run_id']}")
+        self.assertTrue(kernel.runs_janitor.runs()[0]['pinned'])
+        kernel.runs_janitor.quota = 0
+        kernel.do_execute('% runs collect')
+        self.assertEqual('0 runs evicted', responses[-1][0][2]['text'])
+        self.assertListEqual([], os.listdir(kernel.runtime_directory))
+        kernel.do_execute(f"% runs unpin {runs[0]['run_id']}")
+        kernel.do_execute('% runs collect')
+        self.assertEqual('1 runs evicted', responses[-1][0][2]['text'])
+        self.assertIsNone(kernel.results_manager.get_last_result_by_id('echo_output'))
+        self.assertFalse(os.path.exists(output))
+        kernel.do_execute('% runs drop')
+        self.assertEqual('stderr', responses[-1][0][2]['name'])
+
+    def test_validate_magic_command(self):
+        from cwlkernel.CWLKernel import CWLKernel
+        kernel = CWLKernel()
+        # monitor responses
+        responses = []
+        kernel.send_response = lambda *args, **kwargs: responses.append((args, kwargs))
+
+        with open(os.sep.join([self.cwl_directory, '3stepWorkflow.cwl'])) as f:
+            kernel.do_execute(f.read(), False)
+        kernel.do_execute('% validate threesteps')
+        self.assertEqual('stderr', responses[-1][0][2]['name'])
+        self.assertIn("step 'head': tool 'head.cwl' is not found", responses[-1][0][2]['text'])
+        for tool in ['head', 'grep']:
+            with open(os.sep.join([self.cwl_directory, f'{tool}.cwl'])) as f:
+                kernel.do_execute(f.read(), False)
+        kernel.do_execute('% validate')
+        self.assertEqual('stdout', responses[-1][0][2]['name'])
+        self.assertEqual(
+            "tool 'threesteps' is valid\ntool 'head' is valid\ntool 'grep' is valid\n", responses[-1][0][2]['text']
+        )
+        kernel.do_execute('% validate missing')
+        self.assertEqual("tool 'missing' is not valid:\n\t- it is not registered\n", responses[-1][0][2]['text'])
+
+    def test_complete_execution_inputs(self):
+        from cwlkernel.CWLKernel import CWLKernel
+        # the suggesters complete from the kernel's instance
+        kernel = CWLKernel.instance()
+        # monitor responses
+        responses = []
+        kernel.send_response = lambda *args, **kwargs: responses.append((args, kwargs))
+
+        with open(os.sep.join([self.cwl_directory, 'echo_stdout.cwl'])) as f:
+            kernel.do_execute(f.read(), False)
+        code = '% view ec'
+        self.assertIn('echo', kernel.do_complete(code, len(code))['matches'])
+        code = '% execute echo\nMES'
+        self.assertDictEqual(
+            {'matches': ['message'], 'cursor_start': len(code) - 3, 'cursor_end': len(code), 'status': 'ok'},
+            kernel.do_complete(code, len(code))
+        )
+        with open(os.sep.join([self.data_directory, 'echo-job.yml'])) as f:
+            data = f.read()
+        kernel.do_execute(f"% execute echo --no-cache\n{data}", False)
+        code = '% execute echo\nmessage:\n  $data: echo_'
+        suggestion = kernel.do_complete(code, len(code))
+        self.assertListEqual(['echo/echo_output'], suggestion['matches'])
+        self.assertEqual(len(code) - len('echo_'), suggestion['cursor_start'])
+        code = '% execute echo\nmessage: {$data: ECHO_OUT}'
+        self.assertListEqual(['echo/echo_output'], kernel.do_complete(code, len(code) - 1)['matches'])
+        kernel.runs_janitor.quota = 0
+        kernel.do_execute('% runs collect')
+        self.assertListEqual([], kernel.do_complete(code, len(code) - 1)['matches'])
+
+    def test_profile_magic_command(self):
+        from cwlkernel.CWLKernel import CWLKernel
+        kernel = CWLKernel()
+        # monitor responses
+        responses = []
+        kernel.send_response = lambda *args, **kwargs: responses.append((args, kwargs))
+
+        kernel.do_execute('% profile')
+        self.assertEqual('stderr', responses[-1][0][2]['name'])
+        with open(os.sep.join([self.cwl_directory, 'echo_stdout.cwl'])) as f:
+            workflow_str = f.read()
+        kernel.do_execute(workflow_str, False)
+        with open(os.sep.join([self.data_directory, 'echo-job.yml'])) as f:
+            data = f.read()
+        kernel.do_execute(f"% execute echo --no-cache\n{data}", False)
+        run_id = kernel.runs_janitor.runs()[0]['run_id']
+        kernel.do_execute(f'% profile {run_id}')
+        run_profile = responses[-1][0][2]['data']['application/json']
+        self.assertEqual(run_id, run_profile['run_id'])
+        self.assertEqual('echo', run_profile['tool_id'])
+        self.assertEqual(1, len(run_profile['steps']))
+        for key in ['wall_time', 'cpu_time', 'peak_rss', 'read_bytes', 'write_bytes']:
+            self.assertIn(key, run_profile)
+            self.assertIn(key, run_profile['steps'][0])
+        self.assertGreater(run_profile['wall_time'], 0)
+        self.assertGreater(run_profile['steps'][0]['wall_time'], 0)
+        self.assertEqual(
+            run_id,
+            kernel.results_manager.get_files_registry()[
+                kernel.results_manager.get_last_result_by_id('echo_output')]['_profile']['run_id']
+        )
+
+        kernel.do_execute('% profile')
+        self.assertEqual(run_id, responses[-1][0][2]['data']['application/json']['run_id'])
+        kernel.do_execute('% profile unknown')
+        self.assertEqual('stderr', responses[-1][0][2]['name'])
+
     def test_logs_magic_command(self):
         from cwlkernel.CWLKernel import CWLKernel
         kernel = CWLKernel()
@@ -183,10 +495,19 @@ class TestCWLKernelMagics(unittest.TestCase):
         result = kernel.do_execute(data, False)
         self.assertEqual('ok', result['status'], f'execution returned an error')
 
+        # every run writes its outputs to its own directory
+        run_directory = os.path.dirname(
+            responses[-1][0][2]['data']['application/json']['example_out']['location'][len('file://'):]
+        )
+        stored_result = kernel.results_manager.get_last_result_by_id('example_out')
+        self.assertIn(kernel.results_manager.get_files_registry()[stored_result]['_ingestion'], {'reflink', 'link'})
+        self.assertEqual(tar_directory, os.path.dirname(run_directory))
+        run_profile = responses[-1][0][2]['data']['application/json']['example_out'].pop('_profile')
+        self.assertEqual(os.path.basename(run_directory), run_profile['run_id'])
         self.assertDictEqual(
             {
                 'example_out': {
-                    'location': f'file://{tar_directory}/hello.txt', 'basename': 'hello.txt',
+                    'location': f'file://{run_directory}/hello.txt', 'basename': 'hello.txt',
                     'nameroot': 'hello', 'nameext': '.txt', 'class': 'File',
                     'checksum': 'sha1$2aae6c35c94fcfb415dbe95f408b9ce91ee846ed', 'size': 11,
                     'http://commonwl.org/cwltool#generation': 0,
@@ -201,7 +522,7 @@ class TestCWLKernelMagics(unittest.TestCase):
         self.assertDictEqual(
             {
                 'example_out': {
-                    'location': f'file://{tar_directory}/hello.txt', 'basename': 'hello.txt',
+                    'location': f'file://{run_directory}/hello.txt', 'basename': 'hello.txt',
                     'nameroot': 'hello', 'nameext': '.txt', 'class': 'File',
                     'checksum': 'sha1$2aae6c35c94fcfb415dbe95f408b9ce91ee846ed', 'size': 11,
                     'http://commonwl.org/cwltool#generation': 0,
@@ -210,7 +531,10 @@ class TestCWLKernelMagics(unittest.TestCase):
                     '_produced_by': 'extract-tar',
                 }
             },
-            json.loads(responses[-1][0][2]['data']['text/plain'])
+            {
+                output: {key: value for key, value in result.items() if key != '_profile'}
+                for output, result in json.loads(responses[-1][0][2]['data']['text/plain']).items()
+            }
         )
 
     def test_snippet_builder(self):
@@ -315,10 +639,11 @@ inputfile:
         )
 
     def test_githubImport(self):
-        when(requests) \
-            .get("https://api.github.com/repos/giannisdoukas/CWLJNIKernel/contents/tests/cwl/head.cwl?ref=dev") \
+        when(requests.Session) \
+            .get("https://api.github.com/repos/giannisdoukas/CWLJNIKernel/contents/tests/cwl/head.cwl?ref=dev", ...) \
             .thenReturn(mock({
             'status_code': 200,
+            'headers': {},
             'json': lambda: {
                 "name": "head.cwl",
                 "path": "tests/cwl/head.cwl",
@@ -338,12 +663,13 @@ inputfile:
                 }
             }
         }))
-        when(requests) \
+        when(requests.Session) \
             .get(
-            "https://api.github.com/repos/giannisdoukas/CWLJNIKernel/contents/tests/cwl/3stepWorkflow.cwl?ref=dev") \
+            "https://api.github.com/repos/giannisdoukas/CWLJNIKernel/contents/tests/cwl/3stepWorkflow.cwl?ref=dev", ...) \
             .thenReturn(mock(
             {
                 'status_code': 200,
+                'headers': {},
                 'json': lambda: {
                     "name": "3stepWorkflow.cwl",
                     "path": "tests/cwl/3stepWorkflow.cwl",
@@ -363,11 +689,12 @@ inputfile:
                     }
                 }
             }))
-        when(requests) \
-            .get("https://api.github.com/repos/giannisdoukas/CWLJNIKernel/contents/tests/cwl/grep.cwl?ref=dev") \
+        when(requests.Session) \
+            .get("https://api.github.com/repos/giannisdoukas/CWLJNIKernel/contents/tests/cwl/grep.cwl?ref=dev", ...) \
             .thenReturn(mock(
             {
                 'status_code': 200,
+                'headers': {},
                 'json': lambda: {
                     "name": "grep.cwl",
                     "path": "tests/cwl/grep.cwl",
@@ -407,12 +734,82 @@ inputfile:
 query: id""")
         )
 
+    def test_githubImport_from_local_repository(self):
+        from tests.git.test_resolver import GitResolverTest
+        repository = GitResolverTest.create_local_repository()
+        kernel = CWLKernel()
+        # cancel send_response
+        responses = []
+        kernel.send_response = lambda *args, **kwargs: responses.append((args, kwargs))
+        self.assertDictEqual(
+            {'status': 'ok', 'execution_count': 0, 'payload': [], 'user_expressions': {}},
+            kernel.do_execute(f"% githubImport {Path(repository).as_uri()}/blob/dev/tests/cwl/3stepWorkflow.cwl")
+        )
+        self.assertListEqual(
+            ["tool '3stepWorkflow' registered\ntool 'head' registered\ntool 'grep' registered\n"],
+            [r[0][2]['text'] for r in responses]
+        )
+
+        self.assertDictEqual(
+            {'status': 'ok', 'execution_count': 0, 'payload': [], 'user_expressions': {}},
+            kernel.do_execute(f"""% execute 3stepWorkflow
+inputfile:
+    class: File
+    location: {os.sep.join([self.cwl_directory, '3stepWorkflow.cwl'])}
+query: id""")
+        )
+        self.assertIsNotNone(kernel.results_manager.get_last_result_by_id('outputfile'))
+
+    def test_githubImport_with_imports_and_includes(self):
+        repository = os.path.join(tempfile.mkdtemp(), 'includes')
+        for directory in ['tools', 'requirements', 'scripts']:
+            os.makedirs(os.path.join(repository, directory))
+        with open(os.path.join(repository, 'scripts', 'greeting.js'), 'w') as f:
+            f.write('function greeting() { return "hello from the include"; }\n')
+        with open(os.path.join(repository, 'requirements', 'javascript.yml'), 'w') as f:
+            f.write('class: InlineJavascriptRequirement\n'
+                    'expressionLib:\n'
+                    '  - $include: ../scripts/greeting.js\n')
+        with open(os.path.join(repository, 'tools', 'greet.cwl'), 'w') as f:
+            f.write('cwlVersion: v1.0\n'
+                    'class: CommandLineTool\n'
+                    'id: greet\n'
+                    'baseCommand: echo\n'
+                    'requirements:\n'
+                    '  - $import: ../requirements/javascript.yml\n'
+                    'arguments: [$(greeting())]\n'
+                    'inputs: []\n'
+                    'outputs:\n'
+                    '  greeting:\n'
+                    '    type: stdout\n'
+                    'stdout: greeting.txt\n')
+        for command in [['init', '-q'], ['checkout', '-q', '-b', 'master'], ['add', '.'],
+                        ['-c', 'user.name=test', '-c', 'user.email=test@example.com', 'commit', '-q', '-m', 'tools']]:
+            subprocess.run(['git', *command], cwd=repository, check=True)
+        kernel = CWLKernel()
+        # cancel send_response
+        responses = []
+        kernel.send_response = lambda *args, **kwargs: responses.append((args, kwargs))
+        self.assertDictEqual(
+            {'status': 'ok', 'execution_count': 0, 'payload': [], 'user_expressions': {}},
+            kernel.do_execute(f"% githubImport {Path(repository).as_uri()}/blob/master/tools/greet.cwl")
+        )
+        self.assertListEqual(["tool 'greet' registered\n"], [r[0][2]['text'] for r in responses])
+
+        self.assertDictEqual(
+            {'status': 'ok', 'execution_count': 0, 'payload': [], 'user_expressions': {}},
+            kernel.do_execute("% execute greet")
+        )
+        with open(kernel.results_manager.get_last_result_by_id('greeting')) as f:
+            self.assertEqual('hello from the include\n', f.read())
+
     def test_githubImport_without_id(self):
-        when(requests) \
+        when(requests.Session) \
             .get(
-            "https://api.github.com/repos/giannisdoukas/CWLJNIKernel/contents/tests/cwl/without_id.cwl?ref=dev") \
+            "https://api.github.com/repos/giannisdoukas/CWLJNIKernel/contents/tests/cwl/without_id.cwl?ref=dev", ...) \
             .thenReturn(mock({
             'status_code': 200,
+            'headers': {},
             'json': lambda: {
                 "name": "without_id.cwl",
                 "path": "tests/cwl/without_id.cwl",
@@ -451,11 +848,12 @@ query: id""")
     @unittest.skipIf("TRAVIS_IGNORE_DOCKER" in os.environ and os.environ["TRAVIS_IGNORE_DOCKER"] == "true",
                      "Skipping this test on Travis CI.")
     def test_githubImport_walk_paths(self):
-        when(requests) \
+        when(requests.Session) \
             .get(
-            "https://api.github.com/repos/wilke/CWL-Quick-Start/contents/CWL/Workflows/pdf2wordcloud.cwl?ref=master") \
+            "https://api.github.com/repos/wilke/CWL-Quick-Start/contents/CWL/Workflows/pdf2wordcloud.cwl?ref=master", ...) \
             .thenReturn(mock({
             'status_code': 200,
+            'headers': {},
             'json': lambda: {
                 "name": "pdf2wordcloud.cwl",
                 "path": "CWL/Workflows/pdf2wordcloud.cwl",
@@ -475,10 +873,11 @@ query: id""")
                 }
             }
         }))
-        when(requests) \
-            .get("https://api.github.com/repos/wilke/CWL-Quick-Start/contents/CWL/Tools/pdftotext.cwl?ref=master") \
+        when(requests.Session) \
+            .get("https://api.github.com/repos/wilke/CWL-Quick-Start/contents/CWL/Tools/pdftotext.cwl?ref=master", ...) \
             .thenReturn(mock({
             'status_code': 200,
+            'headers': {},
             'json': lambda: {
                 "name": "pdftotext.cwl",
                 "path": "CWL/Tools/pdftotext.cwl",
@@ -498,10 +897,11 @@ query: id""")
                 }
             }
         }))
-        when(requests) \
-            .get("https://api.github.com/repos/wilke/CWL-Quick-Start/contents/CWL/Tools/wordcloud.cwl?ref=master") \
+        when(requests.Session) \
+            .get("https://api.github.com/repos/wilke/CWL-Quick-Start/contents/CWL/Tools/wordcloud.cwl?ref=master", ...) \
             .thenReturn(mock({
             'status_code': 200,
+            'headers': {},
             'json': lambda: {
                 "name": "wordcloud.cwl",
                 "path": "CWL/Tools/wordcloud.cwl",
@@ -585,6 +985,43 @@ query: id""")
         self.assertAlmostEqual(shape[0], 4, delta=4)
         self.assertEqual(shape[1], 20)
 
+    def test_sample_csv_bounded(self):
+        from cwlkernel.kernel_magics import CSVData
+        kernel = CWLKernel()
+        responses = []
+        kernel.send_response = lambda *args, **kwargs: responses.append((args, kwargs))
+        csv_data = ''.join([f'{i},{i * 2},{i * 3}\n' for i in range(1000)])
+        kernel.results_manager.write('numbers.csv', csv_data.encode(), metadata={'id': 'numbers'})
+
+        chunk_size = CSVData.CHUNK_SIZE
+        try:
+            CSVData.CHUNK_SIZE = 64
+            kernel.do_execute('% sampleCSV numbers --size 10 --seed 1')
+            sample = pd.read_html(responses[-1][0][2]['data']['text/html'], header=None)[0]
+            self.assertEqual((10, 3), sample.shape)
+            self.assertListEqual(sorted(sample.values[:, 0]), list(sample.values[:, 0]))
+            self.assertListEqual(list(sample.values[:, 0] * 3), list(sample.values[:, 2]))
+            kernel.do_execute('% sampleCSV numbers --size 10 --seed 1')
+            self.assertEqual(sample.values.tolist(), pd.read_html(
+                responses[-1][0][2]['data']['text/html'], header=None)[0].values.tolist())
+
+            kernel.do_execute('% sampleCSV numbers 0.1 --seed 1 --columns 1 --max-rows 20')
+            sample = pd.read_html(responses[-1][0][2]['data']['text/html'], header=None)[0]
+            self.assertEqual((20, 1), sample.shape)
+            self.assertTrue(all(v % 2 == 0 for v in sample.values[:, 0]))
+            self.assertIn('showing the first 20 rows', responses[-1][0][2]['data']['text/plain'])
+        finally:
+            CSVData.CHUNK_SIZE = chunk_size
+
+        kernel.do_execute('% sampleCSV numbers')
+        self.assertEqual('stderr', responses[-1][0][2]['name'])
+
+        kernel.do_execute('% displayDataCSV numbers --max-rows 5 --columns 0,2')
+        self.assertListEqual(
+            [[i, i * 3] for i in range(5)],
+            pd.read_html(responses[-1][0][2]['data']['text/html'], header=None)[0].values.tolist()
+        )
+
     def test_display_data_csv(self):
         kernel = CWLKernel()
         # cancel send_response
@@ -982,6 +1419,37 @@ tailinput: headstepid/headoutput
             kernel.workflow_repository.get_instance().get_by_id('main').to_dict()
         )
 
+    def test_compile_executed_steps_with_execution_flags(self):
+        kernel = CWLKernel()
+        # cancel send_response
+        responses = []
+        kernel.send_response = lambda *args, **kwargs: responses.append((args, kwargs))
+        for tool in ['head-no-optional.cwl', 'tail-no-optional.cwl']:
+            with open(os.sep.join([self.cwl_directory, tool])) as f:
+                kernel.do_execute(f.read())
+
+        execute_tail = os.linesep.join([
+            '% execute --serial tail',
+            'tailinput:',
+            '  class: File',
+            f"  location: {os.sep.join([self.data_directory, 'data.csv'])}",
+        ])
+        execute_head = os.linesep.join([
+            '% executeAsync --parallel head',
+            'headinput:',
+            '  class: File',
+            '  $data: tail/tailoutput',
+        ])
+        for code in [execute_tail, execute_head, '% wait', '% compile main']:
+            self.assertDictEqual(
+                {'status': 'ok', 'execution_count': 0, 'payload': [], 'user_expressions': {}},
+                kernel.do_execute(code)
+            )
+        workflow = kernel.workflow_repository.get_instance().get_by_id('main').to_dict()
+        self.assertListEqual(['head', 'tail'], sorted(workflow['steps']))
+        self.assertDictEqual({'headinput': 'tail/tailoutput'}, workflow['steps']['head']['in'])
+        self.assertListEqual([{'id': 'tailinput', 'type': 'File'}], workflow['inputs'])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+
+from cwlkernel.CompletionIndex import CompletionIndex
+
+
+class TestCompletionIndex(unittest.TestCase):
+
+    def test_tools(self):
+        index = CompletionIndex()
+        index.add_tool('echo', ['message'])
+        index.add_tool('echoTwice', ['message', 'times'])
+        self.assertListEqual(['echo', 'echoTwice'], index.suggest_tools('ECH'))
+        self.assertListEqual(['times', 'message'], index.suggest_inputs('echoTwice', ''))
+        self.assertListEqual(['times'], index.suggest_inputs('echoTwice', 't'))
+        self.assertListEqual([], index.suggest_inputs('missing', ''))
+        index.add_tool('echoTwice', ['text'])
+        self.assertListEqual(['text'], index.suggest_inputs('echoTwice', 't'))
+        index.remove_tool('echo')
+        self.assertListEqual(['echoTwice'], index.suggest_tools('e'))
+        self.assertListEqual([], index.suggest_inputs('echo', ''))
+
+    def test_results(self):
+        index = CompletionIndex(top_k=2)
+        for reference in ['echo/output', 'echo/other', 'grep/output']:
+            index.add_result(reference)
+        self.assertListEqual(['echo/other', 'echo/output'], index.suggest_results('echo/'))
+        self.assertListEqual(['echo/output', 'grep/output'], index.suggest_results('out'))
+        index.remove_result('echo/output')
+        self.assertListEqual(['grep/output'], index.suggest_results('OUT'))
+        self.assertListEqual(['echo/other'], index.suggest_results('echo'))
+
+
+if __name__ == '__main__':
+    unittest.main()
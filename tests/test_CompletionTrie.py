@@ -0,0 +1,41 @@
+import unittest
+
+from cwlkernel.CompletionTrie import CompletionTrie
+
+
+class TestCompletionTrie(unittest.TestCase):
+
+    def test_suggest(self):
+        trie = CompletionTrie(top_k=3)
+        for value in ['execute', 'executeAsync', 'exec', 'display', 'displayData', 'd']:
+            trie.add(value, value)
+        trie.add('alias', 'exec')
+        self.assertListEqual(['exec', 'execute', 'executeAsync'], trie.suggest('e'))
+        self.assertListEqual(['exec', 'execute'], trie.suggest('e', limit=2))
+        self.assertListEqual(['d', 'exec', 'display'], trie.suggest(''))
+        self.assertListEqual(['exec'], trie.suggest('al'))
+        self.assertListEqual([], trie.suggest('x'))
+        self.assertIn('disp', trie)
+        self.assertNotIn('x', trie)
+        trie.add('zz', 'ranked', rank=0)
+        self.assertListEqual(['ranked', 'd', 'exec'], trie.suggest(''))
+
+    def test_remove(self):
+        trie = CompletionTrie(top_k=2)
+        for value in ['a', 'ab', 'abc', 'abcd']:
+            trie.add(value, value)
+        trie.add('x', 'ab')
+        self.assertListEqual(['a', 'ab'], trie.suggest('a'))
+        trie.remove('a', 'a')
+        trie.remove('ab', 'ab')
+        self.assertListEqual(['abc', 'abcd'], trie.suggest('a'))
+        self.assertListEqual(['ab'], trie.suggest('x'))
+        self.assertListEqual(['ab', 'abc'], trie.suggest(''))
+        trie.remove('x', 'ab')
+        trie.remove('missing', 'ab')
+        self.assertNotIn('x', trie)
+        self.assertListEqual(['abc', 'abcd'], trie.suggest(''))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -37,6 +37,87 @@ class TestCoreExecutor(unittest.TestCase):
         except Exception:
             self.fail("execution failed")
 
+    def test_executor_reuses_loaded_workflow(self):
+        file_manager = IOFileManager(self.kernel_root_directory)
+        executor = CoreExecutor(file_manager, None)
+        workflow_path = os.path.join(tempfile.mkdtemp(), 'essential_input.cwl')
+        with open(os.sep.join([self.cwl_directory, 'essential_input.cwl'])) as f:
+            workflow_str = f.read()
+        with open(workflow_path, 'w') as f:
+            f.write(workflow_str)
+
+        executable = executor._load_executable(workflow_path)
+        self.assertIs(executable, executor._load_executable(workflow_path))
+
+        with open(workflow_path, 'a') as f:
+            f.write('\nlabel: changed\n')
+        new_executable = executor._load_executable(workflow_path)
+        self.assertIsNot(executable, new_executable)
+        self.assertEqual(1, len(executor._executables_cache))
+
+        executor.invalidate_cache(workflow_path)
+        self.assertEqual(0, len(executor._executables_cache))
+
+    def test_executor_keeps_data_in_memory(self):
+        file_manager = IOFileManager(tempfile.mkdtemp())
+        executor = CoreExecutor(file_manager, None)
+        executor.set_workflow_path(os.sep.join([self.cwl_directory, 'essential_input.cwl']))
+        with open(os.sep.join([self.data_directory, 'essential_input_data1.yml'])) as f:
+            data_str = f.read()
+        job_order = executor.set_data([{'example_int': 1}, data_str])
+        self.assertEqual(1, job_order['example_int'])
+        self.assertEqual(0, file_manager.files_counter)
+        _, _, exception, _ = executor.execute()
+        self.assertIsNone(exception)
+        self.assertEqual(0, file_manager.files_counter)
+        self.assertListEqual([], [f for f in os.listdir(file_manager.ROOT_DIRECTORY) if f.endswith('.yml')])
+
+    def test_merge_data_keeps_yaml_1_2_scalars(self):
+        job_order = CoreExecutor.merge_data(['on: yes\nflag: off\nmode: 0755\nversion: 1.10\n'])
+        self.assertDictEqual({'on': 'yes', 'flag': 'off', 'mode': 755, 'version': 1.1}, job_order)
+
+    def test_executor_execute_concurrently(self):
+        from concurrent.futures import ThreadPoolExecutor
+        file_manager = IOFileManager(tempfile.mkdtemp())
+        executor = CoreExecutor(file_manager, None)
+        workflow_path = os.sep.join([self.cwl_directory, 'essential_input.cwl'])
+        with open(os.sep.join([self.data_directory, 'essential_input_data1.yml'])) as f:
+            job_order = CoreExecutor.merge_data([f.read()])
+        cwd = os.getcwd()
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            executions = list(pool.map(
+                lambda i: executor.execute(workflow_path=workflow_path, job_order={**job_order, 'example_int': i}),
+                range(4)
+            ))
+        self.assertEqual(4, len({run_id for run_id, _, _, _ in executions}))
+        for _, _, exception, _ in executions:
+            self.assertIsNone(exception)
+        self.assertEqual(cwd, os.getcwd())
+
+        executor.set_workflow_path(os.path.join(tempfile.mkdtemp(), 'missing.cwl'))
+        self.assertRaises(Exception, executor.execute)
+        self.assertEqual(cwd, os.getcwd())
+
+    def test_executor_execute_parallel(self):
+        file_manager = IOFileManager(self.kernel_root_directory)
+        executor = CoreExecutor(file_manager, None)
+        workflow_path = os.sep.join([self.cwl_directory, 'essential_input.cwl'])
+        executor.set_workflow_path(workflow_path)
+        with open(os.sep.join([self.data_directory, 'essential_input_data1.yml'])) as f:
+            data_str = f.read()
+        executor.set_data([data_str])
+        execution_id, new_files, exception, research_object = executor.execute(parallel=True, max_cores=2, max_ram=4096)
+        self.assertIsNotNone(execution_id)
+        self.assertDictEqual(new_files, {})
+        self.assertIsNone(exception, 'An exception occurred while executing workflow')
+
+        from cwltool.executors import MultithreadedJobExecutor, SingleJobExecutor
+        job_executor = CoreExecutor._get_job_executor(True, 2, 512)
+        self.assertIsInstance(job_executor, MultithreadedJobExecutor)
+        self.assertEqual(2, job_executor.max_cores)
+        self.assertEqual(512, job_executor.max_ram)
+        self.assertIsInstance(CoreExecutor._get_job_executor(False), SingleJobExecutor)
+
     def test_validate_input_files(self):
         import uuid
         absolute_file_does_exists = {
@@ -0,0 +1,185 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from cwlkernel.ExecutionCache import ExecutionCache
+
+
+class TestExecutionCache(unittest.TestCase):
+    cwl_directory: str
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.cwl_directory = os.sep.join([os.path.dirname(os.path.realpath(__file__)), 'cwl'])
+
+    def test_compute_key(self):
+        cache = ExecutionCache()
+        directory = tempfile.mkdtemp()
+        tool_path = os.path.join(self.cwl_directory, 'essential_input.cwl')
+        input_path = os.path.join(directory, 'input.txt')
+        with open(input_path, 'w') as f:
+            f.write('hello')
+        job_order = {'example_int': 42, 'example_file': {'class': 'File', 'location': 'input.txt'}}
+
+        key = cache.compute_key(tool_path, job_order, directory)
+        self.assertEqual(key, cache.compute_key(tool_path, dict(job_order), directory))
+        self.assertEqual(
+            key,
+            cache.compute_key(tool_path, {**job_order, 'example_file': {'class': 'File', 'path': input_path}}, '/')
+        )
+        self.assertNotEqual(key, cache.compute_key(tool_path, {**job_order, 'example_int': 41}, directory))
+        self.assertNotEqual(
+            key, cache.compute_key(os.path.join(self.cwl_directory, 'echo.cwl'), job_order, directory)
+        )
+
+        with open(input_path, 'w') as f:
+            f.write('hello world')
+        self.assertNotEqual(key, cache.compute_key(tool_path, job_order, directory))
+
+    def test_compute_key_hashes_dependencies(self):
+        cache = ExecutionCache()
+        directory = tempfile.mkdtemp()
+        with open(os.path.join(directory, 'arguments.txt'), 'w') as f:
+            f.write('-n')
+        with open(os.path.join(directory, 'requirements.yml'), 'w') as f:
+            f.write('class: InlineJavascriptRequirement\n')
+        tool_path = os.path.join(directory, 'tool.cwl')
+        with open(tool_path, 'w') as f:
+            f.write(
+                'cwlVersion: v1.0\nclass: CommandLineTool\nbaseCommand: echo\n'
+                'arguments: [{$include: arguments.txt}]\n'
+                'requirements: [{$import: requirements.yml}]\n'
+                'inputs: {file: File}\noutputs: []\n'
+            )
+        input_path = os.path.join(directory, 'reads.bam')
+        with open(input_path, 'w') as f:
+            f.write('reads')
+        job_order = {'file': {'class': 'File', 'location': input_path}}
+
+        key = cache.compute_key(tool_path, job_order, directory)
+        with open(os.path.join(directory, 'arguments.txt'), 'w') as f:
+            f.write('-e')
+        included_key = cache.compute_key(tool_path, job_order, directory)
+        self.assertNotEqual(key, included_key)
+        with open(os.path.join(directory, 'requirements.yml'), 'w') as f:
+            f.write('class: ShellCommandRequirement\n')
+        imported_key = cache.compute_key(tool_path, job_order, directory)
+        self.assertNotEqual(included_key, imported_key)
+        with open(os.path.join(directory, 'reads.bam.bai'), 'w') as f:
+            f.write('index')
+        secondary_key = cache.compute_key(tool_path, job_order, directory)
+        self.assertNotEqual(imported_key, secondary_key)
+        with open(os.path.join(directory, 'reads.bai'), 'w') as f:
+            f.write('index')
+        self.assertNotEqual(secondary_key, cache.compute_key(tool_path, job_order, directory))
+
+    def test_files_hashes_are_bounded(self):
+        cache = ExecutionCache()
+        cache.FILES_HASHES_SIZE = 2
+        directory = tempfile.mkdtemp()
+        paths = [os.path.join(directory, f'{i}.txt') for i in range(3)]
+        for i, path in enumerate(paths):
+            with open(path, 'w') as f:
+                f.write(str(i))
+        hashes = [cache._hash_path(path) for path in paths]
+        self.assertListEqual([os.path.realpath(p) for p in paths[1:]], list(cache._files_hashes))
+
+        # a modified file replaces its old hash
+        with open(paths[2], 'w') as f:
+            f.write('modified')
+        os.utime(paths[2], (0, 0))
+        self.assertNotEqual(hashes[2], cache._hash_path(paths[2]))
+        self.assertEqual(2, len(cache._files_hashes))
+        self.assertEqual(hashes[0], cache._hash_path(paths[0]))
+        self.assertListEqual([os.path.realpath(p) for p in [paths[2], paths[0]]], list(cache._files_hashes))
+
+    def test_get_put(self):
+        cache = ExecutionCache()
+        directory = tempfile.mkdtemp()
+        result_path = os.path.join(directory, 'result.txt')
+        with open(result_path, 'w') as f:
+            f.write('result')
+        results = {'output': {'class': 'File', 'location': 'file:///tmp/old/result.txt', 'id': 'output'}}
+
+        self.assertIsNone(cache.get('key'))
+        cache.put('key', 'tool', os.path.join(self.cwl_directory, 'echo.cwl'), results, {'output': result_path})
+        cached = cache.get('key')
+        self.assertEqual(Path(result_path).as_uri(), cached['output']['location'])
+        self.assertEqual('file:///tmp/old/result.txt', results['output']['location'])
+        self.assertEqual(1, cache.entries()[0]['hits'])
+
+        cache.invalidate(os.path.join(self.cwl_directory, 'echo.cwl'))
+        self.assertIsNone(cache.get('key'))
+
+        cache.put('key', 'tool', os.path.join(self.cwl_directory, 'echo.cwl'), results, {'output': result_path})
+        os.remove(result_path)
+        self.assertIsNone(cache.get('key'))
+        self.assertListEqual([], cache.entries())
+
+    def test_evict_pin_purge(self):
+        directory = tempfile.mkdtemp()
+        stored = {}
+        for name in ['a', 'b', 'c']:
+            stored[name] = os.path.join(directory, name)
+            with open(stored[name], 'w') as f:
+                f.write('1234')
+        tool_path = os.path.join(self.cwl_directory, 'echo.cwl')
+        cache = ExecutionCache(max_size=8)
+        cache.put('a-key', 'a', tool_path, {'a': {}}, {'a': stored['a']})
+        cache.pin('a-k')
+        cache.put('b-key', 'b', tool_path, {'b': {}}, {'b': stored['b']})
+        cache.put('c-key', 'c', tool_path, {'c': {}}, {'c': stored['c']})
+        self.assertListEqual(['a-key', 'c-key'], [e['key'] for e in cache.entries()])
+
+        self.assertRaises(KeyError, cache.pin, 'b-key')
+        self.assertEqual(1, cache.purge())
+        self.assertListEqual(['a-key'], [e['key'] for e in cache.entries()])
+        cache.pin('a-key', False)
+        self.assertEqual(1, cache.purge('a'))
+        self.assertListEqual([], cache.entries())
+
+        cache = ExecutionCache(max_age=60)
+        cache.put('a-key', 'a', tool_path, {'a': {}}, {'a': stored['a']})
+        self.assertIsNotNone(cache.get('a-key'))
+        cache._entries['a-key']['created'] -= 120
+        self.assertIsNone(cache.get('a-key'))
+
+    def test_concurrent_put_and_invalidate(self):
+        directory = tempfile.mkdtemp()
+        result_path = os.path.join(directory, 'result.txt')
+        with open(result_path, 'w') as f:
+            f.write('result')
+        tool_path = os.path.join(self.cwl_directory, 'echo.cwl')
+        cache = ExecutionCache(max_size=1024)
+        errors = []
+
+        def put(thread: int):
+            try:
+                for i in range(2000):
+                    cache.put(f'{thread}-{i}', 'tool', tool_path, {'output': {}}, {'output': result_path})
+            except Exception as e:
+                errors.append(e)
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=put, args=(t,)) for t in range(4)]
+            for thread in threads:
+                thread.start()
+            while any(thread.is_alive() for thread in threads):
+                cache.entries()
+                cache.invalidate(tool_path)
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(switch_interval)
+        self.assertListEqual([], errors)
+        cache.invalidate(tool_path)
+        self.assertListEqual([], cache.entries())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,7 +4,7 @@ import tempfile
 import unittest
 from os.path import sep
 
-from cwlkernel.IOManager import IOFileManager
+from cwlkernel.IOManager import IOFileManager, ResultsManager
 
 
 class TestIOManager(unittest.TestCase):
@@ -53,6 +53,137 @@ class TestIOManager(unittest.TestCase):
             copy_text = f.read()
         self.assertEqual(copy_text, 'tmp text')
 
+    def test_append_files_ingestion_strategies(self):
+        source_tmp_dir = tempfile.mkdtemp(dir=self.root_directory)
+        files = [os.path.join(source_tmp_dir, f'tmpfilefortest{i}') for i in range(2)]
+        for file in files:
+            with open(file, 'w') as f:
+                f.write('tmp text')
+
+        file_manager = IOFileManager(os.path.join(self.root_directory, 'copies'))
+        metadata = {'id': 'output'}
+        new_files = file_manager.append_files(files[:1], metadata=metadata)
+        self.assertDictEqual({'id': 'output'}, metadata)
+        self.assertEqual('copy', file_manager.get_files_registry()[new_files[0]]['_ingestion'])
+        self.assertFalse(os.path.samefile(files[0], new_files[0]))
+
+        file_manager = IOFileManager(
+            os.path.join(self.root_directory, 'links'),
+            ingestion_strategy='link',
+            owned_directories=[source_tmp_dir]
+        )
+        new_files = file_manager.append_files(files[1:], metadata={})
+        ingestion = file_manager.get_files_registry()[new_files[0]]['_ingestion']
+        self.assertIn(ingestion, {'reflink', 'link', 'move', 'copy'})
+        with open(new_files[0]) as f:
+            self.assertEqual('tmp text', f.read())
+        if ingestion == 'link':
+            self.assertTrue(os.path.samefile(files[1], new_files[0]))
+
+        # every file of a call gets its own metadata
+        methods = iter(['link', 'copy'])
+        file_manager._ingest_file = \
+            lambda source, destination: (shutil.copyfile(source, destination), next(methods))[1]
+        metadata = {'id': 'output'}
+        new_files = file_manager.append_files(files, 'many', metadata=metadata)
+        registry = file_manager.get_files_registry()
+        self.assertListEqual(['link', 'copy'], [registry[new_file]['_ingestion'] for new_file in new_files])
+        self.assertDictEqual({'id': 'output'}, metadata)
+
+        self.assertRaises(ValueError, IOFileManager, self.root_directory, ingestion_strategy='SYMLINK')
+
+    def test_append_files_move_only_owned_files(self):
+        file_manager = IOFileManager(self.root_directory, ingestion_strategy='LINK')
+        source_tmp_dir = tempfile.mkdtemp()
+        self.assertFalse(file_manager._is_owned(os.path.join(source_tmp_dir, 'file')))
+        file_manager = IOFileManager(self.root_directory, ingestion_strategy='LINK',
+                                     owned_directories=[source_tmp_dir])
+        self.assertTrue(file_manager._is_owned(os.path.join(source_tmp_dir, 'file')))
+
+    def test_remove_directory(self):
+        file_manager = IOFileManager(tempfile.mkdtemp())
+        kept = file_manager.write('kept.txt', b'kept')
+        removed = file_manager.write(os.path.join('run', 'removed.txt'), b'removed')
+        self.assertListEqual([removed], file_manager.remove_directory('run'))
+        self.assertListEqual([kept], file_manager.get_files())
+        self.assertFalse(os.path.exists(os.path.join(file_manager.ROOT_DIRECTORY, 'run')))
+
+    def test_results_manager_get_last_result_by_id(self):
+        results_manager = ResultsManager(self.root_directory)
+        self.assertIsNone(results_manager.get_last_result_by_id('output'))
+        first = results_manager.write(
+            'run1/output', b'1', {'id': 'output', '_produced_by': 'tool1', 'result_counter': 0})
+        second = results_manager.write(
+            'run2/output', b'2', {'id': 'output', '_produced_by': 'tool2', 'result_counter': 1})
+        third = results_manager.write(
+            'run3/output', b'3', {'id': 'output', '_produced_by': 'tool1', 'result_counter': 2})
+        self.assertEqual(third, results_manager.get_last_result_by_id('output'))
+        self.assertEqual(third, results_manager.get_last_result_by_id('tool1/output'))
+        self.assertEqual(second, results_manager.get_last_result_by_id('tool2/output'))
+        self.assertIsNone(results_manager.get_last_result_by_id('tool3/output'))
+
+        results_manager.remove(third)
+        self.assertEqual(second, results_manager.get_last_result_by_id('output'))
+        self.assertEqual(first, results_manager.get_last_result_by_id('tool1/output'))
+
+        results_manager.write('run1/output', b'1', {'id': 'other', '_produced_by': 'tool1', 'result_counter': 3})
+        self.assertIsNone(results_manager.get_last_result_by_id('tool1/output'))
+        self.assertEqual(first, results_manager.get_last_result_by_id('tool1/other'))
+
+    def test_results_manager_persistent_catalog(self):
+        results_manager = ResultsManager(self.root_directory, persistent=True)
+        first = results_manager.write('run1/output', b'1', {'id': 'output', '_produced_by': 'tool', 'result_counter': 0})
+        second = results_manager.write('run2/output', b'2', {'id': 'output', '_produced_by': 'tool', 'result_counter': 1})
+        removed = results_manager.write('run2/other', b'3', {'id': 'other', '_produced_by': 'tool', 'result_counter': 2})
+        results_manager.remove(removed)
+        os.remove(second)
+
+        reattached_results_manager = ResultsManager(self.root_directory, persistent=True)
+        self.assertEqual(first, reattached_results_manager.get_last_result_by_id('tool/output'))
+        self.assertIsNone(reattached_results_manager.get_last_result_by_id('other'))
+        self.assertListEqual([first], reattached_results_manager.get_files())
+
+        self.assertIsNone(ResultsManager(self.root_directory).get_last_result_by_id('output'))
+
+    def test_results_manager_counter_is_monotonic(self):
+        results_manager = ResultsManager(self.root_directory, persistent=True)
+        metadata = {'id': 'output', '_produced_by': 'tool'}
+        counter = results_manager.next_result_counter
+        results_manager.write('run1/output', b'1', {**metadata, 'result_counter': counter()})
+        results_manager.write('run2/other', b'2', {'id': 'other', 'result_counter': counter()})
+        results_manager.remove_directory('run1')
+        last = results_manager.write('run3/output', b'3', {**metadata, 'result_counter': counter()})
+        older = results_manager.write('run4/output', b'4', {**metadata, 'result_counter': 0})
+        self.assertEqual(last, results_manager.get_last_result_by_id('tool/output'))
+        results_manager.remove(last)
+        results_manager.remove(older)
+
+        # the counter survives the removal of the results with the greatest counters
+        reattached_results_manager = ResultsManager(self.root_directory, persistent=True)
+        self.assertEqual(3, reattached_results_manager.next_result_counter())
+        unnumbered = reattached_results_manager.write('run5/output', b'5', {'id': 'output'})
+        self.assertEqual(4, reattached_results_manager.get_files_registry()[unnumbered]['result_counter'])
+
+    def test_results_manager_listeners(self):
+        results_manager = ResultsManager(self.root_directory, persistent=True)
+        events = []
+        results_manager.add_listener(lambda reference, added: events.append((reference, added)))
+        metadata = {'id': 'output', '_produced_by': 'tool'}
+        first = results_manager.write('run1/output', b'1', {**metadata, 'result_counter': 0})
+        second = results_manager.write('run2/output', b'2', {**metadata, 'result_counter': 1})
+        self.assertListEqual([('tool/output', True)], events)
+        results_manager.remove(first)
+        self.assertListEqual([('tool/output', True)], events)
+        results_manager.remove(second)
+        self.assertListEqual([('tool/output', True), ('tool/output', False)], events)
+
+        results_manager.write('run3/other', b'3', {'id': 'other', '_produced_by': 'tool', 'result_counter': 2})
+        reattached_results_manager = ResultsManager(self.root_directory, persistent=True)
+        reattached_events = []
+        reattached_results_manager.add_listener(lambda reference, added: reattached_events.append((reference, added)))
+        reattached_results_manager.load_catalog()
+        self.assertListEqual([('tool/other', True)], reattached_events)
+
     def tearDown(self) -> None:
         try:
             shutil.rmtree(self.root_directory)
@@ -0,0 +1,70 @@
+import logging
+import subprocess
+import threading
+import time
+import unittest
+
+from cwlkernel.OutputStreamer import OutputStreamer
+
+
+class TestOutputStreamer(unittest.TestCase):
+
+    def test_stream_processes_output(self):
+        messages = []
+        with OutputStreamer(lambda name, text: messages.append((name, text)), interval=0.05) as streamer:
+            for i in range(2):
+                # every job closes its outputs, the streamer must keep forwarding
+                subprocess.run(['sh', '-c', f'echo out {i}; echo err {i} >&2'],
+                               stdout=streamer.stdout, stderr=streamer.stderr)
+                streamer.stdout.close()
+            deadline = time.time() + 5
+            while len(messages) == 0 and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertGreater(len(messages), 0)
+        self.assertEqual('out 0\nout 1\n', ''.join(text for name, text in messages if name == 'stdout'))
+        self.assertEqual('err 0\nerr 1\n', ''.join(text for name, text in messages if name == 'stderr'))
+
+    def test_stream_rate_limit_and_logger(self):
+        messages = []
+        logger = logging.getLogger('test_stream_rate_limit_and_logger')
+        logger.setLevel(logging.INFO)
+        streamer = OutputStreamer(lambda name, text: messages.append((name, text)), interval=60, max_size=100)
+        streamer.add_logger(logger)
+        subprocess.run(['sh', '-c', 'for i in $(seq 1 1000); do echo line $i; done'], stdout=streamer.stdout)
+        logger.info('job finished')
+        streamer.close()
+        logger.info('not forwarded')
+
+        self.assertEqual(2, len(messages))
+        name, text = messages[0]
+        self.assertEqual('stdout', name)
+        self.assertTrue(text.startswith('[... '))
+        self.assertTrue(text.endswith('line 999\nline 1000\n'))
+        self.assertEqual(('stderr', 'INFO job finished\n'), messages[1])
+
+    def test_logger_records_of_other_threads(self):
+        messages = []
+        logger = logging.getLogger('test_logger_records_of_other_threads')
+        logger.setLevel(logging.INFO)
+        streamer = OutputStreamer(lambda name, text: messages.append((name, text)), interval=60)
+        streamer.add_logger(logger)
+
+        def job():
+            with streamer.attach_thread():
+                logger.info('attached job')
+
+        # e.g. the jobs of a concurrent run, which share the logger
+        other_run = threading.Thread(target=logger.info, args=('other run',))
+        other_run.start()
+        other_run.join()
+        attached_job = threading.Thread(target=job)
+        attached_job.start()
+        attached_job.join()
+        logger.info('run')
+        streamer.close()
+
+        self.assertListEqual([('stderr', 'INFO attached job\nINFO run\n')], messages)
+
+
+if __name__ == '__main__':
+    unittest.main()
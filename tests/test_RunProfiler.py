@@ -0,0 +1,31 @@
+import subprocess
+import sys
+import unittest
+
+from cwlkernel.RunProfiler import RunProfiler
+
+
+class TestRunProfiler(unittest.TestCase):
+
+    def test_profile_steps(self):
+        profiler = RunProfiler(interval=0.05)
+        profiler.start()
+        for name in ['step1', 'step2']:
+            process = subprocess.Popen(
+                [sys.executable, '-c', 'import time\nx = bytearray(20 * 2 ** 20)\ntime.sleep(0.3)'])
+            with profiler.profile_step(name, process.pid):
+                process.wait()
+        profiler.stop()
+
+        run_profile = profiler.profile()
+        self.assertListEqual(['step1', 'step2'], [step['step'] for step in run_profile['steps']])
+        for step in run_profile['steps']:
+            self.assertGreaterEqual(step['wall_time'], 0.3)
+            self.assertGreaterEqual(step['peak_rss'], 20 * 2 ** 20)
+        self.assertEqual(max(step['peak_rss'] for step in run_profile['steps']), run_profile['peak_rss'])
+        self.assertAlmostEqual(sum(step['cpu_time'] for step in run_profile['steps']), run_profile['cpu_time'])
+        self.assertGreaterEqual(run_profile['wall_time'], sum(step['wall_time'] for step in run_profile['steps']))
+
+
+if __name__ == '__main__':
+    unittest.main()
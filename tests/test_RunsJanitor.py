@@ -0,0 +1,58 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from cwlkernel.RunsJanitor import RunsJanitor
+
+
+class TestRunsJanitor(unittest.TestCase):
+
+    @classmethod
+    def _create_run(cls, janitor: RunsJanitor, run_id: str, size: int) -> None:
+        for directory in (janitor.scratch_directory, janitor.results_directory):
+            Path(directory, run_id).mkdir(parents=True)
+            with open(os.path.join(directory, run_id, 'output.txt'), 'wb') as f:
+                f.write(b'0' * size)
+        janitor.add_run(run_id)
+
+    def test_collect(self):
+        evicted_runs = []
+        janitor = RunsJanitor(tempfile.mkdtemp(), tempfile.mkdtemp(), quota=250, on_evict=evicted_runs.append)
+        for run_id in ['run1', 'run2', 'run3']:
+            self._create_run(janitor, run_id, 100)
+        self.assertEqual(300, janitor.usage())
+        self.assertEqual('run2', janitor.run_of_path(os.path.join(janitor.results_directory, 'run2', 'output.txt')))
+        self.assertIsNone(janitor.run_of_path(os.path.join(janitor.scratch_directory, 'run2', 'output.txt')))
+
+        janitor.pin('run1')
+        janitor.touch('run2')
+        self.assertListEqual(['run3'], janitor.collect())
+        self.assertListEqual(['run3'], evicted_runs)
+        self.assertFalse(os.path.exists(os.path.join(janitor.results_directory, 'run3')))
+        self.assertListEqual([], os.listdir(janitor.scratch_directory))
+        self.assertListEqual(['run1', 'run2'], [run['run_id'] for run in janitor.runs()])
+
+        janitor.quota = 50
+        self.assertListEqual(['run2'], janitor.collect())
+        self.assertListEqual(['run1'], os.listdir(janitor.results_directory))
+        self.assertRaises(KeyError, janitor.pin, 'run2')
+
+    def test_collect_in_background(self):
+        janitor = RunsJanitor(tempfile.mkdtemp(), tempfile.mkdtemp(), quota=150)
+        janitor.start()
+        try:
+            self._create_run(janitor, 'run1', 100)
+            self._create_run(janitor, 'run2', 100)
+            deadline = time.time() + 10
+            while len(janitor.runs()) > 1 and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            janitor.stop()
+        self.assertListEqual(['run2'], [run['run_id'] for run in janitor.runs()])
+        self.assertListEqual(['run2'], os.listdir(janitor.results_directory))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from cwlkernel.WorkflowVisualizer import WorkflowVisualizer
+from cwlkernel.cwlrepository.CWLComponent import WorkflowComponentFactory
+
+
+class TestWorkflowVisualizer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.cwl_directory = os.sep.join([os.path.dirname(os.path.realpath(__file__)), 'cwl'])
+
+    def _load_workflow(self):
+        with open(os.path.join(self.cwl_directory, '3stepWorkflow.cwl')) as f:
+            return WorkflowComponentFactory().get_workflow_component(f.read())
+
+    def test_to_dot(self):
+        graph = WorkflowVisualizer.to_dot(self._load_workflow())
+        self.assertSetEqual(
+            {
+                ('inputs/inputfile', 'steps/head'),
+                ('inputs/query', 'steps/grepstep'),
+                ('steps/head', 'steps/grepstep'),
+                ('steps/grepstep', 'steps/grep2'),
+                ('steps/grep2', 'outputs/outputfile'),
+                ('steps/grepstep', 'outputs/outputfile2'),
+            },
+            {(edge.get_source().strip('"'), edge.get_destination().strip('"')) for edge in graph.get_edges()}
+        )
+        self.assertListEqual(
+            ['steps/head', 'steps/grepstep', 'steps/grep2'],
+            [node.get_name().strip('"') for node in graph.get_nodes()]
+        )
+        self.assertListEqual(
+            ['inputs/inputfile', 'inputs/query'],
+            [node.get_name().strip('"') for node in graph.get_subgraph('cluster_inputs')[0].get_nodes()]
+        )
+
+    @unittest.skipIf(shutil.which('dot') is None, 'graphviz is not installed')
+    def test_render_is_cached(self):
+        workflow = self._load_workflow()
+        path = Path(tempfile.mkdtemp(), 'workflow.cwl')
+        path.write_text(workflow.to_yaml())
+        visualizer = WorkflowVisualizer(max_entries=1)
+        image = visualizer.render(workflow.id, path, workflow)
+        self.assertIn('<svg', image)
+        self.assertIs(image, visualizer.render(workflow.id, path, workflow))
+        visualizer.invalidate(workflow.id)
+        self.assertIsNot(image, visualizer.render(workflow.id, path, workflow))
+
+
+if __name__ == '__main__':
+    unittest.main()